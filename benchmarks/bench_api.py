@@ -0,0 +1,166 @@
+"""
+Load-test benchmark for the Warscribe API.
+
+Starts a local fake Redis (fakeredis TCP server) and a local uvicorn running
+``api:app`` against a throwaway database, then hammers ``GET /jobs`` and
+``GET /health`` with concurrent keep-alive clients and reports requests/sec.
+
+Usage:
+    python benchmarks/bench_api.py [--duration 10] [--concurrency 32] [--jobs 200]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(ROOT, "src", "warscribe", "parser")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_redis():
+    from fakeredis import TcpFakeServer
+
+    port = _free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{port}"
+
+
+def seed_jobs(db_path, n):
+    sys.path.insert(0, PARSER_DIR)
+    from db import Database
+
+    db = Database(db_path, with_chroma=False)
+    for i in range(n):
+        video_id = f"bench{i:06d}"
+        db.add_job(video_id, f"https://www.youtube.com/watch?v={video_id}")
+        db.update_job_status(video_id, "completed")
+
+
+def start_api(port, env):
+    cmd = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "api:app",
+        "--app-dir",
+        PARSER_DIR,
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+    ]
+    proc = subprocess.Popen(cmd, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API did not come up within 60s")
+
+
+def load(port, path, duration, concurrency):
+    """Issue requests to path from `concurrency` clients for `duration` seconds."""
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        latencies, errors = [], 0
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors += 1
+            except OSError:
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - t0)
+        conn.close()
+        return latencies, errors
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    latencies = sorted(lat for lats, _ in results for lat in lats)
+    errors = sum(e for _, e in results)
+    n = len(latencies)
+    return {
+        "path": path,
+        "requests": n,
+        "errors": errors,
+        "rps": n / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[n // 2] * 1000 if n else None,
+        "p99_ms": latencies[min(n - 1, int(n * 0.99))] * 1000 if n else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--jobs", type=int, default=200, help="rows seeded into jobs")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="warscribe-bench-api-")
+    db_path = os.path.join(workdir, "warscribe.db")
+    seed_jobs(db_path, args.jobs)
+
+    redis_server, redis_url = start_fake_redis()
+    env = dict(
+        os.environ,
+        DB_PATH=db_path,
+        CHROMA_PATH=os.path.join(workdir, "chroma"),
+        REDIS_URL=redis_url,
+    )
+    port = _free_port()
+    api = start_api(port, env)
+    try:
+        report = [
+            load(port, path, args.duration, args.concurrency)
+            for path in ("/jobs", "/health")
+        ]
+    finally:
+        api.terminate()
+        api.wait()
+        redis_server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for r in report:
+            print(
+                f"{r['path']:<10} {r['rps']:>9.1f} req/s  "
+                f"p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  "
+                f"({r['requests']} ok, {r['errors']} errors)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Disk-usage and decode-time benchmark for downloaded audio formats.
+
+Synthesises a 48 kHz stereo Opus "download" (what YouTube serves as
+bestaudio), converts it the way the download stage does, and measures for
+each variant the conversion time, size on disk, and the time to obtain the
+16 kHz mono float32 samples Whisper consumes:
+
+- legacy:  full-rate stereo WAV (the old ``--audio-format wav --audio-quality 0``)
+- wav16k:  16 kHz mono PCM
+- opus16k: 16 kHz mono Opus
+- npy:     pre-decoded float32 .npy, memory-mapped
+
+Requires ffmpeg on PATH.
+
+Usage:
+    python benchmarks/bench_audio_format.py [--seconds 1800] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "warscribe", "parser"))
+
+from audio import FFMPEG_OUTPUT_ARGS, SAMPLE_RATE, export_npy  # noqa: E402
+
+
+def ffmpeg(*args):
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", *args], check=True
+    )
+
+
+def make_source(path, seconds):
+    """Stereo 48 kHz Opus with a tone plus noise, so it doesn't compress to nothing."""
+    ffmpeg(
+        "-f",
+        "lavfi",
+        "-i",
+        f"sine=frequency=440:sample_rate=48000:duration={seconds}",
+        "-f",
+        "lavfi",
+        "-i",
+        f"anoisesrc=color=pink:sample_rate=48000:amplitude=0.1:duration={seconds}",
+        "-filter_complex",
+        "[0][1]amix=inputs=2,pan=stereo|c0=c0|c1=c0",
+        "-c:a",
+        "libopus",
+        "-b:a",
+        "128k",
+        path,
+    )
+
+
+def decode_16k(path):
+    """Decode to 16 kHz mono float32, as faster-whisper does before transcribing."""
+    proc = subprocess.run(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-i",
+            path,
+            "-f",
+            "f32le",
+            "-ac",
+            "1",
+            "-ar",
+            str(SAMPLE_RATE),
+            "-",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=int, default=1800, help="audio length")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="warscribe-bench-audio-")
+    source = os.path.join(workdir, "source.webm")
+    make_source(source, args.seconds)
+
+    outputs = {
+        "legacy": (os.path.join(workdir, "legacy.wav"), ["-c:a", "pcm_s16le"]),
+        "wav16k": (os.path.join(workdir, "wav16k.wav"), FFMPEG_OUTPUT_ARGS["wav"]),
+        "opus16k": (os.path.join(workdir, "opus16k.opus"), FFMPEG_OUTPUT_ARGS["opus"]),
+    }
+
+    report = []
+    for name, (path, out_args) in outputs.items():
+        _, convert_s = timed(ffmpeg, "-i", source, *out_args, path)
+        samples, decode_s = timed(decode_16k, path)
+        report.append(
+            {
+                "variant": name,
+                "bytes": os.path.getsize(path),
+                "convert_s": convert_s,
+                "decode_s": decode_s,
+                "samples": int(samples.size),
+            }
+        )
+
+    npy = os.path.join(workdir, "audio.npy")
+    _, convert_s = timed(export_npy, outputs["wav16k"][0], npy)
+
+    def load_npy():
+        samples = np.load(npy, mmap_mode="r")
+        samples.sum()  # touch every page so the comparison is fair
+        return samples
+
+    samples, decode_s = timed(load_npy)
+    report.append(
+        {
+            "variant": "npy",
+            "bytes": os.path.getsize(npy),
+            "convert_s": convert_s,
+            "decode_s": decode_s,
+            "samples": int(samples.size),
+        }
+    )
+
+    if args.json:
+        print(json.dumps({"seconds": args.seconds, "results": report}, indent=2))
+        return
+
+    legacy = report[0]
+    print(f"{args.seconds}s of audio")
+    print(
+        f"{'variant':<9} {'size MiB':>9} {'vs legacy':>9} {'convert s':>10} {'decode s':>9}"
+    )
+    for r in report:
+        print(
+            f"{r['variant']:<9} {r['bytes'] / 2**20:>9.1f} "
+            f"{r['bytes'] / legacy['bytes']:>8.1%} "
+            f"{r['convert_s']:>10.2f} {r['decode_s']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
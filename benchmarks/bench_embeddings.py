@@ -0,0 +1,108 @@
+"""
+Throughput benchmark for the embedding backends.
+
+Embeds a corpus of transcript-like sentences with each available backend
+(torch, onnx, onnx-int8; see embeddings.py) and reports model load time,
+docs/sec and, against the torch output, the mean and minimum cosine
+similarity of the vectors.
+
+Backends whose dependencies are missing or whose model cannot be fetched
+are reported as skipped.
+
+Usage:
+    python benchmarks/bench_embeddings.py [--docs 2000] [--runs 3] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(ROOT, "src", "warscribe", "parser")
+sys.path.insert(0, PARSER_DIR)
+
+import embeddings  # noqa: E402
+
+UNITS = ["Intercessors", "Leman Russ", "Carnifex", "Hellblasters", "Termagants"]
+VERBS = ["advances towards", "shoots at", "charges into", "falls back from"]
+TAILS = [
+    "the objective",
+    "the ruins on the left flank, rolling for the hits",
+    "cover and passes the saves",
+    "the centre of the board while the crowd goes wild in chat",
+]
+
+
+def corpus(n):
+    """Whisper-segment-sized sentences of varied length."""
+    return [
+        f"{UNITS[i % 5]} {VERBS[i % 4]} {TAILS[(i // 3) % 4]} in turn {i % 5 + 1}"
+        for i in range(n)
+    ]
+
+
+def bench(backend, docs, runs):
+    try:
+        start = time.perf_counter()
+        embedder = embeddings.get_embedder(backend)
+        load = time.perf_counter() - start
+    except Exception as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}, None
+    embedder(docs[:8])  # warm-up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        vectors = embedder(docs)
+        samples.append(time.perf_counter() - start)
+    seconds = statistics.median(samples)
+    return {
+        "load_seconds": load,
+        "seconds": seconds,
+        "docs_per_sec": len(docs) / seconds,
+    }, np.array(vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    docs = corpus(args.docs)
+    report = {}
+    reference = None
+    for backend in embeddings.BACKENDS:
+        result, vectors = bench(backend, docs, args.runs)
+        if backend == "torch":
+            reference = vectors
+        elif vectors is not None and reference is not None:
+            cosine = (reference * vectors).sum(axis=1)
+            result["cosine_mean"] = float(cosine.mean())
+            result["cosine_min"] = float(cosine.min())
+        report[backend] = result
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.docs} docs, median of {args.runs} runs")
+    for backend, r in report.items():
+        if "skipped" in r:
+            print(f"  {backend:10s} skipped: {r['skipped']}")
+            continue
+        parity = ""
+        if "cosine_mean" in r:
+            parity = f"  cosine vs torch mean {r['cosine_mean']:.4f} min {r['cosine_min']:.4f}"
+        print(
+            f"  {backend:10s} load {r['load_seconds']:6.2f}s  "
+            f"{r['docs_per_sec']:8.1f} docs/s{parity}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+End-to-end pipeline benchmark on synthetic fixtures.
+
+Runs the same stages as ``Orchestrator.add_job`` against a throwaway
+database, timing each one:
+
+- download:   Downloader.process, with a stub ``yt-dlp`` on PATH that copies
+              a synthetic 16 kHz mono WAV into place
+- chat:       ChatParser.process_chat, fed from a synthetic chat fixture
+- transcribe: Transcriber.process_job (stub model by default, or
+              --whisper tiny for faster-whisper)
+- llm:        WarscribeLLM.process_job against a stub Ollama HTTP server
+              that returns a canned, schema-valid extraction
+- embed:      Database.add_transcript_embeddings (sentence-transformers)
+- query:      QueryEngine.query, retrieval plus the stub Ollama
+
+Each stage reports the median wall time over --repeat runs and its
+throughput. The report is compared against a stored baseline; stages more
+than --tolerance (and --min-delta seconds) slower are flagged and the exit
+status is 1. Timings only compare on the same machine, so no baseline is
+committed: record one there first with --save-baseline (in CI, as a step on
+the base commit before running the branch). A missing baseline, or one
+recorded with a different config, exits with status 2 rather than passing
+without a comparison.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--minutes 10] [--repeat 3]
+        [--whisper tiny] [--llm-latency-ms 0] [--json report.json]
+        [--baseline benchmarks/baselines/pipeline.json] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(ROOT, "src", "warscribe", "parser")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "pipeline.json")
+
+SAMPLE_RATE = 16000
+VIDEO_ID = "benchvid001"
+URL = f"https://www.youtube.com/watch?v={VIDEO_ID}"
+
+TRANSCRIPT_LINES = [
+    "Intercessor Squad A advances six inches toward the central objective.",
+    "The Leman Russ opens fire on the intercessors, three hits, two wounds.",
+    "Ork Boyz declare a charge, rolling a seven, they make it in.",
+    "In the fight phase the Boyz swing twenty attacks into the squad.",
+    "Command point spent on a re-roll, the save goes through.",
+    "Bottom of turn two, the objective is contested by both players.",
+]
+
+STUB_EXTRACTION = {
+    "summary": "Intercessors advance onto the objective.",
+    "actions": [
+        {
+            "action_type": "move",
+            "turn": 2,
+            "phase": "movement",
+            "actor": {"name": "Intercessor Squad A", "faction": "Space Marines"},
+            "result": "success",
+            "distance_inches": 6,
+        }
+    ],
+}
+
+STUB_YT_DLP = """#!{python}
+import os, shutil, sys
+
+args = sys.argv[1:]
+if "--print" in args:
+    print(args[-1].rsplit("=", 1)[-1])
+    sys.exit(0)
+template = args[args.index("-o") + 1]
+shutil.copyfile(os.environ["WARSCRIBE_BENCH_AUDIO"], template % {{"ext": "wav"}})
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ── Fixtures ──────────────────────────────────────────────
+
+
+def make_audio(path, minutes, block_seconds=60):
+    """Write a 16 kHz mono s16 WAV of low noise and tone bursts."""
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 * SAMPLE_RATE)
+    block = block_seconds * SAMPLE_RATE
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        for i in range(0, n, block):
+            t = np.arange(i, min(i + block, n)) / SAMPLE_RATE
+            tone = 0.2 * np.sin(2 * np.pi * 220 * t) * (np.sin(0.5 * t) > 0)
+            noise = 0.01 * rng.standard_normal(len(t))
+            w.writeframes(((tone + noise) * 32767).astype("<i2").tobytes())
+
+
+def make_chat(minutes, per_minute=30):
+    rng = np.random.default_rng(1)
+    count = int(minutes * per_minute)
+    times = np.sort(rng.uniform(0, minutes * 60, count))
+    return [
+        {
+            "time_in_seconds": float(ts),
+            "author": {"name": f"viewer{i % 50}"},
+            "message": TRANSCRIPT_LINES[i % len(TRANSCRIPT_LINES)].split(",")[0],
+        }
+        for i, ts in enumerate(times)
+    ]
+
+
+class FixtureChatDownloader:
+    """Stands in for chat_downloader.ChatDownloader."""
+
+    messages = []
+
+    def get_chat(self, url):
+        return iter(self.messages)
+
+
+class StubSegment:
+    def __init__(self, start, end, text):
+        self.start, self.end, self.text = start, end, text
+
+
+class StubWhisperModel:
+    """One scripted 10s segment per 10s of audio, without decoding anything."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def transcribe(self, audio, **options):
+        if isinstance(audio, str):
+            from audio import probe_duration
+
+            seconds = probe_duration(audio) or 0.0
+        else:
+            seconds = len(audio) / SAMPLE_RATE
+        segments = [
+            StubSegment(
+                t,
+                min(t + 10.0, seconds),
+                TRANSCRIPT_LINES[int(t // 10) % len(TRANSCRIPT_LINES)],
+            )
+            for t in np.arange(0.0, seconds, 10.0)
+        ]
+        return segments, type("Info", (), {"duration": seconds})()
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.latency:
+            time.sleep(self.latency)
+        # Extraction calls request JSON output; RAG answers are free text
+        content = (
+            json.dumps(STUB_EXTRACTION)
+            if body.get("format")
+            else "The intercessors advanced onto the objective."
+        )
+        payload = json.dumps(
+            {
+                "model": body.get("model", "stub"),
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_ollama(latency):
+    StubOllama.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", _free_port()), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def install_stub_yt_dlp(bin_dir):
+    path = os.path.join(bin_dir, "yt-dlp")
+    with open(path, "w") as f:
+        f.write(STUB_YT_DLP.format(python=sys.executable))
+    os.chmod(path, 0o755)
+
+
+# ── Stages ────────────────────────────────────────────────
+
+
+def _stage(results, name, fn, items_fn=None, unit="items"):
+    start = time.perf_counter()
+    try:
+        outcome = fn()
+    except Exception as e:
+        results[name] = {"error": f"{type(e).__name__}: {e}"}
+        return None
+    elapsed = time.perf_counter() - start
+    if outcome is SKIPPED:
+        results[name] = {"skipped": True}
+        return None
+    results[name] = {"seconds": elapsed}
+    if items_fn:
+        results[name].update({"items": items_fn(), "unit": unit})
+    return outcome
+
+
+SKIPPED = object()
+
+
+def run_once(args, workdir, audio_fixture):
+    from chat_parser import ChatParser
+    from db import Database
+    from downloader import Downloader
+    from query_engine import QueryEngine
+    from transcriber import Transcriber
+    from warscribe_llm import WarscribeLLM
+
+    db_path = os.path.join(workdir, "warscribe.db")
+    chroma_path = os.path.join(workdir, "chroma")
+    input_dir = os.path.join(workdir, "input")
+    os.environ["CHROMA_PATH"] = chroma_path
+    db = Database(db_path, with_chroma=False)
+    results = {}
+
+    downloader = Downloader(input_dir, db_path=db_path, keep_npy=False)
+    _stage(
+        results,
+        "download",
+        lambda: downloader.process(URL),
+        lambda: os.path.getsize(audio_fixture) / 2**20,
+        "MiB",
+    )
+    _stage(
+        results,
+        "chat",
+        lambda: ChatParser(db_path=db_path).process_chat(VIDEO_ID),
+        lambda: len(db.get_chat_for_segment(VIDEO_ID, 0, float("inf"))),
+        "messages",
+    )
+
+    load_start = time.perf_counter()
+    transcriber = Transcriber(
+        model_size=args.whisper or "tiny", db_path=db_path, input_dir=input_dir
+    )
+    results["transcribe_load"] = {"seconds": time.perf_counter() - load_start}
+    _stage(
+        results,
+        "transcribe",
+        lambda: transcriber.process_job(VIDEO_ID),
+        lambda: len(db.get_segments(VIDEO_ID)),
+        "segments",
+    )
+    if "seconds" in results["transcribe"]:
+        results["transcribe"]["realtime_factor"] = (
+            args.minutes * 60 / results["transcribe"]["seconds"]
+        )
+
+    _stage(
+        results,
+        "llm",
+        lambda: WarscribeLLM(model="stub", db_path=db_path).process_job(VIDEO_ID),
+        lambda: sum(1 for s in db.get_segments(VIDEO_ID) if s["warscribe_json"]),
+        "segments",
+    )
+
+    def embed():
+        full = Database(db_path, chroma_path=chroma_path)
+        if full.collection is None:
+            return SKIPPED
+        full.add_transcript_embeddings(
+            VIDEO_ID, full.get_segments_needing_embedding(VIDEO_ID)
+        )
+
+    _stage(
+        results,
+        "embed",
+        embed,
+        lambda: sum(1 for s in db.get_segments(VIDEO_ID) if s.get("embedded_at")),
+        "docs",
+    )
+
+    def query():
+        engine = QueryEngine(db_path, chroma_path=chroma_path, llm_model="stub")
+        if engine.collection is None:
+            return SKIPPED
+        for i in range(args.queries):
+            engine.query(f"What happened with {TRANSCRIPT_LINES[i % 6][:24]}?")
+
+    _stage(results, "query", query, lambda: args.queries, "queries")
+    return results
+
+
+def summarise(runs):
+    """Median seconds and throughput per stage across runs."""
+    report = {}
+    for name in runs[0]:
+        samples = [r[name] for r in runs]
+        failed = next((s for s in samples if "seconds" not in s), None)
+        if failed:
+            report[name] = failed
+            continue
+        seconds = statistics.median(s["seconds"] for s in samples)
+        stage = {"seconds": seconds, "runs": [s["seconds"] for s in samples]}
+        if "items" in samples[0]:
+            items = samples[0]["items"]
+            stage.update(
+                {
+                    "items": items,
+                    "unit": samples[0]["unit"],
+                    "per_sec": items / seconds if seconds else None,
+                }
+            )
+        if "realtime_factor" in samples[0]:
+            stage["realtime_factor"] = statistics.median(
+                s["realtime_factor"] for s in samples
+            )
+        report[name] = stage
+    return report
+
+
+def compare(report, baseline, tolerance, min_delta):
+    """Return a list of (stage, baseline s, current s, ratio, regressed).
+
+    None if the baseline was recorded with a different config.
+    """
+    if baseline.get("config") != report["config"]:
+        print(
+            "Baseline was recorded with a different config; not comparing.\n"
+            f"  baseline: {baseline.get('config')}\n  current:  {report['config']}"
+        )
+        return None
+    rows = []
+    for name, stage in report["stages"].items():
+        base = baseline["stages"].get(name, {})
+        if "seconds" not in stage or "seconds" not in base:
+            continue
+        ratio = stage["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        # Millisecond stages jitter by more than any sane ratio
+        regressed = (
+            ratio > 1 + tolerance and stage["seconds"] - base["seconds"] > min_delta
+        )
+        rows.append((name, base["seconds"], stage["seconds"], ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--whisper", help="faster-whisper model size instead of stub")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the report to this path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--min-delta", type=float, default=0.05, help="ignore slowdowns below (s)"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="warscribe-bench-pipeline-")
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir)
+    install_stub_yt_dlp(bin_dir)
+    audio_fixture = os.path.join(workdir, "fixture.wav")
+    make_audio(audio_fixture, args.minutes)
+    FixtureChatDownloader.messages = make_chat(args.minutes)
+
+    ollama_server = start_stub_ollama(args.llm_latency_ms / 1000)
+    os.environ.update(
+        {
+            "PATH": bin_dir + os.pathsep + os.environ["PATH"],
+            "WARSCRIBE_BENCH_AUDIO": audio_fixture,
+            "OLLAMA_HOST": f"http://127.0.0.1:{ollama_server.server_port}",
+            "LLM_CACHE_PATH": "",  # every run should hit the (stub) model
+            "METRICS_DIR": os.path.join(workdir, "metrics"),
+            "AUDIO_FORMAT": "wav",
+        }
+    )
+
+    # Imported only now: the Ollama client reads OLLAMA_HOST at import time
+    sys.path.insert(0, PARSER_DIR)
+    import chat_parser
+    import transcriber
+    from utils import setup_logging
+
+    setup_logging(os.environ.get("LOG_LEVEL", "WARNING"))
+    chat_parser.ChatDownloader = FixtureChatDownloader
+    if not args.whisper:
+        transcriber.WhisperModel = StubWhisperModel
+
+    runs = []
+    for i in range(args.repeat):
+        run_dir = os.path.join(workdir, f"run{i}")
+        os.makedirs(run_dir)
+        runs.append(run_once(args, run_dir, audio_fixture))
+        shutil.rmtree(run_dir, ignore_errors=True)
+    ollama_server.shutdown()
+
+    report = {
+        "config": {
+            "minutes": args.minutes,
+            "queries": args.queries,
+            "whisper": args.whisper or "stub",
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "repeat": args.repeat,
+        "stages": summarise(runs),
+    }
+    report["total_seconds"] = sum(
+        s["seconds"] for s in report["stages"].values() if "seconds" in s
+    )
+
+    print(f"{'stage':<16} {'median s':>10} {'throughput':>24}")
+    for name, stage in report["stages"].items():
+        if "seconds" not in stage:
+            note = "skipped" if stage.get("skipped") else stage["error"]
+            print(f"{name:<16} {note}")
+            continue
+        rate = (
+            f"{stage['per_sec']:.1f} {stage['unit']}/s" if stage.get("per_sec") else ""
+        )
+        print(f"{name:<16} {stage['seconds']:>10.3f} {rate:>24}")
+    rtf = report["stages"].get("transcribe", {}).get("realtime_factor")
+    if rtf:
+        print(f"transcribe realtime factor: {rtf:.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return 2
+    with open(args.baseline) as f:
+        rows = compare(report, json.load(f), args.tolerance, args.min_delta)
+    if rows is None:
+        return 2
+    if rows:
+        print(f"\n{'stage':<16} {'baseline s':>10} {'current s':>10} {'ratio':>7}")
+    for name, base, current, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<16} {base:>10.3f} {current:>10.3f} {ratio:>6.2f}x{flag}")
+    return 1 if any(r[4] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Peak-memory benchmark for transcription input loading.
+
+For several recording lengths, writes synthetic 16 kHz mono float32 audio to
+an .npy file and measures the peak RSS of a fresh process that feeds it to a
+model in two ways:
+
+- full:     load every sample into RAM and hand the whole array over
+            (what decoding the file up front amounts to)
+- windowed: memory-map the file and feed it window by window through
+            audio.transcribe_windowed, as the Transcriber does
+
+By default the model is a stub that reads every sample it is given, so the
+numbers isolate the loader; pass --whisper tiny to run faster-whisper.
+
+Usage:
+    python benchmarks/bench_transcribe_memory.py [--minutes 10 60 240] [--json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(ROOT, "src", "warscribe", "parser")
+sys.path.insert(0, PARSER_DIR)
+
+from audio import SAMPLE_RATE, open_pcm, transcribe_windowed  # noqa: E402
+
+
+class StubSegment:
+    def __init__(self, start, end):
+        self.start, self.end, self.text = start, end, ""
+
+
+class StubModel:
+    """Touches all samples and returns one segment per 30s, like a real decode."""
+
+    def transcribe(self, audio, **options):
+        float(np.abs(audio).mean())
+        seconds = len(audio) / SAMPLE_RATE
+        segments = [
+            StubSegment(t, min(t + 30.0, seconds)) for t in np.arange(0, seconds, 30.0)
+        ]
+        return segments, None
+
+
+def make_audio(path, minutes, block_seconds=60):
+    n = int(minutes * 60 * SAMPLE_RATE)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n,))
+    rng = np.random.default_rng(0)
+    block = block_seconds * SAMPLE_RATE
+    for i in range(0, n, block):
+        out[i : i + block] = rng.standard_normal(min(block, n - i)).astype(np.float32)
+    out.flush()
+    del out
+
+
+def peak_rss_mib():
+    # VmHWM is per address space; ru_maxrss would also count the parent's
+    # peak inherited across fork/exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(path, mode, whisper):
+    """Run one measurement in this process and print its peak RSS in MiB."""
+    if whisper:
+        from faster_whisper import WhisperModel
+
+        model = WhisperModel(whisper, device="cpu", compute_type="int8")
+    else:
+        model = StubModel()
+
+    if mode == "full":
+        samples = np.load(path)
+        segments, _ = model.transcribe(samples)
+        count = sum(1 for _ in segments)
+    else:
+        samples = open_pcm(path)
+        count = sum(1 for _ in transcribe_windowed(model, samples))
+
+    print(json.dumps({"peak_rss_mib": peak_rss_mib(), "segments": count}))
+
+
+def measure(path, mode, whisper):
+    cmd = [sys.executable, __file__, "--child", path, "--mode", mode]
+    if whisper:
+        cmd += ["--whisper", whisper]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 240])
+    parser.add_argument("--whisper", help="faster-whisper model size instead of stub")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["full", "windowed"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.mode, args.whisper)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="warscribe-bench-mem-")
+    report = []
+    for minutes in args.minutes:
+        path = os.path.join(workdir, f"audio_{minutes:g}m.npy")
+        make_audio(path, minutes)
+        row = {"minutes": minutes}
+        for mode in ("full", "windowed"):
+            row[mode] = measure(path, mode, args.whisper)["peak_rss_mib"]
+        report.append(row)
+        os.remove(path)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'minutes':>8} {'full MiB':>10} {'windowed MiB':>13}")
+    for r in report:
+        print(f"{r['minutes']:>8g} {r['full']:>10.1f} {r['windowed']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Recall and latency benchmark for the vector store backends.
+
+Builds synthetic clustered 384-d embeddings (the size all-MiniLM-L6-v2
+produces) spread over several videos and compares, against exact float32
+search as ground truth:
+
+- local-int8 / local-float16: vector_index.VectorIndex
+- chroma: a ChromaDB collection (HNSW), if chromadb is installed
+
+For each backend it reports build time, median and p95 query latency for
+unfiltered and per-video queries, recall@k, and on-disk vector size.
+
+Usage:
+    python benchmarks/bench_vector_index.py [--rows 100000] [--videos 50] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(ROOT, "src", "warscribe", "parser")
+sys.path.insert(0, PARSER_DIR)
+
+from utils import percentile  # noqa: E402
+from vector_index import VectorIndex  # noqa: E402
+
+DIM = 384
+
+
+def make_data(rows, videos, queries, seed=0):
+    """Clustered unit vectors, a video id per row, and perturbed query vectors."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(rows // 200, 1), DIM)).astype(np.float32)
+    labels = rng.integers(0, len(centers), rows)
+    data = centers[labels] + 0.6 * rng.standard_normal((rows, DIM)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    # Videos are embedded one after another, as the pipeline does
+    video_ids = [f"video{i * videos // rows:06d}" for i in range(rows)]
+    picks = rng.integers(0, rows, queries)
+    q = data[picks] + 0.3 * rng.standard_normal((queries, DIM)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return data, video_ids, q, [video_ids[p] for p in picks]
+
+
+def exact(data, video_ids, queries, query_videos, k):
+    """Ground-truth top-k rows per query, unfiltered and per video."""
+    scores = queries @ data.T
+    unfiltered = [set(np.argsort(-s)[:k]) for s in scores]
+    vids = np.array(video_ids)
+    filtered = []
+    for s, video in zip(scores, query_videos):
+        rows = np.flatnonzero(vids == video)
+        filtered.append(set(rows[np.argsort(-s[rows])[:k]]))
+    return unfiltered, filtered
+
+
+def _timed(fn, items):
+    latencies, results = [], []
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - start)
+    return results, {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+
+def _recall(found, truth, k):
+    return statistics.mean(len(f & t) / k for f, t in zip(found, truth))
+
+
+def bench_local(dtype, data, video_ids, queries, query_videos, truth, k, workdir):
+    index = VectorIndex(os.path.join(workdir, dtype), dtype)
+    ids = [str(i) for i in range(len(data))]
+    metas = [{"video_id": v} for v in video_ids]
+    start = time.perf_counter()
+    for i in range(0, len(data), 5000):  # the pipeline adds in batches too
+        index.add(ids[i : i + 5000], data[i : i + 5000], metadatas=metas[i : i + 5000])
+    build = time.perf_counter() - start
+
+    found, latency = _timed(
+        lambda q: {row for row, _ in index.search(q, k)[0]}, queries
+    )
+    found_f, latency_f = _timed(
+        lambda pair: {
+            row for row, _ in index.search(pair[0], k, {"video_id": pair[1]})[0]
+        },
+        list(zip(queries, query_videos)),
+    )
+    return {
+        "build_seconds": build,
+        "query": latency,
+        "query_video": latency_f,
+        "recall": _recall(found, truth[0], k),
+        "recall_video": _recall(found_f, truth[1], k),
+        "vector_bytes": index.stats()["vector_bytes"],
+    }
+
+
+def bench_chroma(data, video_ids, queries, query_videos, truth, k, workdir):
+    try:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+        collection = client.get_or_create_collection("bench")
+    except Exception as e:
+        return {"skipped": f"chromadb unavailable: {e}"}
+    start = time.perf_counter()
+    for i in range(0, len(data), 5000):
+        collection.add(
+            ids=[str(j) for j in range(i, min(i + 5000, len(data)))],
+            embeddings=data[i : i + 5000].tolist(),
+            metadatas=[{"video_id": v} for v in video_ids[i : i + 5000]],
+        )
+    build = time.perf_counter() - start
+
+    def run(q, where=None):
+        result = collection.query(
+            query_embeddings=[q.tolist()], n_results=k, where=where
+        )
+        return {int(i) for i in result["ids"][0]}
+
+    found, latency = _timed(run, queries)
+    found_f, latency_f = _timed(
+        lambda pair: run(pair[0], {"video_id": pair[1]}),
+        list(zip(queries, query_videos)),
+    )
+    return {
+        "build_seconds": build,
+        "query": latency,
+        "query_video": latency_f,
+        "recall": _recall(found, truth[0], k),
+        "recall_video": _recall(found_f, truth[1], k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    data, video_ids, queries, query_videos = make_data(
+        args.rows, args.videos, args.queries
+    )
+    truth = exact(data, video_ids, queries, query_videos, args.k)
+    report = {
+        "rows": args.rows,
+        "videos": args.videos,
+        "k": args.k,
+        "float32_bytes": data.nbytes,
+        "backends": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for dtype in ("int8", "float16"):
+            report["backends"][f"local-{dtype}"] = bench_local(
+                dtype, data, video_ids, queries, query_videos, truth, args.k, workdir
+            )
+        report["backends"]["chroma"] = bench_chroma(
+            data, video_ids, queries, query_videos, truth, args.k, workdir
+        )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(
+        f"{args.rows} rows x {DIM}d over {args.videos} videos, recall@{args.k} "
+        f"vs exact float32 ({data.nbytes / 2**20:.0f} MiB)"
+    )
+    for name, r in report["backends"].items():
+        if "skipped" in r:
+            print(f"  {name:14s} skipped: {r['skipped']}")
+            continue
+        size = f"{r['vector_bytes'] / 2**20:6.1f} MiB" if "vector_bytes" in r else ""
+        print(
+            f"  {name:14s} build {r['build_seconds']:6.2f}s  "
+            f"query p50 {r['query']['p50_ms']:6.2f}ms p95 {r['query']['p95_ms']:6.2f}ms "
+            f"recall {r['recall']:.3f}  per-video p50 {r['query_video']['p50_ms']:6.2f}ms "
+            f"recall {r['recall_video']:.3f}  {size}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Speed and accuracy benchmark for the Whisper decoding profiles.
+
+Transcribes a local fixture (16 kHz mono WAV or .npy, with a reference
+transcript) once per profile in transcriber.PROFILES, through the same
+windowed path the Transcriber uses, and reports per profile:
+
+- realtime factor (audio seconds per wall second)
+- word error rate against the reference
+- seconds of audio recorded as silence rather than decoded
+
+--pad-silence inserts that many seconds of silence in the middle of the
+recording, standing in for the dead air and intermissions of a long VOD.
+
+Usage:
+    python benchmarks/bench_whisper_profiles.py --audio clip.wav --reference clip.txt
+        [--model tiny] [--pad-silence 120] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(ROOT, "src", "warscribe", "parser")
+sys.path.insert(0, PARSER_DIR)
+
+from audio import SAMPLE_RATE, open_pcm, transcribe_windowed  # noqa: E402
+
+
+def words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words."""
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+def load_samples(path, pad_silence):
+    samples = open_pcm(path)
+    if samples is None:
+        sys.exit(f"{path}: need 16 kHz mono 16-bit WAV or float32 .npy")
+    samples = np.asarray(samples)
+    if pad_silence:
+        middle = len(samples) // 2
+        gap = np.zeros(int(pad_silence * SAMPLE_RATE), dtype=samples.dtype)
+        samples = np.concatenate([samples[:middle], gap, samples[middle:]])
+    return samples
+
+
+def bench(model, samples, reference, options, min_silence, window_seconds):
+    start = time.perf_counter()
+    rows = list(
+        transcribe_windowed(
+            model,
+            samples,
+            window_seconds=window_seconds,
+            min_silence=min_silence if options.get("vad_filter") else None,
+            **options,
+        )
+    )
+    elapsed = time.perf_counter() - start
+    duration = len(samples) / SAMPLE_RATE
+    hypothesis = " ".join(text for _, _, text in rows if text)
+    return {
+        "seconds": elapsed,
+        "realtime_factor": duration / elapsed if elapsed else None,
+        "wer": word_error_rate(reference, hypothesis),
+        "segments": sum(1 for row in rows if row[2] is not None),
+        "silence_seconds": sum(
+            end - start for start, end, text in rows if text is None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--audio", required=True)
+    parser.add_argument("--reference", required=True, help="reference transcript")
+    parser.add_argument("--model", default=os.environ.get("WHISPER_MODEL", "tiny"))
+    parser.add_argument("--pad-silence", type=float, default=0.0, help="seconds")
+    parser.add_argument("--window", type=float, default=300.0, help="seconds")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    from faster_whisper import WhisperModel
+
+    from transcriber import MIN_SILENCE_SECONDS, PROFILES
+
+    samples = load_samples(args.audio, args.pad_silence)
+    with open(args.reference, encoding="utf-8") as f:
+        reference = f.read()
+    model = WhisperModel(args.model, device="cpu", compute_type="int8")
+
+    report = {
+        "audio_seconds": len(samples) / SAMPLE_RATE,
+        "model": args.model,
+        "profiles": {
+            name: bench(
+                model, samples, reference, options, MIN_SILENCE_SECONDS, args.window
+            )
+            for name, options in PROFILES.items()
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['audio_seconds']:.0f}s of audio, whisper {args.model}")
+    for name, r in report["profiles"].items():
+        print(
+            f"  {name:10s} {r['realtime_factor']:6.1f}x realtime  "
+            f"WER {r['wer']:.3f}  {r['segments']} segments  "
+            f"{r['silence_seconds']:.0f}s silence skipped"
+        )
+
+
+if __name__ == "__main__":
+    main()
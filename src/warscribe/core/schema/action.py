@@ -10,7 +10,7 @@ Core action types per ROADMAP v0.1.0:
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Union
+from typing import Any, Optional, Union
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -176,3 +176,21 @@ class FightAction(BaseAction):
 
 # Union type for all actions
 Action = Union[MoveAction, ShootAction, ChargeAction, FightAction]
+
+
+# Concrete model for each action type; anything else validates as BaseAction
+ACTION_MODELS: dict[ActionType, type[BaseAction]] = {
+    ActionType.MOVE: MoveAction,
+    ActionType.SHOOT: ShootAction,
+    ActionType.CHARGE: ChargeAction,
+    ActionType.FIGHT: FightAction,
+}
+
+
+def parse_action(data: dict[str, Any]) -> BaseAction:
+    """Validate a raw action dict into the model matching its ``action_type``.
+
+    Raises ``pydantic.ValidationError`` if the dict does not fit that model.
+    """
+    model = ACTION_MODELS.get(data.get("action_type"), BaseAction)
+    return model.model_validate(data)
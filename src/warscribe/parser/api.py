@@ -2,33 +2,71 @@
 Warscribe API — FastAPI gateway for job submission, status, and RAG queries.
 """
 
+import asyncio
+import logging
 import os
 import sys
+from contextlib import asynccontextmanager
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from redis import Redis
-from rq import Queue
+from typing import Literal, Optional
+from redis import ConnectionPool, Redis
 
-from db import Database
+import metrics
+from async_db import AsyncDatabase
+from chat_rollup import get_spikes
+from export import KINDS, MEDIA_TYPES, export
 from query_engine import QueryEngine
+from queues import PRIORITIES, get_queue, queue_stats
+from utils import canonical_url, extract_video_id, setup_logging
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")
 DB_PATH = os.environ.get("DB_PATH", "warscribe.db")
+INPUT_DIR = os.environ.get("INPUT_DIR", "input")
+# 'rq' enqueues on Redis for the workers; 'daemon' only records the job for
+# the single-node orchestrator (orchestrator.py run) to pick up
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "rq")
 
-app = FastAPI(title="Warscribe API", version="1.0.0")
+log = logging.getLogger("warscribe.api")
 
 
-def _get_queue():
-    conn = Redis.from_url(REDIS_URL)
-    return Queue("warscribe", connection=conn)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    # Shared for the lifetime of the process instead of per request
+    app.state.redis_pool = ConnectionPool.from_url(REDIS_URL)
+    app.state.redis = Redis(connection_pool=app.state.redis_pool)
+    app.state.db = AsyncDatabase(DB_PATH)
+    app.state.query_engine = None
+    app.state.query_engine_lock = asyncio.Lock()
+    yield
+    app.state.db.close()
+    app.state.redis_pool.disconnect()
+
+
+app = FastAPI(title="Warscribe API", version="1.0.0", lifespan=lifespan)
+
+
+def _get_queue(resource_class="io", priority="normal"):
+    return get_queue(app.state.redis, resource_class, priority)
 
 
 def _get_db():
-    return Database(DB_PATH)
+    return app.state.db
+
+
+async def _get_query_engine():
+    # Loading Chroma and the embedding model is slow, so do it once, off-loop
+    async with app.state.query_engine_lock:
+        if app.state.query_engine is None:
+            app.state.query_engine = await asyncio.to_thread(
+                QueryEngine, db_path=DB_PATH
+            )
+    return app.state.query_engine
 
 
 # ── Request / Response Models ──────────────────────────────
@@ -36,84 +74,254 @@ def _get_db():
 
 class JobRequest(BaseModel):
     url: str
+    # 'high' or 'normal'; when omitted, short videos are prioritised
+    # automatically once their duration is known
+    priority: Optional[str] = None
+    # Whisper decoding profile (transcriber.PROFILES); default WHISPER_PROFILE
+    profile: Optional[Literal["fast", "accurate"]] = None
 
 
 class QueryRequest(BaseModel):
     question: str
     video_id: Optional[str] = None
+    # Seconds into the video; negative counts back from its end (needs video_id)
+    start: Optional[float] = None
+    end: Optional[float] = None
+    source_type: Optional[Literal["transcript", "document"]] = None
+    source: Optional[str] = None  # ingested file name
 
 
 class IngestRequest(BaseModel):
     file_path: str
     source_id: Optional[str] = None
+    pattern: str = "*.txt"  # directory ingest only
 
 
 # ── Job Endpoints ──────────────────────────────────────────
 
 
 @app.post("/jobs", status_code=201)
-def submit_job(req: JobRequest):
-    """Submit a YouTube URL for processing."""
+async def submit_job(req: JobRequest, response: Response):
+    """Submit a YouTube URL for processing.
+
+    Known URL shapes are resolved to a video id up front; resubmitting a
+    video that is already queued, running or completed returns the
+    existing job (200) without enqueuing anything.
+    """
+    if req.priority is not None and req.priority not in PRIORITIES:
+        raise HTTPException(status_code=422, detail=f"Unknown priority: {req.priority}")
+
+    db = _get_db()
+    url = req.url
+    video_id = extract_video_id(url)
+    if not video_id and JOB_BACKEND == "daemon":
+        # The daemon polls jobs by id, so resolve unusual URL shapes now
+        from downloader import Downloader
+
+        downloader = Downloader(INPUT_DIR, db_path=DB_PATH)
+        try:
+            video_id = await asyncio.to_thread(downloader.get_video_id, url)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if video_id:
+        url = canonical_url(video_id)
+        created, job = await db.submit_job(video_id, url, req.profile)
+        if not created:
+            response.status_code = 200
+            return {
+                "message": "Job already exists",
+                "video_id": video_id,
+                "status": job["status"],
+                "url": job["url"],
+            }
+        if JOB_BACKEND == "daemon":
+            return {"message": "Job queued", "url": url, "video_id": video_id}
+
     from worker import task_download
 
-    q = _get_queue()
-    rq_job = q.enqueue(task_download, req.url, job_timeout="6h")
-    return {"message": "Job enqueued", "rq_job_id": rq_job.id, "url": req.url}
+    q = _get_queue("io", req.priority or "normal")
+    try:
+        rq_job = await asyncio.to_thread(
+            q.enqueue,
+            task_download,
+            url,
+            req.priority,
+            req.profile,
+            job_timeout="6h",
+        )
+    except Exception:
+        # Don't leave a pending row behind that would swallow resubmissions
+        if video_id:
+            await db.update_job_status(video_id, "failed")
+        raise
+    return {
+        "message": "Job enqueued",
+        "rq_job_id": rq_job.id,
+        "url": url,
+        "video_id": video_id,
+    }
 
 
 @app.get("/jobs")
-def list_jobs():
+async def list_jobs():
     """List all warscribe processing jobs."""
     db = _get_db()
-    return db.list_jobs()
+    return await db.list_jobs()
 
 
 @app.get("/jobs/{video_id}")
-def get_job(video_id: str):
+async def get_job(video_id: str):
     """Get status of a specific job."""
     db = _get_db()
-    job = db.get_job(video_id)
+    job = await db.get_job(video_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
 
+@app.get("/jobs/{video_id}/progress")
+async def get_job_progress(video_id: str):
+    """Segment counts, transcription coverage and per-stage throughput for a job."""
+    db = _get_db()
+    progress = await db.get_job_progress(video_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return progress
+
+
+@app.get("/jobs/{video_id}/spikes")
+async def get_chat_spikes(video_id: str, top_k: int = 10, window: float = 30.0):
+    """Top-K chat activity spikes for a video, from its chat rollup."""
+    db = _get_db()
+    if not await db.get_job(video_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if top_k < 1 or window <= 0:
+        raise HTTPException(status_code=422, detail="top_k and window must be positive")
+    spikes = await db.run(get_spikes, db.db, video_id, top_k, window)
+    return {"video_id": video_id, "window": window, "spikes": spikes}
+
+
+@app.get("/jobs/{video_id}/export")
+async def export_job(
+    video_id: str,
+    fmt: str = Query("ndjson", alias="format"),
+    kinds: str = ",".join(KINDS),
+):
+    """Stream a video's segments, chat and extracted events.
+
+    format is ndjson (default; any of the comma separated kinds in one
+    stream), or arrow / parquet for a single kind. Rows are read in batches
+    from a server-side cursor, so large videos export in constant memory.
+    """
+    db = _get_db()
+    if not await db.get_job(video_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    kind_list = [k.strip() for k in kinds.split(",") if k.strip()]
+    try:
+        chunks = export(db.db, video_id, fmt, kind_list)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=501, detail=f"{fmt} export needs pyarrow")
+    name = video_id if fmt == "ndjson" else f"{video_id}-{kind_list[0]}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
 # ── RAG Query Endpoints ───────────────────────────────────
 
 
 @app.post("/query")
-def rag_query(req: QueryRequest):
+async def rag_query(req: QueryRequest):
     """Query the RAG system with a natural language question."""
-    engine = QueryEngine(db_path=DB_PATH)
-    answer = engine.query(req.question, video_id=req.video_id)
-    return {"question": req.question, "answer": answer, "video_id": req.video_id}
+    engine = await _get_query_engine()
+    filters = req.model_dump(exclude={"question", "video_id"}, exclude_none=True)
+    try:
+        answer = await asyncio.to_thread(
+            engine.query, req.question, video_id=req.video_id, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "question": req.question,
+        "answer": answer,
+        "video_id": req.video_id,
+        "filters": filters,
+    }
 
 
 # ── Ingestion Endpoint ────────────────────────────────────
 
 
 @app.post("/ingest")
-def ingest_file(req: IngestRequest):
-    """Ingest a text file from the input volume into ChromaDB."""
+async def ingest_file(req: IngestRequest):
+    """Ingest a text file, or every matching file in a directory, into ChromaDB."""
     if not os.path.exists(req.file_path):
         raise HTTPException(status_code=404, detail=f"File not found: {req.file_path}")
 
-    from ingest_text import ingest_text_file
+    from ingest_text import ingest_directory, ingest_text_file
+
+    if os.path.isdir(req.file_path):
+        stats = await asyncio.to_thread(
+            ingest_directory, req.file_path, db_path=DB_PATH, pattern=req.pattern
+        )
+        return {"message": f"Ingested {stats['chunks']} chunks", **stats}
 
     source_id = req.source_id or os.path.basename(req.file_path)
-    count = ingest_text_file(req.file_path, source_id=source_id, db_path=DB_PATH)
+    count = await asyncio.to_thread(
+        ingest_text_file, req.file_path, source_id=source_id, db_path=DB_PATH
+    )
     return {"message": f"Ingested {count} chunks", "source_id": source_id}
 
 
+# ── Queue Metrics ─────────────────────────────────────────
+
+
+@app.get("/queues")
+async def get_queue_stats():
+    """Depth, workers and wait times per resource-class queue, for pool sizing."""
+    return await asyncio.to_thread(queue_stats, app.state.redis)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Pipeline metrics from the API and every worker, in Prometheus text format."""
+
+    def collect():
+        try:
+            for q in queue_stats(app.state.redis):
+                labels = {"queue": q["queue"]}
+                metrics.set_gauge(
+                    "warscribe_queue_depth", q["depth"], "Jobs waiting", **labels
+                )
+                metrics.set_gauge(
+                    "warscribe_queue_workers",
+                    q["workers"],
+                    "Workers listening",
+                    **labels,
+                )
+        except Exception as e:
+            # Redis down: still serve the stage metrics
+            log.warning("Could not read queue stats for /metrics: %s", e)
+        return metrics.render_prometheus()
+
+    return PlainTextResponse(
+        await asyncio.to_thread(collect),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 # ── Health ─────────────────────────────────────────────────
 
 
 @app.get("/health")
-def health():
+async def health():
     """Health check endpoint."""
     try:
-        conn = Redis.from_url(REDIS_URL)
-        conn.ping()
+        await asyncio.to_thread(app.state.redis.ping)
         redis_ok = True
     except Exception:
         redis_ok = False
@@ -0,0 +1,132 @@
+"""
+Warscribe archive — compressed cold storage for completed jobs.
+
+Archiving a completed video packs its segment transcripts, LLM output and
+chat into compressed per-video blocks in the archive_blocks table, one
+block per ARCHIVE_BLOCK_SECONDS of the recording, and drops the plain-text
+copies. Segment rows themselves (times, statuses, ids referenced by
+actions and embeddings) stay in place.
+
+Reads stay transparent: Database.get_segments, get_chat_for_segment and
+iter_chat_messages decode the blocks they need, and decoded blocks are kept
+in a process-wide LRU cache (ARCHIVE_CACHE_BLOCKS blocks).
+
+Blocks are zstd-compressed when the zstandard package is installed and
+zlib-compressed otherwise; the codec is stored per block.
+
+Usage:
+    python archive.py archive <video_id>
+    python archive.py sweep [--older-than-days 7] [--vacuum]
+    python archive.py restore <video_id>
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+log = logging.getLogger("warscribe.archive")
+
+BLOCK_SECONDS = float(os.environ.get("ARCHIVE_BLOCK_SECONDS", "600"))
+CACHE_BLOCKS = int(os.environ.get("ARCHIVE_CACHE_BLOCKS", "64"))
+ZSTD_LEVEL = 10
+
+
+def encode_block(rows):
+    """Compress a list of row tuples; returns (codec, data, raw_bytes)."""
+    raw = json.dumps(rows, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+        return "zstd", data, len(raw)
+    return "zlib", zlib.compress(raw, 9), len(raw)
+
+
+def decode_block(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("archive block is zstd-compressed; install zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+    else:
+        raise ValueError(f"Unknown archive codec: {codec}")
+    return tuple(tuple(row) for row in json.loads(raw))
+
+
+def read_block(db_path, video_id, kind, block):
+    """Decoded rows of one archive block, straight from the database."""
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        "SELECT codec, data FROM archive_blocks WHERE video_id = ? AND kind = ? AND block = ?",
+        (video_id, kind, block),
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return ()
+    return decode_block(*row)
+
+
+@functools.lru_cache(maxsize=CACHE_BLOCKS)
+def load_block(db_path, video_id, kind, block, created_at):
+    """read_block through the LRU cache.
+
+    created_at is part of the cache key, so a block that was restored and
+    archived again is never served stale.
+    """
+    return read_block(db_path, video_id, kind, block)
+
+
+def sweep(db, older_than_days=7.0):
+    """Archive every completed job untouched for older_than_days."""
+    totals = {"jobs": 0, "raw_bytes": 0, "stored_bytes": 0}
+    for video_id in db.get_jobs_to_archive(older_than_days):
+        stats = db.archive_job(video_id)
+        if stats is None:
+            continue
+        totals["jobs"] += 1
+        totals["raw_bytes"] += stats["raw_bytes"]
+        totals["stored_bytes"] += stats["stored_bytes"]
+    return totals
+
+
+if __name__ == "__main__":
+    from db import Database
+    from utils import setup_logging
+
+    parser = argparse.ArgumentParser(description="Warscribe cold storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    one = sub.add_parser("archive", help="archive one completed job")
+    one.add_argument("video_id")
+    many = sub.add_parser("sweep", help="archive all old completed jobs")
+    many.add_argument("--older-than-days", type=float, default=7.0)
+    many.add_argument(
+        "--vacuum", action="store_true", help="shrink the database file afterwards"
+    )
+    back = sub.add_parser("restore", help="move an archived job back to plain rows")
+    back.add_argument("video_id")
+    args = parser.parse_args()
+
+    setup_logging()
+    db = Database(os.environ.get("DB_PATH", "warscribe.db"), with_chroma=False)
+    if args.command == "archive":
+        print(db.archive_job(args.video_id) or "not archived (not completed?)")
+    elif args.command == "restore":
+        print("restored" if db.restore_job(args.video_id) else "not archived")
+    else:
+        print(sweep(db, args.older_than_days))
+        if args.vacuum:
+            # Archiving frees pages for reuse; only VACUUM returns them to the OS
+            conn = sqlite3.connect(db.db_path)
+            conn.execute("VACUUM")
+            conn.close()
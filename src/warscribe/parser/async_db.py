@@ -0,0 +1,41 @@
+"""
+Async access to the Warscribe SQLite database for the API.
+
+Every call is executed on a single dedicated DB thread, so request handlers
+never block the event loop and SQLite connections never cross threads.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from db import Database
+
+
+class AsyncDatabase:
+    def __init__(self, db_path="warscribe.db"):
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="warscribe-db"
+        )
+        # The API only needs SQLite here; vector search goes through QueryEngine
+        self.db = Database(db_path, with_chroma=False)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the DB thread and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return call
+
+    def close(self):
+        self._executor.shutdown(wait=True)
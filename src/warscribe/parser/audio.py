@@ -0,0 +1,290 @@
+"""
+Audio helpers shared by the download and transcription stages.
+
+Whisper consumes 16 kHz mono float32 samples, so audio is converted to that
+shape once at download time rather than on every decode.
+"""
+
+import mmap
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# ffmpeg output options per download format, applied by yt-dlp's
+# ExtractAudio postprocessor (and reused by the benchmarks)
+FFMPEG_OUTPUT_ARGS = {
+    "wav": ["-ar", str(SAMPLE_RATE), "-ac", "1", "-c:a", "pcm_s16le"],
+    "opus": ["-ar", str(SAMPLE_RATE), "-ac", "1", "-b:a", "32k"],
+}
+
+
+def npy_path(input_dir, video_id):
+    """Location of the optional pre-decoded float32 copy of a video's audio."""
+    return os.path.join(input_dir, f"{video_id}.npy")
+
+
+def export_npy(audio_path, out_path, block_bytes=4 * 1024 * 1024):
+    """Decode audio_path to 16 kHz mono float32 and save it as an .npy file.
+
+    ffmpeg output is streamed to disk in blocks, so memory use does not
+    depend on the length of the recording. The result can be opened with
+    ``np.load(out_path, mmap_mode="r")``.
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        audio_path,
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-",
+    ]
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    with tempfile.TemporaryFile(dir=out_dir) as raw:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        shutil.copyfileobj(proc.stdout, raw, block_bytes)
+        _, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg decode failed: {stderr.decode().strip()}")
+
+        n_samples = raw.tell() // 4
+        raw.seek(0)
+        tmp_path = f"{out_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.lib.format.write_array_header_1_0(
+                    f, {"descr": "<f4", "fortran_order": False, "shape": (n_samples,)}
+                )
+                shutil.copyfileobj(raw, f, block_bytes)
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            # Don't leave a partial file behind for find_audio or a retry
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return out_path
+
+
+def _wav_data_layout(path):
+    """Return (offset, n_samples) of the sample data if path is 16 kHz mono
+    16-bit PCM WAV, else None."""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt_ok = False
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id = chunk[:4]
+            size = int.from_bytes(chunk[4:], "little")
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                audio_format = int.from_bytes(fmt[0:2], "little")
+                channels = int.from_bytes(fmt[2:4], "little")
+                rate = int.from_bytes(fmt[4:8], "little")
+                bits = int.from_bytes(fmt[14:16], "little")
+                fmt_ok = (audio_format, channels, rate, bits) == (1, 1, SAMPLE_RATE, 16)
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if not fmt_ok:
+                    return None
+                offset = f.tell()
+                # Streamed WAVs may carry a placeholder size; trust the file length
+                available = os.path.getsize(path) - offset
+                if size == 0 or size > available:
+                    size = available
+                return offset, size // 2
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+
+def open_pcm(path):
+    """Memory-map pre-decoded 16 kHz mono audio without reading it into RAM.
+
+    Supports the float32 .npy written by export_npy and 16 kHz mono 16-bit
+    WAV as produced by the download stage. Returns None for other formats.
+    """
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    if path.endswith(".wav"):
+        layout = _wav_data_layout(path)
+        if layout:
+            offset, n_samples = layout
+            return np.memmap(
+                path, dtype="<i2", mode="r", offset=offset, shape=(n_samples,)
+            )
+    return None
+
+
+def to_float32(samples):
+    """Copy a slice of mapped samples into a float32 array in [-1, 1]."""
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    return np.array(samples, dtype=np.float32)
+
+
+def release_pages(samples, end):
+    """Drop mapped pages for samples[:end] from this process's resident set.
+
+    Pages of a memory map that have been read count toward RSS until the
+    kernel reclaims them; advising that consumed audio is no longer needed
+    keeps RSS flat however long the recording is.
+    """
+    mm = getattr(samples, "_mmap", None)
+    if mm is None or not hasattr(mm, "madvise"):
+        return
+    # np.memmap maps from an allocation-granularity boundary below its offset
+    start = samples.offset % mmap.ALLOCATIONGRANULARITY
+    length = start + end * samples.itemsize
+    length -= length % mmap.PAGESIZE
+    if length > 0:
+        mm.madvise(mmap.MADV_DONTNEED, 0, length)
+
+
+def transcribe_windowed(
+    model, samples, start_time=0.0, window_seconds=300, min_silence=None, **options
+):
+    """Transcribe mapped samples window by window, yielding (start, end, text).
+
+    Only one window of audio is resident at a time, so memory use does not
+    grow with the length of the recording. The last segment of each window
+    may be cut off by the window edge, so it is dropped and the next window
+    starts where it began.
+
+    With min_silence (seconds), stretches of at least that long with no
+    segment are yielded too, as (start, end, None), merged across window
+    edges. Meant for VAD-filtered decoding, where such gaps are the
+    non-speech audio the model skipped.
+    """
+    window = int(window_seconds * SAMPLE_RATE)
+    total = len(samples)
+    pos = int(start_time * SAMPLE_RATE)
+    silence = None  # (start, end) not yet yielded, may continue into the next window
+    while pos < total:
+        end = min(total, pos + window)
+        segments, _ = model.transcribe(to_float32(samples[pos:end]), **options)
+        segments = list(segments)
+        offset = pos / SAMPLE_RATE
+
+        next_pos = end
+        if end < total and segments and segments[-1].start > 0:
+            next_pos = pos + int(segments.pop().start * SAMPLE_RATE)
+
+        covered = offset
+        for seg in segments:
+            if min_silence is not None:
+                silence = _extend_silence(silence, covered, offset + seg.start)
+                if silence and silence[1] - silence[0] >= min_silence:
+                    yield silence[0], silence[1], None
+                silence = None
+                covered = offset + seg.end
+            yield offset + seg.start, offset + seg.end, seg.text
+        if min_silence is not None:
+            silence = _extend_silence(silence, covered, next_pos / SAMPLE_RATE)
+        release_pages(samples, next_pos)
+        pos = next_pos
+    if silence and silence[1] - silence[0] >= min_silence:
+        yield silence[0], silence[1], None
+
+
+def _extend_silence(silence, start, end):
+    """Grow a pending silent stretch by [start, end), or start a new one."""
+    if end <= start:
+        return silence
+    if silence and silence[1] >= start:
+        return silence[0], end
+    return start, end
+
+
+class PcmTail:
+    """Read raw 16 kHz mono s16le audio that another process is still writing.
+
+    Used for live streams: ffmpeg appends to the file while windows are
+    read from it by sample offset. The tail also remembers when each part
+    of the file appeared, so callers can measure lag from capture to output.
+    The arrival records are shared by the reading and writing threads of a
+    live session, so every access holds the lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._arrivals = deque()  # (samples available, wall time first seen)
+        self._lock = threading.Lock()
+
+    def available(self):
+        try:
+            n = os.path.getsize(self.path) // 2
+        except OSError:
+            n = 0
+        with self._lock:
+            if not self._arrivals or n > self._arrivals[-1][0]:
+                self._arrivals.append((n, time.time()))
+        return n
+
+    def wait_for(self, n_samples, done, poll_interval=0.25):
+        """Block until n_samples exist or done is set; returns samples available."""
+        while self.available() < n_samples and not done.is_set():
+            time.sleep(poll_interval)
+        return self.available()
+
+    def read(self, start, count):
+        with open(self.path, "rb") as f:
+            f.seek(start * 2)
+            data = f.read(count * 2)
+        return np.frombuffer(data[: len(data) // 2 * 2], dtype="<i2")
+
+    def arrival_time(self, sample):
+        """Wall time at which sample was first seen on disk."""
+        with self._lock:
+            for n, seen in self._arrivals:
+                if n >= sample:
+                    return seen
+        return time.time()
+
+    def forget(self, before):
+        """Drop arrival records for samples before `before`; they won't be asked for."""
+        with self._lock:
+            while len(self._arrivals) > 1 and self._arrivals[1][0] <= before:
+                self._arrivals.popleft()
+
+
+def probe_duration(path):
+    """Duration of an audio file in seconds, or None if it can't be determined."""
+    samples = open_pcm(path)
+    if samples is not None:
+        return len(samples) / SAMPLE_RATE
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "csv=p=0",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,167 @@
+"""
+Chat compaction for LLM prompts.
+
+During hype moments a segment's chat is mostly the same few lines repeated
+by hundreds of viewers. Before chat goes into an extraction prompt it is:
+
+- stripped of emotes (``:shortcode:`` emoji, pictographs, Twitch emote words)
+  and of character and word repetition ("GOOOOO", "LUL LUL LUL")
+- collapsed by normalized text, so duplicates and near-duplicates become one
+  line with a count
+- capped per segment, keeping the lines most relevant to the game and to
+  what is being said in the transcript
+"""
+
+import math
+import os
+import re
+
+from utils import estimate_tokens
+
+MAX_MESSAGES = int(os.environ.get("LLM_CHAT_MAX_MESSAGES", "40"))
+
+_SHORTCODE = re.compile(r":[\w-]+:")
+_PICTOGRAPH = re.compile(
+    r"[\U0001f000-\U0001faff\u2600-\u27bf\u2b00-\u2bff\ufe0f\u200d]"
+)
+# Letters only: "2000 points" and "needs a 11" must keep their digits
+_ELONGATION = re.compile(r"([^\W\d_])\1{2,}")
+_REPEAT = re.compile(r"([^\W\d_])\1+")
+_WORD = re.compile(r"\w+")
+
+# Common Twitch/YouTube emote names that are typed as plain words
+EMOTE_WORDS = frozenset(
+    {
+        "kappa",
+        "lul",
+        "omegalul",
+        "kekw",
+        "pogchamp",
+        "pepega",
+        "pepehands",
+        "monkas",
+        "biblethump",
+        "residentsleeper",
+        "4head",
+        "trihard",
+        "jebaited",
+        "notlikethis",
+        "sadge",
+        "copium",
+        "hypers",
+    }
+)
+
+# Words that make a chat line likely to say something about the game
+GAME_TERMS = frozenset(
+    {
+        "move",
+        "moved",
+        "shoot",
+        "shooting",
+        "shot",
+        "charge",
+        "charged",
+        "fight",
+        "advance",
+        "fall",
+        "consolidate",
+        "pile",
+        "heroic",
+        "stratagem",
+        "ability",
+        "objective",
+        "turn",
+        "phase",
+        "roll",
+        "rolled",
+        "dice",
+        "hit",
+        "hits",
+        "wound",
+        "wounds",
+        "save",
+        "saves",
+        "damage",
+        "mortal",
+        "reroll",
+        "cp",
+        "points",
+        "vp",
+        "inches",
+    }
+)
+
+
+def clean_message(text):
+    """Text with emotes and repetition stripped; empty if nothing is left."""
+    text = _PICTOGRAPH.sub(" ", _SHORTCODE.sub(" ", text))
+    text = _ELONGATION.sub(r"\1\1", text)
+    words = []
+    for word in text.split():
+        if word.lower().strip(".,!?") in EMOTE_WORDS:
+            continue
+        if words and word.lower() == words[-1].lower():
+            continue  # "LETS GO GO GO GO"
+        words.append(word)
+    return " ".join(words)
+
+
+def _key(text):
+    """Near-duplicate key: case, punctuation and repeated letters ignored."""
+    return " ".join(_REPEAT.sub(r"\1", w) for w in _WORD.findall(text.lower()))
+
+
+def compact_chat(messages, transcript="", max_messages=MAX_MESSAGES):
+    """Compact chat messages (dicts with author and message) into prompt lines.
+
+    Returns (chat_text, stats). stats counts messages and estimated tokens
+    before and after; "before" is the plain "author: message" join.
+    """
+    tokens_before = estimate_tokens(
+        "\n".join(f"{m['author']}: {m['message']}" for m in messages)
+    )
+
+    groups = {}  # key -> [first index, text, first author, count, authors]
+    for i, m in enumerate(messages):
+        text = clean_message(m["message"] or "")
+        key = _key(text)
+        if not key:
+            continue
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [i, text, m["author"], 1, {m["author"]}]
+        else:
+            group[3] += 1
+            group[4].add(m["author"])
+
+    # Longer words only, so "the" and "and" don't count as on topic
+    spoken = {w for w in _WORD.findall(transcript.lower()) if len(w) > 3}
+
+    def relevance(group):
+        # The raw words: _key's collapsed letters ("rol") would never match
+        words = set(_WORD.findall(group[1].lower()))
+        return (
+            2.0 * len(words & GAME_TERMS)
+            + 1.0 * len(words & spoken - GAME_TERMS)
+            + math.log1p(len(group[4]))
+            + min(len(words), 12) / 12
+        )
+
+    kept = sorted(groups.values(), key=relevance, reverse=True)[:max_messages]
+    lines = []
+    for _, text, author, count, authors in sorted(kept, key=lambda g: g[0]):
+        if count == 1:
+            lines.append(f"{author}: {text}")
+        else:
+            lines.append(f"{text} (x{count}, {len(authors)} viewers)")
+
+    chat_text = "\n".join(lines)
+    tokens_after = estimate_tokens(chat_text)
+    return chat_text, {
+        "messages_in": len(messages),
+        "messages_out": len(lines),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+    }
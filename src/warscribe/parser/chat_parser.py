@@ -1,49 +1,82 @@
+import logging
+import time
+
 from chat_downloader import ChatDownloader
+import metrics
+from chat_rollup import ChatRollup
 from db import Database
 
+log = logging.getLogger("warscribe.chat")
+
 
 class ChatParser:
     def __init__(self, db_path="warscribe.db"):
         self.db_path = db_path
 
-    def process_chat(self, video_id):
-        print(f"Processing chat for {video_id} using ChatDownloader...")
-        db = Database(self.db_path)
+    def process_chat(self, video_id, time_origin=None, flush_seconds=None, stop=None):
+        """Download a video's chat into chat_messages and its chat_buckets rollup.
+
+        For live streams pass time_origin, the wall time (epoch seconds)
+        that audio offset 0 corresponds to, so messages without a replay
+        offset are placed on the same timeline as the transcript. Batches
+        are then also written every flush_seconds, and stop (an Event) ends
+        the download early.
+        """
+        log.info("Processing chat for %s using ChatDownloader", video_id)
+        db = Database(self.db_path, with_chroma=False)
         url = db.get_job_url(video_id)
         if not url:
-            print(f"No URL found for job {video_id}")
+            log.warning("No URL found for job %s", video_id)
             return
 
-        print(f"Fetching chat from {url}...")
+        log.info("Fetching chat from %s", url)
         try:
             downloader = ChatDownloader()
             chat = downloader.get_chat(url)  # Returns a generator
 
+            rollup = ChatRollup()
             messages = []
             count = 0
+            flushed = time.monotonic()
             for message in chat:
                 # ChatDownloader returns dicts with various fields.
                 # We need: video_id, timestamp (sec), author, message
 
-                ts = message.get("time_in_seconds", 0)
+                ts = message.get("time_in_seconds")
+                if ts is None and time_origin is not None and "timestamp" in message:
+                    # Live messages carry a wall-clock timestamp in microseconds
+                    ts = message["timestamp"] / 1e6 - time_origin
                 author = message.get("author", {}).get("name", "Anonymous")
                 text = message.get("message", "")
 
                 if text:
-                    messages.append((video_id, float(ts), author, text))
+                    messages.append((video_id, float(ts or 0), author, text))
+                    rollup.add(float(ts or 0), author, text)
                     count += 1
 
-                if len(messages) >= 100:  # Batch insert
+                if len(messages) >= 100 or (
+                    messages
+                    and flush_seconds
+                    and time.monotonic() - flushed >= flush_seconds
+                ):  # Batch insert
                     db.add_chat_messages(messages)
+                    db.save_chat_buckets(
+                        video_id, rollup.bucket_seconds, rollup.pending()
+                    )
                     messages = []
+                    flushed = time.monotonic()
+                if stop is not None and stop.is_set():
+                    break
 
             if messages:
                 db.add_chat_messages(messages)
+                db.save_chat_buckets(video_id, rollup.bucket_seconds, rollup.pending())
 
-            print(f"Finished processing chat. Total {count} messages.")
+            metrics.inc("warscribe_chat_messages_total", count, "Chat messages stored")
+            log.info("Finished processing chat. Total %d messages.", count)
 
         except Exception as e:
-            print(f"Error downloading chat: {e}")
+            log.error("Error downloading chat: %s", e)
 
 
 if __name__ == "__main__":
@@ -51,5 +84,8 @@ if __name__ == "__main__":
 
     # Usage: python src/chat_parser.py <video_id>
     if len(sys.argv) > 1:
+        from utils import setup_logging
+
+        setup_logging()
         cp = ChatParser()
         cp.process_chat(sys.argv[1])
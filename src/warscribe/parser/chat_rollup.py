@@ -0,0 +1,178 @@
+"""
+Per-video chat rollup: message counts, unique authors and hype keyword hits
+per fixed time bucket, and the spike windows they point to.
+
+The rollup is built in the same pass that stores chat at ingest, so finding
+highlight moments is a read of a few hundred rows instead of a scan of every
+message (or an LLM call).
+
+Usage:
+    python chat_rollup.py rebuild <video_id>
+    python chat_rollup.py spikes <video_id> [--top 10] [--window 30]
+"""
+
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from db import Database
+
+BUCKET_SECONDS = float(os.environ.get("CHAT_BUCKET_SECONDS", "10"))
+
+# Chat reactions that mark a hype moment, matched as whole words
+DEFAULT_KEYWORDS = (
+    "pog",
+    "poggers",
+    "pogchamp",
+    "hype",
+    "wow",
+    "omg",
+    "no way",
+    "lol",
+    "lmao",
+    "kekw",
+    "gg",
+    "clutch",
+    "insane",
+)
+
+
+def keyword_pattern(keywords=None):
+    """Compiled whole-word, case-insensitive matcher for the hype keywords.
+
+    Defaults to CHAT_KEYWORDS (comma separated) or DEFAULT_KEYWORDS.
+    """
+    if keywords is None:
+        env = os.environ.get("CHAT_KEYWORDS")
+        keywords = [k.strip() for k in env.split(",")] if env else DEFAULT_KEYWORDS
+    alternatives = "|".join(re.escape(k) for k in keywords if k)
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)", re.IGNORECASE)
+
+
+class ChatRollup:
+    """Accumulates chat messages into time buckets as they are ingested.
+
+    Call add() per message and pending() to get the rows of every bucket
+    that changed since the last call, with totals so far, ready for
+    Database.save_chat_buckets.
+    """
+
+    def __init__(self, bucket_seconds=BUCKET_SECONDS, keywords=None):
+        self.bucket_seconds = bucket_seconds
+        self._keywords = keyword_pattern(keywords)
+        self._buckets = {}  # bucket start -> [messages, authors, keyword hits]
+        self._dirty = set()
+
+    def add(self, timestamp, author, message):
+        start = (timestamp // self.bucket_seconds) * self.bucket_seconds
+        bucket = self._buckets.get(start)
+        if bucket is None:
+            bucket = self._buckets[start] = [0, set(), 0]
+        bucket[0] += 1
+        bucket[1].add(author)
+        bucket[2] += len(self._keywords.findall(message))
+        self._dirty.add(start)
+
+    def pending(self):
+        """(bucket_start, messages, unique_authors, keyword_hits) for changed buckets."""
+        rows = [
+            (
+                start,
+                self._buckets[start][0],
+                len(self._buckets[start][1]),
+                self._buckets[start][2],
+            )
+            for start in sorted(self._dirty)
+        ]
+        self._dirty.clear()
+        return rows
+
+
+def find_spikes(
+    buckets, bucket_seconds, top_k=10, window_seconds=30.0, keyword_weight=2.0
+):
+    """Top-K non-overlapping windows where chat is busiest relative to normal.
+
+    buckets are (bucket_start, messages, unique_authors, keyword_hits) rows.
+    A window's activity is its messages plus keyword_weight per keyword hit;
+    its score is that activity over what a typical (median) stretch of the
+    same length holds, so a score of 4 means four times the usual chat.
+    """
+    if not buckets:
+        return []
+    span = max(1, round(window_seconds / bucket_seconds))
+    by_index = {round(row[0] / bucket_seconds): row for row in buckets}
+    activity = sorted(row[1] + keyword_weight * row[3] for row in buckets)
+    baseline = max(activity[len(activity) // 2] * span, 1.0)
+
+    candidates = []
+    for index in by_index:
+        rows = [by_index[i] for i in range(index, index + span) if i in by_index]
+        messages = sum(r[1] for r in rows)
+        hits = sum(r[3] for r in rows)
+        candidates.append(
+            {
+                "start": index * bucket_seconds,
+                "end": (index + span) * bucket_seconds,
+                "score": round((messages + keyword_weight * hits) / baseline, 3),
+                "messages": messages,
+                "peak_authors": max(r[2] for r in rows),
+                "keyword_hits": hits,
+            }
+        )
+
+    spikes = []
+    for window in sorted(candidates, key=lambda w: (-w["score"], w["start"])):
+        if len(spikes) >= top_k:
+            break
+        if all(
+            window["end"] <= s["start"] or window["start"] >= s["end"] for s in spikes
+        ):
+            spikes.append(window)
+    return sorted(spikes, key=lambda w: w["start"])
+
+
+def get_spikes(
+    db, video_id, top_k=10, window_seconds=30.0, bucket_seconds=BUCKET_SECONDS
+):
+    """find_spikes over a video's stored rollup."""
+    buckets = db.get_chat_buckets(video_id, bucket_seconds)
+    return find_spikes(buckets, bucket_seconds, top_k, window_seconds)
+
+
+def rebuild(db, video_id, bucket_seconds=BUCKET_SECONDS):
+    """Recompute a video's rollup from its stored chat, e.g. for older videos."""
+    rollup = ChatRollup(bucket_seconds)
+    for timestamp, author, message in db.iter_chat_messages(video_id):
+        rollup.add(timestamp, author, message or "")
+    rows = rollup.pending()
+    db.save_chat_buckets(video_id, bucket_seconds, rows, replace=True)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from utils import setup_logging
+
+    parser = argparse.ArgumentParser(description="Warscribe chat rollup")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="recompute a video's rollup")
+    rebuild_cmd.add_argument("video_id")
+    spikes_cmd = sub.add_parser("spikes", help="print a video's top chat spikes")
+    spikes_cmd.add_argument("video_id")
+    spikes_cmd.add_argument("--top", type=int, default=10)
+    spikes_cmd.add_argument("--window", type=float, default=30.0, help="seconds")
+    args = parser.parse_args()
+
+    setup_logging()
+    db = Database(os.environ.get("DB_PATH", "warscribe.db"), with_chroma=False)
+    if args.command == "rebuild":
+        print(f"{rebuild(db, args.video_id)} buckets")
+    else:
+        for spike in get_spikes(db, args.video_id, args.top, args.window):
+            print(
+                f"{spike['start']:>8.0f}s-{spike['end']:.0f}s  x{spike['score']:<6} "
+                f"{spike['messages']} msgs, {spike['keyword_hits']} hype"
+            )
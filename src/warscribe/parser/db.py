@@ -1,72 +1,70 @@
+import heapq
+import logging
 import sqlite3
 import os
+import time
 import chromadb
-from chromadb.utils import embedding_functions
+
+import archive
+import embeddings
+import metrics
+import vector_index
+from migrations import migrate
+
+log = logging.getLogger("warscribe.db")
 
 
 class Database:
-    def __init__(self, db_path="warscribe.db", chroma_path=None):
+    def __init__(self, db_path="warscribe.db", chroma_path=None, with_chroma=True):
         self.db_path = db_path
         self._init_db()
-        chroma_dir = chroma_path or os.environ.get("CHROMA_PATH", "warscribe_chroma")
+        self.chroma_client = None
+        self.collection = None
+        if not with_chroma:
+            return
+        backend = vector_index.BACKEND
+        if backend not in ("auto", "chroma", "local"):
+            raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
         try:
-            self.chroma_client = chromadb.PersistentClient(path=chroma_dir)
-            self.embedding_fn = (
-                embedding_functions.SentenceTransformerEmbeddingFunction(
-                    model_name="all-MiniLM-L6-v2"
-                )
-            )
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="transcripts", embedding_function=self.embedding_fn
-            )
+            self.embedding_fn = embeddings.get_embedder()
         except Exception as e:
-            print(f"Warning: ChromaDB initialization failed: {e}")
-            self.chroma_client = None
-
-    def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        # Enable WAL mode for concurrent read access
-        c.execute("PRAGMA journal_mode=WAL")
-
-        # Jobs table: tracks the overall video processing
-        c.execute("""CREATE TABLE IF NOT EXISTS jobs (
-            video_id TEXT PRIMARY KEY,
-            url TEXT,
-            status TEXT, -- 'pending', 'downloading', 'processing', 'completed', 'failed'
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""")
-
-        # Segments table: tracks chunks of the video
-        c.execute("""CREATE TABLE IF NOT EXISTS segments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id TEXT,
-            segment_index INTEGER,
-            start_time REAL,
-            end_time REAL,
-            audio_path TEXT,
-            transcript TEXT,
-            chat_data TEXT,
-            warscribe_json TEXT,
-            status TEXT, -- 'created', 'transcribed', 'analyzed'
-            FOREIGN KEY(video_id) REFERENCES jobs(video_id)
-        )""")
-
-        c.execute("""CREATE TABLE IF NOT EXISTS chat_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id TEXT,
-            timestamp REAL,
-            author TEXT,
-            message TEXT,
-            FOREIGN KEY(video_id) REFERENCES jobs(video_id)
-        )""")
+            log.warning("Embedding model unavailable, vector search disabled: %s", e)
+            return
+        if backend != "local":
+            chroma_dir = chroma_path or os.environ.get(
+                "CHROMA_PATH", "warscribe_chroma"
+            )
+            try:
+                self.chroma_client = chromadb.PersistentClient(path=chroma_dir)
+                self.collection = self.chroma_client.get_or_create_collection(
+                    name="transcripts", embedding_function=self.embedding_fn
+                )
+            except Exception as e:
+                log.warning("ChromaDB initialization failed: %s", e)
+                self.chroma_client = None
+        if self.collection is None and backend != "chroma":
+            try:
+                self.collection = vector_index.LocalCollection(
+                    vector_index.VectorIndex(vector_index.INDEX_PATH), self.embedding_fn
+                )
+                log.info("Using local vector index at %s", vector_index.INDEX_PATH)
+            except Exception as e:
+                log.warning("Local vector index initialization failed: %s", e)
 
-        c.execute(
-            "CREATE INDEX IF NOT EXISTS idx_chat_timestamp ON chat_messages(video_id, timestamp)"
+    def _commit(self, conn):
+        start = time.perf_counter()
+        conn.commit()
+        metrics.observe(
+            "warscribe_sqlite_commit_seconds",
+            time.perf_counter() - start,
+            "SQLite commit latency",
         )
 
-        conn.commit()
+    def _init_db(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        # Enable WAL mode for concurrent read access
+        conn.execute("PRAGMA journal_mode=WAL")
+        migrate(conn)
         conn.close()
 
     def add_job(self, video_id, url):
@@ -76,7 +74,52 @@ class Database:
             "INSERT OR IGNORE INTO jobs (video_id, url, status) VALUES (?, ?, ?)",
             (video_id, url, "pending"),
         )
-        conn.commit()
+        self._commit(conn)
+        conn.close()
+
+    def submit_job(self, video_id, url, profile=None):
+        """Register a job at submit time, atomically.
+
+        Returns (created, job). created is True when the job is new or a
+        previously failed job was reset to 'pending'; False means the video
+        is already queued, in progress or completed. profile is the Whisper
+        profile to transcribe it with (None: the transcriber's default).
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            "INSERT OR IGNORE INTO jobs (video_id, url, status, profile) VALUES (?, ?, ?, ?)",
+            (video_id, url, "pending", profile),
+        )
+        created = c.rowcount == 1
+        if not created:
+            c.execute(
+                """UPDATE jobs SET status = 'pending', url = ?, profile = ?,
+                                   updated_at = CURRENT_TIMESTAMP
+                         WHERE video_id = ? AND status = 'failed'""",
+                (url, profile, video_id),
+            )
+            created = c.rowcount == 1
+            if created:
+                # Give the retry a clean slate; failed units would fail it again
+                c.execute(
+                    """UPDATE work_units SET status = 'pending', attempts = 0, lease_owner = NULL,
+                                             lease_expires = NULL, updated_at = ?
+                             WHERE video_id = ? AND status <> 'done'""",
+                    (time.time(), video_id),
+                )
+        self._commit(conn)
+        c.execute("SELECT * FROM jobs WHERE video_id = ?", (video_id,))
+        job = dict(c.fetchone())
+        conn.close()
+        return created, job
+
+    def set_job_profile(self, video_id, profile):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("UPDATE jobs SET profile = ? WHERE video_id = ?", (profile, video_id))
+        self._commit(conn)
         conn.close()
 
     def update_job_status(self, video_id, status):
@@ -86,8 +129,371 @@ class Database:
             "UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE video_id = ?",
             (status, video_id),
         )
-        conn.commit()
+        self._commit(conn)
+        conn.close()
+
+    def claim_job(
+        self, video_id, from_status, to_status, owner=None, lease_seconds=None
+    ):
+        """Move a job between statuses only if it is still in from_status.
+
+        Returns True if this caller won the job; the compare-and-set makes it
+        safe for several schedulers to poll the same table. With an owner the
+        claim is leased to it for lease_seconds, renewed by heartbeat_job, as
+        work_units leases are; requeue_jobs leaves unexpired claims alone.
+        """
+        expires = time.time() + lease_seconds if owner else None
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            """UPDATE jobs SET status = ?, claim_owner = ?, claim_expires = ?,
+                              updated_at = CURRENT_TIMESTAMP
+                     WHERE video_id = ? AND status = ?""",
+            (to_status, owner, expires, video_id, from_status),
+        )
+        claimed = c.rowcount == 1
+        self._commit(conn)
+        conn.close()
+        return claimed
+
+    def heartbeat_job(self, video_id, owner, lease_seconds):
+        """Extend a job claim; False means it was taken over by someone else."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        c = conn.cursor()
+        c.execute(
+            "UPDATE jobs SET claim_expires = ? WHERE video_id = ? AND claim_owner = ?",
+            (time.time() + lease_seconds, video_id, owner),
+        )
+        held = c.rowcount == 1
+        self._commit(conn)
+        conn.close()
+        return held
+
+    def requeue_jobs(self, from_status, to_status, expired_before=None):
+        """Reset jobs in from_status to to_status; returns how many moved.
+
+        With expired_before, only jobs whose claim lease ended before then,
+        or that were never leased, are moved.
+        """
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        if expired_before is None:
+            c.execute(
+                """UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP
+                         WHERE status = ?""",
+                (to_status, from_status),
+            )
+        else:
+            c.execute(
+                """UPDATE jobs SET status = ?, claim_owner = NULL, claim_expires = NULL,
+                                  updated_at = CURRENT_TIMESTAMP
+                         WHERE status = ? AND (claim_expires IS NULL OR claim_expires < ?)""",
+                (to_status, from_status, expired_before),
+            )
+        moved = c.rowcount
+        self._commit(conn)
+        conn.close()
+        return moved
+
+    def set_job_duration(self, video_id, seconds):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            "UPDATE jobs SET audio_duration = ? WHERE video_id = ?",
+            (seconds, video_id),
+        )
+        self._commit(conn)
+        conn.close()
+
+    def create_work_units(self, video_id, duration, unit_seconds, skip=()):
+        """Split [0, duration) into leasable ranges; a no-op if they exist.
+
+        skip is a list of (start, end) ranges that need no transcription,
+        e.g. audio_matches copied from an earlier upload; units only cover
+        the gaps between them.
+        """
+        unit_seconds = unit_seconds or duration
+        units = []
+        gap_start = 0.0
+        for skip_start, skip_end in sorted(skip) + [(duration, duration)]:
+            t, gap_end = gap_start, min(skip_start, duration)
+            while t < gap_end:
+                units.append((t, min(t + unit_seconds, gap_end)))
+                t += unit_seconds
+            gap_start = max(gap_start, skip_end)
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM work_units WHERE video_id = ? LIMIT 1", (video_id,))
+        if c.fetchone() is None:
+            c.executemany(
+                """INSERT OR IGNORE INTO work_units (video_id, start_time, end_time, status, updated_at)
+                         VALUES (?, ?, ?, 'pending', ?)""",
+                [(video_id, s, e, time.time()) for s, e in units],
+            )
+        self._commit(conn)
+        conn.close()
+
+    def claim_work_unit(self, owner, lease_seconds, video_id=None, max_attempts=3):
+        """Lease the next pending or expired unit to owner, or return None.
+
+        BEGIN IMMEDIATE takes the write lock before reading, so two claimers
+        can never both see the same unit as free.
+        """
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            # Units whose lease ran out too often are given up on
+            c.execute(
+                """UPDATE work_units SET status = 'failed', updated_at = ?
+                         WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""",
+                (now, now, max_attempts),
+            )
+            c.execute(
+                """UPDATE jobs SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+                         WHERE status IN ('downloaded', 'transcribing') AND video_id IN
+                               (SELECT video_id FROM work_units WHERE status = 'failed')"""
+            )
+            c.execute(
+                f"""SELECT * FROM work_units
+                    WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                    {"AND video_id = ?" if video_id else ""}
+                    ORDER BY video_id, start_time LIMIT 1""",
+                (now, video_id) if video_id else (now,),
+            )
+            row = c.fetchone()
+            if row is not None:
+                c.execute(
+                    """UPDATE work_units SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                                             attempts = attempts + 1, updated_at = ?
+                             WHERE id = ?""",
+                    (owner, now + lease_seconds, now, row["id"]),
+                )
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        unit = dict(row)
+        unit.update(
+            status="leased", lease_owner=owner, lease_expires=now + lease_seconds
+        )
+        return unit
+
+    def heartbeat_work_unit(self, unit_id, owner, lease_seconds):
+        """Extend a lease; False means it expired and was taken by someone else."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        c = conn.cursor()
+        now = time.time()
+        c.execute(
+            """UPDATE work_units SET lease_expires = ?, updated_at = ?
+                     WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+            (now + lease_seconds, now, unit_id, owner),
+        )
+        held = c.rowcount == 1
+        self._commit(conn)
         conn.close()
+        return held
+
+    def save_unit_segments(self, unit_id, owner, video_id, audio_path, segments):
+        """Insert transcribed (start, end, text) rows for a leased unit.
+
+        Rows with text None are silence skipped by VAD and are stored with
+        status 'silence' and an empty transcript. The lease is checked inside
+        the same write transaction, so a worker whose lease has been taken
+        over cannot write into the range any more. Returns False, writing
+        nothing, if owner no longer holds the unit.
+        """
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(
+                "SELECT 1 FROM work_units WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (unit_id, owner),
+            )
+            held = c.fetchone() is not None
+            if held and segments:
+                c.executemany(
+                    """INSERT INTO segments (video_id, start_time, end_time, audio_path, transcript, status, transcribed_at)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    [
+                        (
+                            video_id,
+                            start,
+                            end,
+                            audio_path,
+                            "" if text is None else text,
+                            "silence" if text is None else "transcribed",
+                            now,
+                        )
+                        for start, end, text in segments
+                    ],
+                )
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return held
+
+    def complete_work_unit(self, unit_id, owner):
+        """Mark a leased unit done. Returns (held, video_done).
+
+        video_done is True for exactly one caller: the one that finished the
+        last unit of the video, which also moves the job to 'transcribed'.
+        """
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(
+                """UPDATE work_units SET status = 'done', lease_owner = NULL, updated_at = ?
+                         WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+                (now, unit_id, owner),
+            )
+            held = c.rowcount == 1
+            video_done = False
+            if held:
+                c.execute(
+                    """SELECT video_id,
+                              (SELECT COUNT(*) FROM work_units w
+                                WHERE w.video_id = u.video_id AND w.status != 'done')
+                         FROM work_units u WHERE id = ?""",
+                    (unit_id,),
+                )
+                video_id, remaining = c.fetchone()
+                if remaining == 0:
+                    c.execute(
+                        """UPDATE jobs SET status = 'transcribed', updated_at = CURRENT_TIMESTAMP
+                                 WHERE video_id = ? AND status IN ('downloaded', 'transcribing')""",
+                        (video_id,),
+                    )
+                    video_done = c.rowcount == 1
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return held, video_done
+
+    def release_work_unit(self, unit_id, owner):
+        """Give a lease back early so another worker can pick the unit up."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        c = conn.cursor()
+        c.execute(
+            """UPDATE work_units SET status = 'pending', lease_owner = NULL, lease_expires = NULL,
+                                     updated_at = ?
+                     WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+            (time.time(), unit_id, owner),
+        )
+        self._commit(conn)
+        conn.close()
+
+    def get_work_units(self, video_id):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            "SELECT * FROM work_units WHERE video_id = ? ORDER BY start_time",
+            (video_id,),
+        )
+        rows = c.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_segments_needing_analysis(self, video_id, until=None):
+        """Transcribed segments without LLM output, oldest first.
+
+        until limits this to segments ending by that time.
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            """SELECT * FROM segments
+                     WHERE video_id = ? AND warscribe_json IS NULL AND transcript <> ''
+                       AND end_time <= ?
+                     ORDER BY start_time""",
+            (video_id, float("inf") if until is None else until),
+        )
+        rows = c.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_segments_needing_embedding(self, video_id):
+        """Transcribed segments that are not in the vector store yet, oldest first."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            """SELECT * FROM segments
+                     WHERE video_id = ? AND embedded_at IS NULL AND transcript <> ''
+                     ORDER BY start_time""",
+            (video_id,),
+        )
+        rows = c.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_segment_stage_times(self, video_id, stage):
+        """(segment id, completion time) for segments done with a stage.
+
+        stage is 'transcribed', 'analyzed' or 'embedded'.
+        """
+        column = {
+            "transcribed": "transcribed_at",
+            "analyzed": "analyzed_at",
+            "embedded": "embedded_at",
+        }[stage]
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            f"SELECT id, {column} FROM segments WHERE video_id = ? AND {column} IS NOT NULL",
+            (video_id,),
+        )
+        rows = c.fetchall()
+        conn.close()
+        return rows
+
+    def get_last_segment_end(self, video_id, start_time=0.0, end_time=None):
+        """End of the last segment starting within [start_time, end_time)."""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            """SELECT MAX(end_time) FROM segments
+                     WHERE video_id = ? AND start_time >= ? AND start_time < ?""",
+            (video_id, start_time, float("inf") if end_time is None else end_time),
+        )
+        (last,) = c.fetchone()
+        conn.close()
+        return last
+
+    def add_transcribed_segments(self, video_id, audio_path, segments):
+        """Insert (start, end, text) rows in one transaction; returns their ids."""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        now = time.time()
+        ids = []
+        for start, end, text in segments:
+            c.execute(
+                """INSERT INTO segments (video_id, start_time, end_time, audio_path, transcript, status, transcribed_at)
+                         VALUES (?, ?, ?, ?, ?, 'transcribed', ?)""",
+                (video_id, start, end, audio_path, text, now),
+            )
+            ids.append(c.lastrowid)
+        self._commit(conn)
+        conn.close()
+        return ids
 
     def add_segment(self, video_id, start_time, end_time, audio_path):
         conn = sqlite3.connect(self.db_path)
@@ -98,7 +504,7 @@ class Database:
             (video_id, start_time, end_time, audio_path, "created"),
         )
         segment_id = c.lastrowid
-        conn.commit()
+        self._commit(conn)
         conn.close()
         return segment_id
 
@@ -109,6 +515,216 @@ class Database:
         c.execute(
             "SELECT * FROM segments WHERE video_id = ? ORDER BY start_time", (video_id,)
         )
+        rows = [dict(row) for row in c.fetchall()]
+        archived = {
+            seg_id: (transcript, warscribe_json)
+            for seg_id, transcript, warscribe_json in self._archived_rows(
+                c, video_id, "segments"
+            )
+        }
+        conn.close()
+        for row in rows:
+            if row["id"] in archived:
+                row["transcript"], row["warscribe_json"] = archived[row["id"]]
+        return rows
+
+    def get_segments_in_range(self, video_id, start_time, end_time):
+        """Segments overlapping [start_time, end_time), in time order.
+
+        No segment is longer than the video's longest, so start_time is
+        bounded on both sides and the range is read off idx_segments_video_start
+        instead of every earlier segment of the video.
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            """SELECT * FROM segments
+                     WHERE video_id = ? AND start_time < ? AND end_time > ?
+                       AND start_time >= ? - (SELECT MAX(end_time - start_time)
+                                              FROM segments WHERE video_id = ?)
+                     ORDER BY start_time""",
+            (video_id, end_time, start_time, start_time, video_id),
+        )
+        rows = [dict(row) for row in c.fetchall()]
+        archived = {}
+        if any(row["transcript"] is None for row in rows):
+            # Blocks are keyed by segment start, which can be before the window
+            archived = {
+                seg_id: (transcript, warscribe_json)
+                for seg_id, transcript, warscribe_json in self._archived_rows(
+                    c, video_id, "segments", rows[0]["start_time"], end_time
+                )
+            }
+        conn.close()
+        for row in rows:
+            if row["id"] in archived:
+                row["transcript"], row["warscribe_json"] = archived[row["id"]]
+        return rows
+
+    def _archived_rows(self, c, video_id, kind, start_time=None, end_time=None):
+        """Rows of a video's archive blocks overlapping [start_time, end_time)."""
+        c.execute(
+            """SELECT block, created_at FROM archive_blocks
+                     WHERE video_id = ? AND kind = ? AND end_time > ? AND start_time < ?
+                     ORDER BY block""",
+            (
+                video_id,
+                kind,
+                float("-inf") if start_time is None else start_time,
+                float("inf") if end_time is None else end_time,
+            ),
+        )
+        rows = []
+        for block, created_at in c.fetchall():
+            rows.extend(
+                archive.load_block(self.db_path, video_id, kind, block, created_at)
+            )
+        return rows
+
+    def replace_fingerprints(self, video_id, hashes, frames):
+        """Index a video's audio fingerprints, replacing any it had before."""
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("DELETE FROM fingerprints WHERE video_id = ?", (video_id,))
+            c.executemany(
+                "INSERT INTO fingerprints (hash, video_id, frame) VALUES (?, ?, ?)",
+                (
+                    (h, video_id, frame)
+                    for h, frame in zip(hashes.tolist(), frames.tolist())
+                ),
+            )
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def lookup_fingerprints(self, hashes, exclude_video_id, batch_size=500):
+        """(hash, video_id, frame) entries for hashes in other transcribed videos.
+
+        Only videos whose transcription has finished are returned, since
+        only their segments can be copied.
+        """
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        rows = []
+        for i in range(0, len(hashes), batch_size):
+            batch = hashes[i : i + batch_size]
+            c.execute(
+                f"""SELECT f.hash, f.video_id, f.frame
+                      FROM fingerprints f JOIN jobs j ON j.video_id = f.video_id
+                     WHERE f.hash IN ({",".join("?" * len(batch))}) AND f.video_id <> ?
+                       AND j.status IN ('transcribed', 'analyzing', 'analyzed',
+                                        'embedding', 'completed')""",
+                (*batch, exclude_video_id),
+            )
+            rows.extend(c.fetchall())
+        conn.close()
+        return rows
+
+    def copy_segments(
+        self, video_id, source_video_id, start_time, end_time, offset, audio_path
+    ):
+        """Copy another video's segments into [start_time, end_time) of video_id.
+
+        The range is [start_time + offset, end_time + offset) in the source.
+        Segments lying entirely inside it are inserted for video_id, shifted
+        by -offset, with their transcript, LLM output and actions, so they
+        skip transcription and analysis. They are embedded afresh, as vectors
+        are stored per video. The span of the copied segments is recorded
+        in audio_matches and returned, or None if there was nothing to copy.
+        """
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(
+                """SELECT * FROM segments
+                         WHERE video_id = ? AND start_time >= ? AND end_time <= ?
+                           AND status <> 'created'
+                         ORDER BY start_time""",
+                (source_video_id, start_time + offset, end_time + offset),
+            )
+            rows = [dict(row) for row in c.fetchall()]
+            if not rows:
+                conn.rollback()
+                return None
+            if any(row["transcript"] is None for row in rows):
+                archived = {
+                    seg_id: (transcript, warscribe_json)
+                    for seg_id, transcript, warscribe_json in self._archived_rows(
+                        c,
+                        source_video_id,
+                        "segments",
+                        start_time + offset,
+                        end_time + offset,
+                    )
+                }
+                for row in rows:
+                    if row["id"] in archived:
+                        row["transcript"], row["warscribe_json"] = archived[row["id"]]
+
+            for row in rows:
+                c.execute(
+                    """INSERT INTO segments (video_id, start_time, end_time, audio_path, transcript,
+                                             warscribe_json, status, transcribed_at, analyzed_at)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        video_id,
+                        row["start_time"] - offset,
+                        row["end_time"] - offset,
+                        audio_path,
+                        row["transcript"],
+                        row["warscribe_json"],
+                        row["status"],
+                        now,
+                        None if row["warscribe_json"] is None else now,
+                    ),
+                )
+                c.execute(
+                    """INSERT INTO actions (video_id, segment_id, action_type, turn, phase, actor, result, payload)
+                             SELECT ?, ?, action_type, turn, phase, actor, result, payload
+                               FROM actions WHERE segment_id = ? ORDER BY id""",
+                    (video_id, c.lastrowid, row["id"]),
+                )
+
+            match = {
+                "video_id": video_id,
+                "start_time": rows[0]["start_time"] - offset,
+                "end_time": max(row["end_time"] for row in rows) - offset,
+                "source_video_id": source_video_id,
+                "offset": offset,
+                "segments": len(rows),
+            }
+            c.execute(
+                """INSERT OR REPLACE INTO audio_matches
+                         (video_id, start_time, end_time, source_video_id, offset, segments, created_at)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (*match.values(), now),
+            )
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return match
+
+    def get_audio_matches(self, video_id):
+        """Ranges of a video copied from earlier uploads, in time order."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(
+            "SELECT * FROM audio_matches WHERE video_id = ? ORDER BY start_time",
+            (video_id,),
+        )
         rows = c.fetchall()
         conn.close()
         return [dict(row) for row in rows]
@@ -121,9 +737,70 @@ class Database:
             "INSERT INTO chat_messages (video_id, timestamp, author, message) VALUES (?, ?, ?, ?)",
             messages,
         )
-        conn.commit()
+        self._commit(conn)
         conn.close()
 
+    def iter_chat_messages(self, video_id):
+        """Yield (timestamp, author, message) for a video without loading it all."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from conn.execute(
+                "SELECT timestamp, author, message FROM chat_messages WHERE video_id = ?",
+                (video_id,),
+            )
+            c = conn.cursor()
+            c.execute(
+                "SELECT block, created_at FROM archive_blocks WHERE video_id = ? AND kind = 'chat'",
+                (video_id,),
+            )
+            for block, created_at in c.fetchall():
+                for _, timestamp, author, message in archive.load_block(
+                    self.db_path, video_id, "chat", block, created_at
+                ):
+                    yield timestamp, author, message
+        finally:
+            conn.close()
+
+    def save_chat_buckets(self, video_id, bucket_seconds, rows, replace=False):
+        """Upsert rollup rows (bucket_start, messages, unique_authors, keyword_hits).
+
+        Rows carry running totals, so a later row for a bucket supersedes the
+        earlier one. replace=True first drops the video's existing rollup.
+        """
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        if replace:
+            c.execute(
+                "DELETE FROM chat_buckets WHERE video_id = ? AND bucket_seconds = ?",
+                (video_id, bucket_seconds),
+            )
+        c.executemany(
+            """INSERT OR REPLACE INTO chat_buckets
+                     (video_id, bucket_seconds, bucket_start, messages, unique_authors, keyword_hits)
+                     VALUES (?, ?, ?, ?, ?, ?)""",
+            [(video_id, bucket_seconds, *row) for row in rows],
+        )
+        self._commit(conn)
+        conn.close()
+
+    def get_chat_buckets(
+        self, video_id, bucket_seconds, start_time=None, end_time=None
+    ):
+        """Rollup rows (bucket_start, messages, unique_authors, keyword_hits) in time order."""
+        query = """SELECT bucket_start, messages, unique_authors, keyword_hits
+                   FROM chat_buckets WHERE video_id = ? AND bucket_seconds = ?"""
+        params = [video_id, bucket_seconds]
+        if start_time is not None:
+            query += " AND bucket_start >= ?"
+            params.append(start_time)
+        if end_time is not None:
+            query += " AND bucket_start < ?"
+            params.append(end_time)
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(query + " ORDER BY bucket_start", params).fetchall()
+        conn.close()
+        return rows
+
     def get_chat_for_segment(self, video_id, start_time, end_time):
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
@@ -132,9 +809,173 @@ class Database:
             "SELECT * FROM chat_messages WHERE video_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
             (video_id, start_time, end_time),
         )
+        rows = [dict(row) for row in c.fetchall()]
+        archived = [
+            {
+                "id": msg_id,
+                "video_id": video_id,
+                "timestamp": timestamp,
+                "author": author,
+                "message": message,
+            }
+            for msg_id, timestamp, author, message in self._archived_rows(
+                c, video_id, "chat", start_time, end_time
+            )
+            if start_time <= timestamp < end_time
+        ]
+        conn.close()
+        if archived:
+            rows = sorted(rows + archived, key=lambda m: (m["timestamp"], m["id"]))
+        return rows
+
+    def get_jobs_to_archive(self, older_than_days):
+        """Completed, unarchived jobs last updated more than older_than_days ago."""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            """SELECT video_id FROM jobs
+                     WHERE status = 'completed' AND archived_at IS NULL
+                       AND updated_at < datetime('now', ?)
+                     ORDER BY updated_at""",
+            (f"-{float(older_than_days)} days",),
+        )
         rows = c.fetchall()
         conn.close()
-        return [dict(row) for row in rows]
+        return [row[0] for row in rows]
+
+    def archive_job(self, video_id, block_seconds=None):
+        """Pack a completed job's transcripts, LLM output and chat into
+        compressed blocks and drop the plain-text copies, atomically.
+
+        Returns size stats, or None if the job is not completed or is
+        already archived.
+        """
+        block_seconds = block_seconds or archive.BLOCK_SECONDS
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(
+                "SELECT status, archived_at FROM jobs WHERE video_id = ?", (video_id,)
+            )
+            job = c.fetchone()
+            if not job or job[0] != "completed" or job[1] is not None:
+                conn.rollback()
+                return None
+
+            now = time.time()
+            stats = {
+                "video_id": video_id,
+                "segments": 0,
+                "chat": 0,
+                "raw_bytes": 0,
+                "stored_bytes": 0,
+            }
+            for kind, query in (
+                (
+                    "segments",
+                    """SELECT start_time, id, transcript, warscribe_json FROM segments
+                             WHERE video_id = ? ORDER BY start_time""",
+                ),
+                (
+                    "chat",
+                    """SELECT timestamp, id, timestamp, author, message FROM chat_messages
+                             WHERE video_id = ? ORDER BY timestamp""",
+                ),
+            ):
+                # Rows arrive in time order, so each block is written as soon
+                # as it is complete rather than holding the video in memory
+                block, rows = None, []
+                reader = conn.execute(query, (video_id,))
+                for t, *row in reader:
+                    index = int((t or 0.0) // block_seconds)
+                    if index != block and rows:
+                        self._write_block(
+                            c, video_id, kind, block, block_seconds, rows, now, stats
+                        )
+                        rows = []
+                    block = index
+                    rows.append(row)
+                if rows:
+                    self._write_block(
+                        c, video_id, kind, block, block_seconds, rows, now, stats
+                    )
+
+            c.execute(
+                "UPDATE segments SET transcript = NULL, warscribe_json = NULL WHERE video_id = ?",
+                (video_id,),
+            )
+            c.execute("DELETE FROM chat_messages WHERE video_id = ?", (video_id,))
+            c.execute(
+                "UPDATE jobs SET archived_at = ? WHERE video_id = ?", (now, video_id)
+            )
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        log.info(
+            "Archived %s: %d segments, %d chat messages, %d -> %d bytes",
+            video_id,
+            stats["segments"],
+            stats["chat"],
+            stats["raw_bytes"],
+            stats["stored_bytes"],
+        )
+        return stats
+
+    def _write_block(self, c, video_id, kind, block, block_seconds, rows, now, stats):
+        codec, data, raw_bytes = archive.encode_block(rows)
+        c.execute(
+            """INSERT INTO archive_blocks
+                     (video_id, kind, block, start_time, end_time, codec, rows, raw_bytes, data, created_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                video_id,
+                kind,
+                block,
+                block * block_seconds,
+                (block + 1) * block_seconds,
+                codec,
+                len(rows),
+                raw_bytes,
+                data,
+                now,
+            ),
+        )
+        stats[kind] += len(rows)
+        stats["raw_bytes"] += raw_bytes
+        stats["stored_bytes"] += len(data)
+
+    def restore_job(self, video_id):
+        """Undo archive_job, e.g. before re-running analysis; returns True if it was archived."""
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            segments = self._archived_rows(c, video_id, "segments")
+            chat = self._archived_rows(c, video_id, "chat")
+            c.executemany(
+                "UPDATE segments SET transcript = ?, warscribe_json = ? WHERE id = ?",
+                [(transcript, wj, seg_id) for seg_id, transcript, wj in segments],
+            )
+            c.executemany(
+                "INSERT INTO chat_messages (id, video_id, timestamp, author, message) VALUES (?, ?, ?, ?, ?)",
+                [(msg_id, video_id, *rest) for msg_id, *rest in chat],
+            )
+            c.execute("DELETE FROM archive_blocks WHERE video_id = ?", (video_id,))
+            restored = c.rowcount > 0
+            c.execute(
+                "UPDATE jobs SET archived_at = NULL WHERE video_id = ?", (video_id,)
+            )
+            self._commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return restored
 
     def get_job_url(self, video_id):
         conn = sqlite3.connect(self.db_path)
@@ -156,22 +997,261 @@ class Database:
         conn = sqlite3.connect(self.db_path)
         c = conn.cursor()
         c.execute(
-            "UPDATE segments SET transcript = ?, status = 'transcribed' WHERE id = ?",
-            (transcript, segment_id),
+            "UPDATE segments SET transcript = ?, status = 'transcribed', transcribed_at = ? WHERE id = ?",
+            (transcript, time.time(), segment_id),
         )
-        conn.commit()
+        self._commit(conn)
         conn.close()
 
     def update_segment_warscribe(self, segment_id, warscribe_json):
         conn = sqlite3.connect(self.db_path)
         c = conn.cursor()
         c.execute(
-            "UPDATE segments SET warscribe_json = ?, status = 'analyzed' WHERE id = ?",
-            (warscribe_json, segment_id),
+            "UPDATE segments SET warscribe_json = ?, status = 'analyzed', analyzed_at = ? WHERE id = ?",
+            (warscribe_json, time.time(), segment_id),
         )
-        conn.commit()
+        self._commit(conn)
+        conn.close()
+
+    def save_segment_extraction(self, segment_id, video_id, warscribe_json, actions):
+        """Store validated extraction output for a segment in one transaction.
+
+        actions: list of (action_type, turn, phase, actor, result, payload).
+        Any actions previously stored for the segment are replaced.
+        """
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("DELETE FROM actions WHERE segment_id = ?", (segment_id,))
+        c.executemany(
+            """INSERT INTO actions (video_id, segment_id, action_type, turn, phase, actor, result, payload)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(video_id, segment_id, *a) for a in actions],
+        )
+        c.execute(
+            "UPDATE segments SET warscribe_json = ?, status = 'analyzed', analyzed_at = ? WHERE id = ?",
+            (warscribe_json, time.time(), segment_id),
+        )
+        self._commit(conn)
         conn.close()
 
+    def mark_segments_embedded(self, segment_ids):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        now = time.time()
+        c.executemany(
+            "UPDATE segments SET embedded_at = ? WHERE id = ?",
+            [(now, sid) for sid in segment_ids],
+        )
+        self._commit(conn)
+        conn.close()
+
+    def get_job_progress(self, video_id):
+        """Aggregate per-stage progress for a job.
+
+        The segment aggregates are answered from the covering
+        idx_segments_progress index without reading segment rows, so this
+        stays cheap when polled frequently. Returns None for unknown jobs.
+        """
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            "SELECT status, audio_duration FROM jobs WHERE video_id = ?", (video_id,)
+        )
+        job = c.fetchone()
+        if not job:
+            conn.close()
+            return None
+        status, audio_duration = job
+
+        c.execute(
+            "SELECT status, COUNT(*) FROM segments WHERE video_id = ? GROUP BY status",
+            (video_id,),
+        )
+        by_status = dict(c.fetchall())
+
+        c.execute(
+            """SELECT COUNT(transcribed_at), MIN(transcribed_at), MAX(transcribed_at),
+                      SUM(CASE WHEN transcribed_at IS NOT NULL OR status = 'silence'
+                               THEN end_time - start_time END),
+                      SUM(CASE WHEN transcribed_at IS NOT NULL AND status <> 'silence'
+                               THEN end_time - start_time END),
+                      COUNT(CASE WHEN status = 'silence' THEN 1 END),
+                      SUM(CASE WHEN status = 'silence' THEN end_time - start_time END),
+                      COUNT(analyzed_at), MIN(analyzed_at), MAX(analyzed_at),
+                      COUNT(embedded_at), MIN(embedded_at), MAX(embedded_at)
+               FROM segments WHERE video_id = ?""",
+            (video_id,),
+        )
+        (
+            n_tr,
+            tr_first,
+            tr_last,
+            transcribed_seconds,
+            speech_seconds,
+            n_silence,
+            silence_seconds,
+            n_llm,
+            llm_first,
+            llm_last,
+            n_emb,
+            emb_first,
+            emb_last,
+        ) = c.fetchone()
+        c.execute(
+            """SELECT COALESCE(SUM(segments), 0), SUM(end_time - start_time)
+                 FROM audio_matches WHERE video_id = ?""",
+            (video_id,),
+        )
+        n_copied, copied_seconds = c.fetchone()
+        conn.close()
+
+        def rate(count, first, last):
+            if count < 2 or not last or last <= first:
+                return None
+            return count / (last - first)
+
+        def fraction(done, total):
+            return done / total if total else None
+
+        # Summed, not MAX(end_time): units finish out of order and copied
+        # segments can sit anywhere in the recording
+        transcribed_seconds = transcribed_seconds or 0.0
+        tr_rate = rate(n_tr, tr_first, tr_last)
+        n_speech = n_tr - n_silence  # silence segments are never analyzed or embedded
+        return {
+            "video_id": video_id,
+            "status": status,
+            "segments": {"total": sum(by_status.values()), "by_status": by_status},
+            "audio_duration": audio_duration,
+            "transcribed_seconds": transcribed_seconds,
+            "transcribed_fraction": (
+                min(1.0, transcribed_seconds / audio_duration)
+                if audio_duration
+                else None
+            ),
+            "silence": {"segments": n_silence, "seconds": silence_seconds or 0.0},
+            "copied": {"segments": n_copied, "seconds": copied_seconds or 0.0},
+            "llm": {
+                "done": n_llm,
+                "total": n_speech,
+                "fraction": fraction(n_llm, n_speech),
+            },
+            "embeddings": {
+                "done": n_emb,
+                "total": n_speech,
+                "fraction": fraction(n_emb, n_speech),
+            },
+            "throughput": {
+                "transcribe_segments_per_sec": tr_rate,
+                "transcribe_audio_sec_per_sec": (
+                    (speech_seconds or 0.0) / (tr_last - tr_first) if tr_rate else None
+                ),
+                "llm_segments_per_sec": rate(n_llm, llm_first, llm_last),
+                "embed_segments_per_sec": rate(n_emb, emb_first, emb_last),
+            },
+        }
+
+    def get_actions(self, video_id, action_type=None):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        if action_type:
+            c.execute(
+                "SELECT * FROM actions WHERE video_id = ? AND action_type = ? ORDER BY segment_id, id",
+                (video_id, action_type),
+            )
+        else:
+            c.execute(
+                "SELECT * FROM actions WHERE video_id = ? ORDER BY segment_id, id",
+                (video_id,),
+            )
+        rows = c.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def _iter_rows(self, query, params, batch_size=500):
+        """Yield dict rows from a server-side cursor, batch_size at a time.
+
+        The connection is opened with check_same_thread=False because a
+        streaming response may advance the generator from any worker thread.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            c = conn.execute(query, params)
+            while rows := c.fetchmany(batch_size):
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    def _archive_blocks(self, video_id, kind):
+        """(block, start_time, end_time) of a video's archive blocks, in time order."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            """SELECT block, start_time, end_time FROM archive_blocks
+                     WHERE video_id = ? AND kind = ? ORDER BY block""",
+            (video_id, kind),
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def iter_segments(self, video_id, batch_size=500):
+        """Yield a video's segments in time order in constant memory.
+
+        Archived transcripts are decoded one block at a time, bypassing the
+        read cache since every block is visited once.
+        """
+        blocks = self._archive_blocks(video_id, "segments")
+        i, archived = 0, {}
+        for row in self._iter_rows(
+            "SELECT * FROM segments WHERE video_id = ? ORDER BY start_time",
+            (video_id,),
+            batch_size,
+        ):
+            if blocks and row["transcript"] is None:
+                while i < len(blocks) and blocks[i][2] <= row["start_time"]:
+                    i += 1
+                    archived = {}
+                if i < len(blocks) and not archived:
+                    archived = {
+                        seg_id: (transcript, wj)
+                        for seg_id, transcript, wj in archive.read_block(
+                            self.db_path, video_id, "segments", blocks[i][0]
+                        )
+                    }
+                if row["id"] in archived:
+                    row["transcript"], row["warscribe_json"] = archived[row["id"]]
+            yield row
+
+    def iter_chat(self, video_id, batch_size=500):
+        """Yield a video's chat messages in time order in constant memory."""
+        live = self._iter_rows(
+            """SELECT id, timestamp, author, message FROM chat_messages
+                     WHERE video_id = ? ORDER BY timestamp""",
+            (video_id,),
+            batch_size,
+        )
+        archived = (
+            {"id": msg_id, "timestamp": ts, "author": author, "message": message}
+            for block, _, _ in self._archive_blocks(video_id, "chat")
+            for msg_id, ts, author, message in archive.read_block(
+                self.db_path, video_id, "chat", block
+            )
+        )
+        yield from heapq.merge(live, archived, key=lambda m: m["timestamp"])
+
+    def iter_actions(self, video_id, batch_size=500):
+        """Yield a video's extracted actions with their segment's time span."""
+        yield from self._iter_rows(
+            """SELECT a.id, a.segment_id, s.start_time, s.end_time, a.action_type,
+                      a.turn, a.phase, a.actor, a.result, a.payload
+                 FROM actions a LEFT JOIN segments s ON s.id = a.segment_id
+                WHERE a.video_id = ? ORDER BY a.segment_id, a.id""",
+            (video_id,),
+            batch_size,
+        )
+
     def list_jobs(self):
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
@@ -182,10 +1262,17 @@ class Database:
         return [dict(row) for row in rows]
 
     def get_pending_jobs(self):
+        return self.get_jobs_by_status("pending")
+
+    def get_jobs_by_status(self, status, limit=None):
+        """Jobs in status, oldest first."""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
-        c.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY created_at ASC")
+        c.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY created_at ASC LIMIT ?",
+            (status, -1 if limit is None else limit),
+        )
         rows = c.fetchall()
         conn.close()
         return [dict(row) for row in rows]
@@ -199,25 +1286,143 @@ class Database:
         conn.close()
         return dict(row) if row else None
 
+    def get_ingested_file(self, path):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute("SELECT * FROM ingested_files WHERE path = ?", (path,))
+        row = c.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def record_ingested_file(self, path, mtime, size, sha256, chunks):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute(
+            """INSERT OR REPLACE INTO ingested_files (path, mtime, size, sha256, chunks)
+                     VALUES (?, ?, ?, ?, ?)""",
+            (path, mtime, size, sha256, chunks),
+        )
+        self._commit(conn)
+        conn.close()
+
+    def filter_new_chunks(self, hashes):
+        """Return the subset of chunk hashes that have not been ingested yet."""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        seen = set()
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i : i + 500]
+            c.execute(
+                f"SELECT hash FROM ingested_chunks WHERE hash IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            seen.update(row[0] for row in c.fetchall())
+        conn.close()
+        return set(hashes) - seen
+
+    def get_source_chunks(self, source):
+        """Hashes of the chunks ingested from source."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            "SELECT hash FROM ingested_chunks WHERE source = ?", (source,)
+        ).fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    def release_chunks(self, source, hashes, keep=()):
+        """Drop source's claim on ingested chunks, e.g. after the file changed.
+
+        A chunk's vector is deleted once no source references it any more,
+        unless its hash is in keep. Returns the hashes whose vectors were
+        deleted.
+        """
+        hashes = list(hashes)
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.executemany(
+            "DELETE FROM ingested_chunks WHERE hash = ? AND source = ?",
+            [(h, source) for h in hashes],
+        )
+        shared = set(keep)
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i : i + 500]
+            c.execute(
+                f"SELECT hash FROM ingested_chunks WHERE hash IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            shared.update(row[0] for row in c.fetchall())
+        orphaned = [h for h in hashes if h not in shared]
+        if orphaned and self.collection is not None:
+            self.collection.delete(ids=[f"chunk_{h[:32]}" for h in orphaned])
+        self._commit(conn)
+        conn.close()
+        return orphaned
+
+    def record_chunks(self, chunks):
+        """chunks: list of (hash, source)"""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.executemany(
+            "INSERT OR IGNORE INTO ingested_chunks (hash, source) VALUES (?, ?)", chunks
+        )
+        self._commit(conn)
+        conn.close()
+
+    def embed(self, texts):
+        """Compute embeddings with the collection's embedding function."""
+        start = time.perf_counter()
+        vectors = self.embedding_fn(texts)
+        _record_embed(len(texts), time.perf_counter() - start)
+        return vectors
+
+    def add_embedded_documents(self, ids, documents, metadatas, embeddings):
+        """Add documents whose embeddings were computed by the caller."""
+        self.collection.add(
+            ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings
+        )
+
     def _batch_add(self, ids, documents, metadatas, batch_size=1000):
+        """Add documents in batches; returns the ids that were stored."""
+        added = []
         total = len(ids)
         for i in range(0, total, batch_size):
             batch_ids = ids[i : i + batch_size]
             batch_docs = documents[i : i + batch_size]
             batch_meta = metadatas[i : i + batch_size]
             try:
+                # The collection embeds on add, so this times the embedding
+                start = time.perf_counter()
                 self.collection.add(
                     ids=batch_ids, documents=batch_docs, metadatas=batch_meta
                 )
-                print(
-                    f"Added batch {i // batch_size + 1}/{(total + batch_size - 1) // batch_size} ({len(batch_ids)} docs)"
+                _record_embed(len(batch_ids), time.perf_counter() - start)
+                added.extend(batch_ids)
+                log.debug(
+                    "Added batch %d/%d (%d docs)",
+                    i // batch_size + 1,
+                    (total + batch_size - 1) // batch_size,
+                    len(batch_ids),
                 )
             except Exception as e:
-                print(f"Error adding batch {i // batch_size + 1}: {e}")
+                metrics.inc("warscribe_embed_errors_total", help="Failed embed batches")
+                log.error("Error adding batch %d: %s", i // batch_size + 1, e)
+        return added
+
+    def _segment_positions(self, video_id):
+        """Segment id -> its index in get_segments(video_id)."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            "SELECT id FROM segments WHERE video_id = ? ORDER BY start_time, id",
+            (video_id,),
+        ).fetchall()
+        conn.close()
+        return {seg_id: i for i, (seg_id,) in enumerate(rows)}
 
     def add_transcript_embeddings(self, video_id, segments):
-        if not self.chroma_client:
-            print("ChromaDB not initialized, skipping embeddings.")
+        if self.collection is None:
+            log.warning("No vector store available, skipping embeddings.")
             return
 
         if not segments:
@@ -226,12 +1431,20 @@ class Database:
         ids = []
         documents = []
         metadatas = []
+        segment_ids = {}
+        positions = self._segment_positions(video_id)
 
         for i, seg in enumerate(segments):
             # seg is expected to be a dict from get_segments
+            if seg.get("embedded_at"):
+                continue  # already embedded, e.g. by an earlier live pass
             text = seg.get("transcript", "")
             if text and text.strip():
-                ids.append(f"{video_id}_{i}")
+                # Ids are {video_id}_{position in get_segments}, whichever
+                # subset is passed, so incremental passes never collide and
+                # videos indexed before embedded_at existed are not duplicated
+                ids.append(f"{video_id}_{positions.get(seg.get('id'), i)}")
+                segment_ids[ids[-1]] = seg.get("id")
                 documents.append(text)
                 metadatas.append(
                     {
@@ -243,18 +1456,21 @@ class Database:
                 )
 
         if documents:
-            self._batch_add(ids, documents, metadatas)
-            print(f"Finished adding {len(documents)} embeddings to ChromaDB.")
+            added = self._batch_add(ids, documents, metadatas)
+            self.mark_segments_embedded(
+                [segment_ids[i] for i in added if segment_ids[i] is not None]
+            )
+            log.info("Added %d embeddings for %s", len(added), video_id)
 
     def add_documents(self, source_id, documents, metadatas):
         """
-        Generic method to add documents to ChromaDB.
+        Generic method to add documents to the vector store.
         source_id: unique identifier for the source (e.g. filename)
         documents: list of text strings
         metadatas: list of dicts. If 'source' key is missing, it will be added.
         """
-        if not self.chroma_client:
-            print("ChromaDB not initialized.")
+        if self.collection is None:
+            log.warning("No vector store available.")
             return
 
         if not documents:
@@ -271,4 +1487,15 @@ class Database:
             final_metadatas.append(new_m)
 
         self._batch_add(ids, documents, final_metadatas)
-        print(f"Finished adding {len(documents)} documents from {source_id}")
+        log.info("Added %d documents from %s", len(documents), source_id)
+
+
+def _record_embed(docs, seconds):
+    metrics.inc("warscribe_embed_docs_total", docs, "Documents embedded")
+    metrics.observe("warscribe_embed_batch_seconds", seconds, "Embedding batch latency")
+    if seconds > 0:
+        metrics.set_gauge(
+            "warscribe_embed_docs_per_second",
+            docs / seconds,
+            "Throughput of the last embedding batch",
+        )
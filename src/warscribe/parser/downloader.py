@@ -1,18 +1,48 @@
+import logging
 import os
 import subprocess
+import time
+
+import fingerprint
+import metrics
+from audio import FFMPEG_OUTPUT_ARGS, export_npy, npy_path, open_pcm, probe_duration
 from db import Database
-from utils import find_audio
+from utils import extract_video_id, find_audio
+
+log = logging.getLogger("warscribe.downloader")
 
 
 class Downloader:
-    def __init__(self, output_dir="input", db_path="warscribe.db"):
+    def __init__(
+        self,
+        output_dir="input",
+        db_path="warscribe.db",
+        audio_format=None,
+        keep_npy=None,
+        dedup=None,
+    ):
         self.output_dir = output_dir
         self.db_path = db_path
+        # 'wav' (16 kHz mono PCM) or 'opus' (16 kHz mono, ~32 kbit/s)
+        self.audio_format = audio_format or os.environ.get("AUDIO_FORMAT", "wav")
+        if self.audio_format not in FFMPEG_OUTPUT_ARGS:
+            raise ValueError(f"Unsupported AUDIO_FORMAT: {self.audio_format}")
+        # Also keep a float32 .npy copy the transcriber can memory-map
+        if keep_npy is None:
+            keep_npy = os.environ.get("AUDIO_KEEP_NPY", "0") == "1"
+        self.keep_npy = keep_npy
+        # Fingerprint audio and copy segments of re-uploads (see fingerprint.py)
+        if dedup is None:
+            dedup = os.environ.get("AUDIO_DEDUP", "1") == "1"
+        self.dedup = dedup
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
     def get_video_id(self, url):
-        """Extracts video ID from URL using yt-dlp."""
+        """Extracts video ID from URL, falling back to yt-dlp for unknown shapes."""
+        video_id = extract_video_id(url)
+        if video_id:
+            return video_id
         cmd = ["yt-dlp", "--print", "id", url]
         result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
@@ -32,14 +62,15 @@ class Downloader:
         output_template = os.path.join(self.output_dir, f"{video_id}.%(ext)s")
 
         if self._has_ffmpeg():
-            # Ideal: extract audio and convert to wav
+            # Ideal: extract audio straight to the 16 kHz mono Whisper expects,
+            # rather than a full-rate stereo WAV that gets resampled later
             cmd = [
                 "yt-dlp",
                 "-x",
                 "--audio-format",
-                "wav",
-                "--audio-quality",
-                "0",
+                self.audio_format,
+                "--postprocessor-args",
+                "ExtractAudio:" + " ".join(FFMPEG_OUTPUT_ARGS[self.audio_format]),
                 "-o",
                 output_template,
                 url,
@@ -56,21 +87,54 @@ class Downloader:
                 url,
             ]
 
-        print(f"Downloading audio for {video_id}...")
+        log.info("Downloading audio for %s", video_id)
+        started = time.perf_counter()
         result = subprocess.run(cmd, capture_output=True, text=True)
 
         if result.returncode != 0:
-            print(f"Primary download failed: {result.stderr.strip()}")
-            print("Retrying with fallback format selection...")
+            log.warning("Primary download failed: %s", result.stderr.strip())
+            log.info("Retrying with fallback format selection")
             # Ultimate fallback: just download whatever is available
             cmd_fallback = ["yt-dlp", "-f", "best", "-o", output_template, url]
             subprocess.run(cmd_fallback, check=True)
-
-        return find_audio(self.output_dir, video_id)
+        metrics.observe(
+            "warscribe_download_seconds",
+            time.perf_counter() - started,
+            "yt-dlp audio download duration",
+        )
+
+        audio_path = find_audio(self.output_dir, video_id)
+        if audio_path and self.keep_npy and self._has_ffmpeg():
+            try:
+                export_npy(audio_path, npy_path(self.output_dir, video_id))
+            except Exception as e:
+                # Transcriber falls back to decoding the audio file itself
+                log.warning("Could not export .npy for %s: %s", video_id, e)
+        return audio_path
+
+    def _record_duration(self, db, video_id, audio_path):
+        # Known before transcription starts, so jobs can be prioritised by length
+        duration = probe_duration(audio_path)
+        if duration:
+            db.set_job_duration(video_id, duration)
+
+    def _dedup(self, db, video_id, audio_path):
+        if not self.dedup:
+            return
+        npy = npy_path(self.output_dir, video_id)
+        samples = open_pcm(npy if os.path.exists(npy) else audio_path)
+        if samples is None:
+            log.info("No mapped audio for %s, skipping fingerprinting", video_id)
+            return
+        try:
+            fingerprint.dedup(db, video_id, samples, audio_path)
+        except Exception as e:
+            # Everything is transcribed as usual instead
+            log.warning("Fingerprint dedup failed for %s: %s", video_id, e)
 
     def process(self, url):
         video_id = self.get_video_id(url)
-        print(f"Processing {video_id}...")
+        log.info("Processing %s", video_id)
 
         # Register job
         db = Database(self.db_path)
@@ -80,16 +144,20 @@ class Downloader:
         try:
             audio_path = self.download_audio(url, video_id)
             if audio_path:
-                print(f"Audio saved: {audio_path}")
+                log.info("Audio saved: %s", audio_path)
+                self._record_duration(db, video_id, audio_path)
+                self._dedup(db, video_id, audio_path)
                 db.update_job_status(video_id, "downloaded")
             else:
                 raise FileNotFoundError(f"No audio file found for {video_id}")
         except Exception as e:
-            print(f"Download error: {e}")
+            log.error("Download error: %s", e)
             # Check if audio already exists from a prior run
             existing = find_audio(self.output_dir, video_id)
             if existing:
-                print(f"Found existing audio: {existing}. Continuing...")
+                log.info("Found existing audio: %s. Continuing", existing)
+                self._record_duration(db, video_id, existing)
+                self._dedup(db, video_id, existing)
                 db.update_job_status(video_id, "downloaded")
             else:
                 db.update_job_status(video_id, "failed")
@@ -100,6 +168,9 @@ class Downloader:
 if __name__ == "__main__":
     import sys
 
+    from utils import setup_logging
+
+    setup_logging()
     if len(sys.argv) > 1:
         d = Downloader("warscribe-system/input")
         d.process(sys.argv[1])
@@ -0,0 +1,183 @@
+"""
+Warscribe embeddings — pluggable CPU backends for the sentence embedding model.
+
+Backends (EMBED_BACKEND):
+- torch (default): sentence-transformers on full-precision PyTorch, the
+  same computation Chroma's SentenceTransformerEmbeddingFunction performs
+- onnx: the model's ONNX export run with ONNX Runtime, tokenized with the
+  Rust tokenizers library; no PyTorch import at all
+- onnx-int8: the ONNX export with weights dynamically quantized to int8,
+  created once next to the downloaded model
+
+All backends mean-pool token embeddings and L2-normalise them, as
+all-MiniLM-L6-v2 is trained to, so their vectors are interchangeable in
+one index. Embedders are cached per process; Database, QueryEngine and
+ingestion all get theirs from get_embedder.
+
+EMBED_MODEL names a sentence-transformers model on the Hugging Face Hub,
+or a local directory holding onnx/model.onnx and tokenizer.json for
+offline use of the ONNX backends.
+
+Usage:
+    python embeddings.py "some text" [--backend onnx-int8]
+"""
+
+import argparse
+import functools
+import logging
+import os
+
+import numpy as np
+
+log = logging.getLogger("warscribe.embeddings")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+BACKEND = os.environ.get("EMBED_BACKEND", "torch")
+MODEL_NAME = os.environ.get("EMBED_MODEL", "all-MiniLM-L6-v2")
+BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+THREADS = int(os.environ.get("EMBED_THREADS", "0"))  # 0: ONNX Runtime decides
+MAX_TOKENS = 256  # all-MiniLM-L6-v2's max_seq_length
+
+
+class _Embedder:
+    """What Chroma expects of an embedding function.
+
+    Chroma 1.x calls name() and is_legacy() on the function it is given, so
+    the backend/model label lives in .label rather than shadowing name().
+    Reporting legacy keeps Chroma from trying to rebuild the function from its
+    own registry when the collection is reopened.
+    """
+
+    label = "warscribe"
+
+    def name(self):
+        return self.label
+
+    def is_legacy(self):
+        return True
+
+
+class TorchEmbedder(_Embedder):
+    def __init__(self, model_name=MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+
+        self.label = f"torch:{model_name}"
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def __call__(self, input):
+        # Chroma checks embedding functions take a parameter named "input"
+        return list(
+            self.model.encode(
+                list(input),
+                batch_size=BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        )
+
+
+def _onnx_files(model_name):
+    """Paths of (model.onnx, tokenizer.json), downloading them if needed."""
+    if os.path.isdir(model_name):
+        return (
+            os.path.join(model_name, "onnx", "model.onnx"),
+            os.path.join(model_name, "tokenizer.json"),
+        )
+    from huggingface_hub import hf_hub_download
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return (
+        hf_hub_download(repo, "onnx/model.onnx"),
+        hf_hub_download(repo, "tokenizer.json"),
+    )
+
+
+def _quantized(model_path):
+    """An int8 dynamically quantized copy of model_path, made once."""
+    out = os.path.splitext(model_path)[0] + "_int8.onnx"
+    if not os.path.exists(out):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        log.info("Quantizing %s to int8", model_path)
+        tmp = out + ".tmp"
+        quantize_dynamic(model_path, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, out)  # concurrent first runs never load half a file
+    return out
+
+
+class OnnxEmbedder(_Embedder):
+    def __init__(self, model_name=MODEL_NAME, quantize=False):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = _onnx_files(model_name)
+        if quantize:
+            model_path = _quantized(model_path)
+        self.label = f"onnx{'-int8' if quantize else ''}:{model_name}"
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self.tokenizer.enable_padding()  # to the longest text in each batch
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if THREADS:
+            options.intra_op_num_threads = THREADS
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+    def _batch(self, texts):
+        encoded = self.tokenizer.encode_batch(texts)
+        feed = {
+            "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encoded], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+        }
+        tokens = self.session.run(
+            None, {k: v for k, v in feed.items() if k in self.inputs}
+        )[0]
+        mask = feed["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        # Batch texts of similar length together so little time goes on padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), BATCH_SIZE):
+            rows = order[start : start + BATCH_SIZE]
+            for i, vector in zip(rows, self._batch([texts[i] for i in rows])):
+                out[i] = vector
+        return out
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedder(backend=None, model_name=None):
+    """The process-wide embedder for backend (default EMBED_BACKEND)."""
+    backend = backend or BACKEND
+    model_name = model_name or MODEL_NAME
+    if backend == "torch":
+        return TorchEmbedder(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(model_name, quantize=backend == "onnx-int8")
+    raise ValueError(f"Unknown EMBED_BACKEND: {backend}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed text with a backend")
+    parser.add_argument("text", nargs="+")
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND)
+    args = parser.parse_args()
+
+    embedder = get_embedder(args.backend)
+    for text, vector in zip(args.text, embedder(args.text)):
+        print(f"{embedder.label} {text!r}: dim={len(vector)} head={vector[:4]}")
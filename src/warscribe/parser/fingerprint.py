@@ -0,0 +1,230 @@
+"""
+Audio fingerprints for spotting re-uploads and clips of a recording.
+
+Tournament VODs are often re-uploaded, or clipped and posted under a new
+video id. At download time the audio is fingerprinted and the fingerprints
+are added to an index table. Chunks of the new audio that match audio the
+pipeline has already transcribed get that video's segments, transcripts and
+LLM output copied with the time offset applied, so only the rest of the
+recording goes through Whisper and the LLM.
+
+Fingerprints are spectral peak pairs: local maxima of the spectrogram are
+paired with the next few peaks after them, and each pair is hashed from
+the two frequencies and the time between them. Hashes survive re-encoding
+and gain changes, and because they only encode relative time they match
+wherever a clip was cut. A match is found by offset voting: every hash the
+new audio shares with an indexed video votes for (video, time offset), and
+audio shared with that video piles its votes onto a single offset while
+chance collisions scatter. Votes are counted per chunk of the new audio, so
+a video that is only partly a copy has just those chunks matched.
+"""
+
+import logging
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import metrics
+from audio import SAMPLE_RATE, release_pages, to_float32
+
+log = logging.getLogger("warscribe.fingerprint")
+
+FFT_SIZE = 1024
+HOP = 512  # 32 ms frames
+MIN_BIN, MAX_BIN = 16, 320  # 250 Hz - 5 kHz
+# A peak is the loudest point within +/- this many frames and bins
+PEAK_FRAMES, PEAK_BINS = 15, 10
+MIN_MAGNITUDE = 1.0  # near-silence has no peaks
+FAN_OUT = 3  # pairs per anchor peak
+MAX_DT = 63  # frames; fits the 6-bit delta of the hash
+# Chunks of new audio that are voted on separately
+CHUNK_SECONDS = float(os.environ.get("FINGERPRINT_CHUNK_SECONDS", "10"))
+# Votes on one (video, offset) a chunk needs to count as a copy
+MIN_VOTES = int(os.environ.get("FINGERPRINT_MIN_VOTES", "10"))
+# Hashes this common across the index identify nothing and are ignored
+MAX_POSTINGS = 50
+
+
+def frame_seconds(frame):
+    return frame * HOP / SAMPLE_RATE
+
+
+def _max_filter(values, radius, axis):
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, constant_values=-np.inf)
+    return sliding_window_view(padded, 2 * radius + 1, axis=axis).max(axis=-1)
+
+
+def peaks(samples, window_seconds=300):
+    """Spectrogram peaks of mapped samples as (frame, bin) arrays, in time order.
+
+    Computed one window of audio at a time, with enough overlap that the
+    result does not depend on where windows fall, so memory use does not
+    grow with the length of the recording.
+    """
+    n_frames = max(0, (len(samples) - FFT_SIZE) // HOP + 1)
+    window = max(1, int(window_seconds * SAMPLE_RATE) // HOP)
+    hann = np.hanning(FFT_SIZE).astype(np.float32)
+    frames, bins = [], []
+    for first in range(0, n_frames, window):
+        last = min(n_frames, first + window)
+        lo = max(0, first - PEAK_FRAMES)
+        hi = min(n_frames, last + PEAK_FRAMES)
+        audio = to_float32(samples[lo * HOP : (hi - 1) * HOP + FFT_SIZE])
+        spectrum = np.abs(
+            np.fft.rfft(sliding_window_view(audio, FFT_SIZE)[::HOP] * hann, axis=1)
+        )[:, MIN_BIN:MAX_BIN]
+        local = _max_filter(_max_filter(spectrum, PEAK_FRAMES, 0), PEAK_BINS, 1)
+        t, f = np.nonzero((spectrum == local) & (spectrum >= MIN_MAGNITUDE))
+        keep = (t + lo >= first) & (t + lo < last)
+        frames.append(t[keep] + lo)
+        bins.append(f[keep])
+        release_pages(samples, last * HOP)
+    if not frames:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(frames).astype(np.int64), np.concatenate(bins).astype(
+        np.int64
+    )
+
+
+def hashes(frames, bins):
+    """Pair each peak with the next FAN_OUT peaks; returns (hash, anchor frame)."""
+    out_hashes, out_frames = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        ok = dt <= MAX_DT
+        out_hashes.append((bins[:-k][ok] << 15) | (bins[k:][ok] << 6) | dt[ok])
+        out_frames.append(frames[:-k][ok])
+    return np.concatenate(out_hashes), np.concatenate(out_frames)
+
+
+def fingerprint(samples):
+    """(hash, frame) arrays for mapped 16 kHz mono samples."""
+    return hashes(*peaks(samples))
+
+
+def find_matches(db, video_id, hash_values, frames):
+    """Ranges of video_id that copy audio of an already transcribed video.
+
+    Returns dicts with start_time and end_time in video_id's timeline,
+    source_video_id and offset (source time = time + offset), in time
+    order. Chunks are merged into one range while they vote for the same
+    video and offset; quiet chunks, with too few hashes to vote, between
+    two such chunks are taken to be part of the copy too.
+    """
+    occurrences = defaultdict(list)
+    for h, frame in zip(hash_values.tolist(), frames.tolist()):
+        occurrences[h].append(frame)
+    postings = defaultdict(list)
+    for h, source, source_frame in db.lookup_fingerprints(list(occurrences), video_id):
+        postings[h].append((source, source_frame))
+
+    chunk_frames = max(1, int(CHUNK_SECONDS * SAMPLE_RATE) // HOP)
+    # (chunk, source, offset) -> [votes, first frame, last frame]
+    votes = {}
+    for h, hits in postings.items():
+        if len(hits) > MAX_POSTINGS:
+            continue
+        for frame in occurrences[h]:
+            chunk = frame // chunk_frames
+            for source, source_frame in hits:
+                key = (chunk, source, source_frame - frame)
+                vote = votes.get(key)
+                if vote is None:
+                    votes[key] = [1, frame, frame]
+                else:
+                    vote[0] += 1
+                    vote[1] = min(vote[1], frame)
+                    vote[2] = max(vote[2], frame)
+
+    # Best (source, offset) per chunk, allowing a frame of jitter either way
+    best = {}
+    for (chunk, source, offset), (count, first, last) in votes.items():
+        count += sum(votes.get((chunk, source, offset + d), (0,))[0] for d in (-1, 1))
+        if count >= MIN_VOTES and count > best.get(chunk, (0,))[0]:
+            best[chunk] = (count, source, offset, first, last)
+
+    hashes_per_chunk = np.bincount(frames // chunk_frames) if len(frames) else []
+    matches, current = [], None
+    for chunk in sorted(best):
+        _, source, offset, first, last = best[chunk]
+        if (
+            current is not None
+            and current["source_video_id"] == source
+            and abs(current["offset_frames"] - offset) <= 1
+            and all(
+                hashes_per_chunk[c] < MIN_VOTES
+                for c in range(current["chunk"] + 1, chunk)
+            )
+        ):
+            current.update(chunk=chunk, last=last)
+            continue
+        current = {
+            "source_video_id": source,
+            "offset_frames": offset,
+            "chunk": chunk,
+            "first": first,
+            "last": last,
+        }
+        matches.append(current)
+    return [
+        {
+            "start_time": frame_seconds(m["first"]),
+            "end_time": frame_seconds(m["last"] + 1),
+            "source_video_id": m["source_video_id"],
+            "offset": frame_seconds(m["offset_frames"]),
+        }
+        for m in matches
+    ]
+
+
+def dedup(db, video_id, samples, audio_path):
+    """Fingerprint a downloaded video, index it and copy what it re-uploads.
+
+    Copies are skipped for a video that already has segments, e.g. one
+    downloaded again after failing part way. Returns the copied ranges
+    (see Database.copy_segments).
+    """
+    started = time.perf_counter()
+    hash_values, frames = fingerprint(samples)
+    db.replace_fingerprints(video_id, hash_values, frames)
+    metrics.observe(
+        "warscribe_fingerprint_seconds",
+        time.perf_counter() - started,
+        "Audio fingerprinting and indexing duration",
+    )
+    if db.get_last_segment_end(video_id) is not None:
+        return []
+
+    copied = []
+    for match in find_matches(db, video_id, hash_values, frames):
+        result = db.copy_segments(
+            video_id,
+            match["source_video_id"],
+            match["start_time"],
+            match["end_time"],
+            match["offset"],
+            audio_path,
+        )
+        if result is None:
+            continue
+        copied.append(result)
+        metrics.inc(
+            "warscribe_dedup_seconds_total",
+            result["end_time"] - result["start_time"],
+            "Seconds of audio copied from an earlier upload instead of transcribed",
+        )
+        log.info(
+            "%s [%.0fs, %.0fs) copies %s at %+.2fs: %d segments copied",
+            video_id,
+            result["start_time"],
+            result["end_time"],
+            result["source_video_id"],
+            result["offset"],
+            result["segments"],
+        )
+    return copied
@@ -1,10 +1,19 @@
 import os
 import argparse
+import logging
+import fnmatch
+import hashlib
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 from db import Database
+from utils import estimate_tokens, setup_logging
+
+log = logging.getLogger("warscribe.ingest")
 
 
 def ingest_text_file(file_path, source_id=None, db_path="warscribe.db"):
-    """Ingest a text file into ChromaDB. Returns number of chunks ingested."""
+    """Ingest a text file into the vector store. Returns number of chunks ingested."""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
@@ -14,23 +23,258 @@ def ingest_text_file(file_path, source_id=None, db_path="warscribe.db"):
     chunks = [c.strip() for c in content.split("\n\n") if c.strip()]
 
     if not chunks:
-        print("No content found in file.")
+        log.warning("No content found in %s", file_path)
         return 0
 
     db = Database(db_path)
     filename = os.path.basename(file_path)
     sid = source_id or filename.replace(" ", "_")
 
-    print(f"Ingesting {len(chunks)} chunks from {filename}...")
+    log.info("Ingesting %d chunks from %s", len(chunks), filename)
 
     documents = chunks
     metadatas = [{"source": filename, "chunk_index": i} for i in range(len(chunks))]
 
     db.add_documents(sid, documents, metadatas)
-    print("Done.")
     return len(chunks)
 
 
+def iter_paragraphs(file_path):
+    """Stream a text file line by line, yielding blank-line separated paragraphs."""
+    lines = []
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.strip():
+                lines.append(line.strip())
+            elif lines:
+                yield " ".join(lines)
+                lines = []
+    if lines:
+        yield " ".join(lines)
+
+
+def chunk_paragraphs(paragraphs, max_tokens=256, overlap_tokens=32):
+    """Pack paragraphs into chunks of at most ~max_tokens estimated tokens.
+
+    Paragraphs longer than the budget are split on word boundaries. Each
+    chunk repeats the last ~overlap_tokens of the previous one so context
+    isn't lost at the seams.
+    """
+    words, costs, total = [], [], 0
+    fresh = False  # whether `words` holds anything beyond the carried overlap
+
+    def flush():
+        nonlocal words, costs, total, fresh
+        chunk = " ".join(words)
+        keep, kept = 0, 0
+        while keep < len(words) and kept + costs[-1 - keep] <= overlap_tokens:
+            kept += costs[-1 - keep]
+            keep += 1
+        words, costs = words[len(words) - keep :], costs[len(costs) - keep :]
+        total, fresh = kept, False
+        return chunk
+
+    for paragraph in paragraphs:
+        for word in paragraph.split():
+            cost = max(1, estimate_tokens(word))
+            if fresh and total + cost > max_tokens:
+                yield flush()
+            words.append(word)
+            costs.append(cost)
+            total += cost
+            fresh = True
+    if fresh:
+        yield " ".join(words)
+
+
+def _file_sha256(file_path, block_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _chunk_hash(text):
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def ingest_directory(
+    dir_path,
+    db_path="warscribe.db",
+    pattern="*.txt",
+    workers=4,
+    batch_size=64,
+    max_tokens=256,
+    overlap_tokens=32,
+):
+    """Ingest every file under dir_path matching pattern.
+
+    Files are streamed and chunked with a token-budgeted splitter, chunks
+    already ingested (by content hash) are skipped, and embeddings are
+    computed in batches on a pool of worker threads. Files whose mtime and
+    size, or failing that content hash, are unchanged since their last
+    ingest are skipped without re-chunking. Every chunk is recorded under
+    each file it appears in; when a file has changed, chunks that are gone
+    from it lose that reference, and their vectors are deleted once no file
+    references them (nor any file seen in this run). Returns a throughput
+    report.
+    """
+    db = Database(db_path)
+    if db.collection is None:
+        raise RuntimeError("No vector store available, cannot ingest.")
+
+    stats = {
+        "files_seen": 0,
+        "files_skipped": 0,
+        "files_ingested": 0,
+        "chunks": 0,
+        "chunks_duplicate": 0,
+        "chunks_deleted": 0,
+        "bytes": 0,
+    }
+    started = time.perf_counter()
+
+    in_flight = {}  # embedding future -> batch of (hash, text, meta)
+    outstanding = {}  # file path -> chunks not yet stored
+    # file path -> (source, chunk hashes, (mtime, size, sha256, chunks)) once chunked
+    finished_files = {}
+
+    def drain(block):
+        if block:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        else:
+            done = [f for f in in_flight if f.done()]
+        for future in done:
+            batch = in_flight.pop(future)
+            db.add_embedded_documents(
+                [f"chunk_{h[:32]}" for h, _, _ in batch],
+                [text for _, text, _ in batch],
+                [meta for _, _, meta in batch],
+                future.result(),
+            )
+            db.record_chunks([(h, meta["source"]) for h, _, meta in batch])
+            for _, _, meta in batch:
+                outstanding[meta["path"]] -= 1
+                mark_done(meta["path"])
+
+    def mark_done(path):
+        # A file only counts as ingested once every one of its chunks is stored
+        if not outstanding.get(path) and path in finished_files:
+            source, hashes, record = finished_files.pop(path)
+            # Chunks stored for other files, or earlier, count for this one too
+            db.record_chunks([(h, source) for h in hashes])
+            db.record_ingested_file(path, *record)
+
+    def submit(batch, pool):
+        in_flight[pool.submit(db.embed, [text for _, text, _ in batch])] = batch
+        # Bound memory: never hold more than a couple of batches per worker
+        while len(in_flight) >= workers * 2:
+            drain(block=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        seen_hashes = set()
+        for root, _, files in os.walk(dir_path):
+            for name in sorted(files):
+                if not fnmatch.fnmatch(name, pattern):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                stats["files_seen"] += 1
+
+                st = os.stat(path)
+                previous = db.get_ingested_file(path)
+                if previous and (previous["mtime"], previous["size"]) == (
+                    st.st_mtime,
+                    st.st_size,
+                ):
+                    stats["files_skipped"] += 1
+                    continue
+                sha = _file_sha256(path)
+                if previous and previous["sha256"] == sha:
+                    db.record_ingested_file(
+                        path, st.st_mtime, st.st_size, sha, previous["chunks"]
+                    )
+                    stats["files_skipped"] += 1
+                    continue
+
+                source = os.path.relpath(path, dir_path)
+                n_chunks = 0
+                file_hashes = set()
+                candidates = []
+                for i, text in enumerate(
+                    chunk_paragraphs(iter_paragraphs(path), max_tokens, overlap_tokens)
+                ):
+                    n_chunks += 1
+                    h = _chunk_hash(text)
+                    file_hashes.add(h)
+                    if h in seen_hashes:
+                        stats["chunks_duplicate"] += 1
+                        continue
+                    seen_hashes.add(h)
+                    meta = {"source": source, "chunk_index": i, "path": path}
+                    candidates.append((h, text, meta))
+                    if len(candidates) >= batch_size:
+                        new = _drop_known(db, candidates, stats)
+                        outstanding[path] = outstanding.get(path, 0) + len(new)
+                        batch.extend(new)
+                        candidates = []
+                    while len(batch) >= batch_size:
+                        submit(batch[:batch_size], pool)
+                        batch = batch[batch_size:]
+                new = _drop_known(db, candidates, stats)
+                outstanding[path] = outstanding.get(path, 0) + len(new)
+                batch.extend(new)
+                if previous:
+                    stale = db.get_source_chunks(source) - file_hashes
+                    if stale:
+                        deleted = db.release_chunks(source, stale, keep=seen_hashes)
+                        stats["chunks_deleted"] += len(deleted)
+
+                stats["files_ingested"] += 1
+                stats["bytes"] += st.st_size
+                finished_files[path] = (
+                    source,
+                    file_hashes,
+                    (st.st_mtime, st.st_size, sha, n_chunks),
+                )
+                mark_done(path)
+                drain(block=False)
+
+        if batch:
+            submit(batch, pool)
+        while in_flight:
+            drain(block=True)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = elapsed
+    stats["chunks_per_sec"] = stats["chunks"] / elapsed if elapsed else 0.0
+    stats["mb_per_sec"] = stats["bytes"] / 2**20 / elapsed if elapsed else 0.0
+    log.info(
+        "Ingested %d chunks from %d files (%d unchanged, %d duplicate chunks, "
+        "%d deleted) in %.1fs: %.1f chunks/s, %.2f MB/s",
+        stats["chunks"],
+        stats["files_ingested"],
+        stats["files_skipped"],
+        stats["chunks_duplicate"],
+        stats["chunks_deleted"],
+        elapsed,
+        stats["chunks_per_sec"],
+        stats["mb_per_sec"],
+    )
+    return stats
+
+
+def _drop_known(db, candidates, stats):
+    """Filter out chunks already ingested in an earlier run."""
+    if not candidates:
+        return []
+    new = db.filter_new_chunks(h for h, _, _ in candidates)
+    stats["chunks_duplicate"] += len(candidates) - len(new)
+    stats["chunks"] += len(new)
+    return [c for c in candidates if c[0] in new]
+
+
 def ingest_file(file_path):
     """CLI wrapper for backward compatibility."""
     ingest_text_file(file_path)
@@ -38,9 +282,25 @@ def ingest_file(file_path):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description="Ingest a text file into Warscribe RAG"
+        description="Ingest a text file or directory into Warscribe RAG"
     )
-    parser.add_argument("file", help="Path to text file")
+    parser.add_argument("file", help="Path to text file or directory")
+    parser.add_argument("--pattern", default="*.txt", help="Directory mode file glob")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=32)
     args = parser.parse_args()
 
-    ingest_file(args.file)
+    setup_logging()
+    if os.path.isdir(args.file):
+        ingest_directory(
+            args.file,
+            pattern=args.pattern,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            max_tokens=args.chunk_tokens,
+            overlap_tokens=args.overlap_tokens,
+        )
+    else:
+        ingest_file(args.file)
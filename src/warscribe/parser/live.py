@@ -0,0 +1,392 @@
+"""
+Warscribe live mode — near-live output for a stream that is still running.
+
+The stream's audio is captured to a raw 16 kHz mono PCM file (yt-dlp piped
+into ffmpeg, or ffmpeg alone for HLS/RTMP/file inputs). While it grows:
+
+- audio is transcribed in fixed windows as soon as each window is on disk
+- chat is downloaded concurrently onto the same timeline
+- LLM extraction and embeddings run incrementally on new segments
+
+Lag is measured per segment from when its audio reached the disk to when it
+was transcribed, analyzed and embedded. If transcription falls more than
+max_lag_seconds behind, it skips ahead so the lag stays bounded; skipped
+audio is counted and logged.
+
+Usage:
+    python live.py <url> [--window 30] [--max-lag 120]
+    python live.py <url> --ffmpeg-input <hls/rtmp url or file>
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import metrics
+from audio import SAMPLE_RATE, PcmTail, to_float32
+from chat_parser import ChatParser
+from db import Database
+from downloader import Downloader
+from utils import canonical_url, extract_video_id, percentile, setup_logging
+
+log = logging.getLogger("warscribe.live")
+
+LIVE_STAGES = ("transcribe", "analyze", "embed")
+
+
+def start_capture(url, pcm_path, ffmpeg_input=None):
+    """Start appending the stream's audio to pcm_path; returns the processes."""
+    ffmpeg = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        ffmpeg_input or "pipe:0",
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+    with open(pcm_path, "ab") as out:
+        if ffmpeg_input:
+            return [subprocess.Popen(ffmpeg, stdout=out)]
+        ytdlp = subprocess.Popen(
+            ["yt-dlp", "-f", "bestaudio/best", "--no-part", "-o", "-", url],
+            stdout=subprocess.PIPE,
+        )
+        ff = subprocess.Popen(ffmpeg, stdin=ytdlp.stdout, stdout=out)
+        ytdlp.stdout.close()  # ffmpeg owns the pipe now
+        return [ytdlp, ff]
+
+
+class LagTracker:
+    """Recent capture-to-output lag per stage, in seconds."""
+
+    def __init__(self, samples=1000):
+        self._lags = {stage: deque(maxlen=samples) for stage in LIVE_STAGES}
+        self._max = dict.fromkeys(LIVE_STAGES, 0.0)
+        self._lock = threading.Lock()
+
+    def observe(self, stage, lag):
+        with self._lock:
+            self._lags[stage].append(lag)
+            self._max[stage] = max(self._max[stage], lag)
+        metrics.observe(
+            "warscribe_live_lag_seconds",
+            lag,
+            "Capture to output lag in live mode",
+            stage=stage,
+        )
+
+    def report(self):
+        with self._lock:
+            return {
+                stage: {
+                    "segments": len(lags),
+                    "p50": percentile(list(lags), 0.5),
+                    "p95": percentile(list(lags), 0.95),
+                    "max": self._max[stage] if lags else None,
+                }
+                for stage, lags in self._lags.items()
+            }
+
+
+class LiveTranscriber:
+    """Transcribe a growing PCM file window by window."""
+
+    def __init__(
+        self,
+        model,
+        db,
+        video_id,
+        tail,
+        lag,
+        window_seconds=30.0,
+        max_lag_seconds=120.0,
+        poll_interval=0.25,
+        options=None,
+    ):
+        self.model = model
+        # Whisper decoding options, e.g. a transcriber.PROFILES entry
+        self.options = options or {"beam_size": 5}
+        self.db = db
+        self.video_id = video_id
+        self.tail = tail
+        self.lag = lag
+        self.window = int(window_seconds * SAMPLE_RATE)
+        self.max_backlog = int(max_lag_seconds * SAMPLE_RATE)
+        self.poll_interval = poll_interval
+        self.arrivals = {}  # segment id -> wall time its audio was on disk
+        self.skipped_seconds = 0.0
+
+    def run(self, capture_done):
+        """Transcribe until capture_done is set and the file is exhausted."""
+        pos = int((self.db.get_last_segment_end(self.video_id) or 0.0) * SAMPLE_RATE)
+        while True:
+            available = self.tail.wait_for(
+                pos + self.window, capture_done, self.poll_interval
+            )
+            final = available < pos + self.window
+            if final and available <= pos:
+                return
+
+            if available - pos > self.max_backlog:
+                # Falling behind: drop audio rather than let lag grow forever
+                skip_to = available - self.window
+                self.skipped_seconds += (skip_to - pos) / SAMPLE_RATE
+                metrics.inc(
+                    "warscribe_live_skipped_seconds_total",
+                    (skip_to - pos) / SAMPLE_RATE,
+                    "Audio skipped to bound live lag",
+                )
+                log.warning(
+                    "Transcription %.0fs behind, skipping to %.0fs",
+                    (available - pos) / SAMPLE_RATE,
+                    skip_to / SAMPLE_RATE,
+                )
+                pos = skip_to
+                continue
+
+            end = min(pos + self.window, available)
+            segments, _ = self.model.transcribe(
+                to_float32(self.tail.read(pos, end - pos)), **self.options
+            )
+            segments = list(segments)
+            next_pos = end
+            # The window edge may cut the last segment; redo it next window
+            if not final and segments and segments[-1].start > 0:
+                next_pos = pos + int(segments.pop().start * SAMPLE_RATE)
+
+            offset = pos / SAMPLE_RATE
+            rows = [(offset + s.start, offset + s.end, s.text) for s in segments]
+            ids = self.db.add_transcribed_segments(self.video_id, self.tail.path, rows)
+            now = time.time()
+            for (_, seg_end, text), seg_id in zip(rows, ids):
+                arrived = self.tail.arrival_time(int(seg_end * SAMPLE_RATE))
+                self.arrivals[seg_id] = arrived
+                self.lag.observe("transcribe", now - arrived)
+                log.debug("[%.2fs] %s", seg_end, text)
+            self.tail.forget(next_pos)
+            pos = next_pos
+
+
+def resolve_video_id(url, input_dir="input", db_path="warscribe.db"):
+    """The video id for url, asking yt-dlp for anything that isn't YouTube.
+
+    The id names files and database rows, so a source yt-dlp cannot resolve
+    (e.g. a raw ffmpeg input) gets a stable path-safe id derived from the URL.
+    """
+    try:
+        video_id = Downloader(output_dir=input_dir, db_path=db_path).get_video_id(url)
+    except Exception as e:
+        log.warning("Could not resolve a video id for %s: %s", url, e)
+        video_id = None
+    return video_id or "live_" + hashlib.sha1(url.encode()).hexdigest()[:12]
+
+
+class LiveSession:
+    def __init__(
+        self,
+        url,
+        db_path="warscribe.db",
+        input_dir="input",
+        model=None,
+        window_seconds=30.0,
+        max_lag_seconds=120.0,
+        ffmpeg_input=None,
+        analyze=True,
+        embed=True,
+        chat=True,
+        interval=5.0,
+        chat_grace_seconds=5.0,
+    ):
+        video_id = extract_video_id(url)
+        self.url = canonical_url(video_id) if video_id else url
+        self.video_id = video_id or resolve_video_id(url, input_dir, db_path)
+        self.db_path = db_path
+        self.input_dir = input_dir
+        self.model = model
+        self.window_seconds = window_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.ffmpeg_input = ffmpeg_input
+        self.analyze = analyze
+        self.embed = embed
+        self.chat = chat
+        self.interval = interval
+        self.chat_grace_seconds = chat_grace_seconds
+        self.pcm_path = os.path.join(input_dir, f"{self.video_id}.pcm")
+
+        self.db = Database(db_path, with_chroma=False)
+        self.lag = LagTracker()
+        self.capture_done = threading.Event()
+        self.transcribe_done = threading.Event()
+        self._procs = []
+        self._arrivals = {}
+        self._llm = None
+        self._embed_db = None
+
+    def stop(self, *_):
+        """End the capture; what has been captured is still processed."""
+        for proc in self._procs:
+            if proc.poll() is None:
+                proc.terminate()
+        self.capture_done.set()
+
+    def run(self, capture=True):
+        """Process the stream until it ends or stop() is called.
+
+        With capture=False the PCM file is expected to be written by someone
+        else; call stop() once it is complete. Returns the lag report.
+        """
+        os.makedirs(self.input_dir, exist_ok=True)
+        self.db.add_job(self.video_id, self.url)
+        self.db.update_job_status(self.video_id, "live")
+        tail = PcmTail(self.pcm_path)
+        # Audio offset 0 in wall-clock time, for placing live chat messages
+        time_origin = time.time() - tail.available() / SAMPLE_RATE
+
+        if capture:
+            self._procs = start_capture(self.url, self.pcm_path, self.ffmpeg_input)
+            threading.Thread(target=self._watch_capture, daemon=True).start()
+        options = None
+        if self.model is None:
+            from transcriber import PROFILES, Transcriber
+
+            whisper = Transcriber(
+                model_size=os.environ.get("WHISPER_MODEL", "tiny"),
+                device=os.environ.get("WHISPER_DEVICE", "cpu"),
+                db_path=self.db_path,
+                input_dir=self.input_dir,
+            )
+            self.model, options = whisper.model, PROFILES[whisper.profile]
+
+        transcriber = LiveTranscriber(
+            self.model,
+            self.db,
+            self.video_id,
+            tail,
+            self.lag,
+            self.window_seconds,
+            self.max_lag_seconds,
+            options=options,
+        )
+        self._arrivals = transcriber.arrivals
+        workers = []
+        if self.chat:
+            stop_chat = threading.Event()
+            threading.Thread(
+                target=ChatParser(self.db_path).process_chat,
+                args=(self.video_id, time_origin, 2.0, stop_chat),
+                daemon=True,  # the chat generator blocks between messages
+            ).start()
+        if self.analyze:
+            workers.append(self._incremental("analyze", self._analyze_pass, tail))
+        if self.embed:
+            workers.append(self._incremental("embed", self._embed_pass, tail))
+
+        try:
+            transcriber.run(self.capture_done)
+        finally:
+            self.transcribe_done.set()
+            for worker in workers:
+                worker.join()
+            if self.chat:
+                stop_chat.set()
+
+        status = "completed" if self.analyze and self.embed else "transcribed"
+        self.db.update_job_status(self.video_id, status)
+        report = self.lag.report()
+        report["skipped_seconds"] = transcriber.skipped_seconds
+        log.info("Live session for %s finished: %s", self.video_id, report)
+        metrics.flush()
+        return report
+
+    def _watch_capture(self):
+        for proc in self._procs:
+            proc.wait()
+        self.capture_done.set()
+
+    def _incremental(self, stage, fn, tail):
+        """Run fn every interval until transcription is over, then once more."""
+        reported = set()
+
+        def loop():
+            while True:
+                finishing = self.transcribe_done.wait(self.interval)
+                try:
+                    fn(tail, finishing)
+                    self._observe_lag(stage, reported)
+                except Exception:
+                    log.exception("Live %s pass failed", stage)
+                if finishing:
+                    return
+
+        thread = threading.Thread(target=loop, name=f"live-{stage}")
+        thread.start()
+        return thread
+
+    def _analyze_pass(self, tail, finishing):
+        from warscribe_llm import WarscribeLLM
+
+        if self._llm is None:
+            self._llm = WarscribeLLM(db_path=self.db_path)
+        # Leave chat a moment to arrive for the newest audio
+        until = None
+        if not finishing:
+            until = tail.available() / SAMPLE_RATE - self.chat_grace_seconds
+        self._llm.process_job(self.video_id, until=until)
+
+    def _embed_pass(self, tail, finishing):
+        if self._embed_db is None:
+            self._embed_db = Database(self.db_path)
+        self._embed_db.add_transcript_embeddings(
+            self.video_id, self.db.get_segments_needing_embedding(self.video_id)
+        )
+
+    def _observe_lag(self, stage, reported):
+        done = {"analyze": "analyzed", "embed": "embedded"}[stage]
+        for seg_id, finished in self.db.get_segment_stage_times(self.video_id, done):
+            arrived = self._arrivals.get(seg_id)
+            if arrived is None or seg_id in reported:
+                continue
+            reported.add(seg_id)
+            self.lag.observe(stage, finished - arrived)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warscribe live stream mode")
+    parser.add_argument("url")
+    parser.add_argument("--window", type=float, default=30.0, help="seconds")
+    parser.add_argument("--max-lag", type=float, default=120.0, help="seconds")
+    parser.add_argument("--ffmpeg-input", help="read audio with ffmpeg from this")
+    parser.add_argument("--no-llm", action="store_true")
+    parser.add_argument("--no-embed", action="store_true")
+    args = parser.parse_args()
+
+    setup_logging()
+    session = LiveSession(
+        args.url,
+        db_path=os.environ.get("DB_PATH", "warscribe.db"),
+        input_dir=os.environ.get("INPUT_DIR", "input"),
+        window_seconds=args.window,
+        max_lag_seconds=args.max_lag,
+        ffmpeg_input=args.ffmpeg_input,
+        analyze=not args.no_llm,
+        embed=not args.no_embed,
+    )
+    signal.signal(signal.SIGTERM, session.stop)
+    signal.signal(signal.SIGINT, session.stop)
+    print(session.run())
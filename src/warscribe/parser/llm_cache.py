@@ -0,0 +1,202 @@
+"""
+Content-addressed cache for LLM extraction responses.
+
+Entries are keyed on (model, prompt template version, transcript, chat) and
+kept in a local SQLite file, so re-running extraction for a segment that was
+already analyzed returns instantly instead of calling Ollama again.
+
+Lookups are read-only: access times (for LRU eviction) and hit/miss
+counters are kept in memory and written every FLUSH_EVERY lookups, on put
+and before stats are read.
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+FLUSH_EVERY = 64  # lookups between writes of access times and counters
+
+
+class LLMCache:
+    def __init__(self, path="warscribe_llm_cache.db", max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._accessed = {}  # key -> last access time, not yet written
+        self._counts = Counter()
+        self._pending = 0
+        self._init_db()
+
+    def _init_db(self):
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("""CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            prompt_version TEXT,
+            response TEXT,
+            size INTEGER,
+            created_at REAL,
+            last_access REAL
+        )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache(last_access)")
+        # Persistent counters for the hit-rate report
+        c.execute("""CREATE TABLE IF NOT EXISTS cache_stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER
+        )""")
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def make_key(model, prompt_version, transcript, chat_text):
+        h = hashlib.sha256()
+        for part in (model, prompt_version, transcript, chat_text):
+            h.update((part or "").encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss."""
+        conn = sqlite3.connect(self.path)
+        row = conn.execute(
+            "SELECT response FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        conn.close()
+        with self._lock:
+            if row:
+                self._accessed[key] = time.time()
+            self._counts["hits" if row else "misses"] += 1
+            self._pending += 1
+            due = self._pending >= FLUSH_EVERY
+        if due:
+            self.flush()
+        return row[0] if row else None
+
+    def put(self, key, model, prompt_version, response):
+        now = time.time()
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        self._write_pending(c)
+        c.execute(
+            """INSERT OR REPLACE INTO cache (key, model, prompt_version, response, size, created_at, last_access)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (key, model, prompt_version, response, len(response), now, now),
+        )
+        self._evict(c)
+        conn.commit()
+        conn.close()
+
+    def flush(self):
+        """Write buffered access times and hit/miss counts."""
+        conn = sqlite3.connect(self.path)
+        self._write_pending(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    def _write_pending(self, c):
+        with self._lock:
+            accessed, counts = self._accessed, self._counts
+            self._accessed, self._counts, self._pending = {}, Counter(), 0
+        c.executemany(
+            "UPDATE cache SET last_access = MAX(last_access, ?) WHERE key = ?",
+            [(t, key) for key, t in accessed.items()],
+        )
+        for name, amount in counts.items():
+            self._bump(c, name, amount)
+
+    def _evict(self, c):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        c.execute("SELECT COALESCE(SUM(size), 0) FROM cache")
+        excess = c.fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        c.execute("SELECT key, size FROM cache ORDER BY last_access ASC")
+        victims = []
+        for key, size in c.fetchall():
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= size
+        c.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self._bump(c, "evictions", len(victims))
+
+    def _bump(self, c, name, amount=1):
+        c.execute(
+            """INSERT INTO cache_stats (name, value) VALUES (?, ?)
+                     ON CONFLICT(name) DO UPDATE SET value = value + excluded.value""",
+            (name, amount),
+        )
+
+    def stats(self):
+        self.flush()
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache")
+        entries, size = c.fetchone()
+        c.execute("SELECT name, value FROM cache_stats")
+        counters = dict(c.fetchall())
+        conn.close()
+
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._accessed, self._counts, self._pending = {}, Counter(), 0
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        c.execute("DELETE FROM cache")
+        c.execute("DELETE FROM cache_stats")
+        conn.commit()
+        conn.close()
+
+
+def get_cache():
+    """Build the cache configured by LLM_CACHE_PATH / LLM_CACHE_MAX_MB.
+
+    Setting LLM_CACHE_PATH to an empty string disables caching.
+    """
+    path = os.environ.get("LLM_CACHE_PATH", "warscribe_llm_cache.db")
+    if not path:
+        return None
+    max_mb = float(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 2**20))
+    return LLMCache(path, max_bytes=int(max_mb * 2**20))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the Warscribe LLM cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if cache is None:
+        print("LLM cache is disabled (LLM_CACHE_PATH is empty).")
+    elif args.command == "clear":
+        cache.clear()
+        print(f"Cleared {cache.path}")
+    else:
+        s = cache.stats()
+        print(
+            f"Entries:   {s['entries']} ({s['bytes'] / 2**20:.1f} / {s['max_bytes'] / 2**20:.1f} MiB)"
+        )
+        print(f"Hits:      {s['hits']}")
+        print(f"Misses:    {s['misses']}")
+        print(f"Evictions: {s['evictions']}")
+        print(f"Hit rate:  {s['hit_rate']:.1%}")
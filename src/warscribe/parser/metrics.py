@@ -0,0 +1,321 @@
+"""
+Low-overhead metrics for the Warscribe pipeline.
+
+Counters, gauges and histograms are kept in a per-process registry. Worker
+processes flush a JSON snapshot of it to METRICS_DIR; the API merges every
+snapshot with its own registry and serves the result in the Prometheus text
+exposition format at /metrics.
+
+Snapshots are named after the process (process_name()). RQ workers use their
+worker name, and the work-horse RQ forks for each job resumes the worker's
+last snapshot, so counts carry across jobs in one file. Snapshots nobody has
+written for METRICS_MAX_AGE seconds are from exited processes; they are left
+out of /metrics and deleted by prune() when a worker starts.
+"""
+
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("warscribe.metrics")
+
+METRICS_DIR = os.environ.get("METRICS_DIR", "metrics")
+METRICS_MAX_AGE = float(os.environ.get("METRICS_MAX_AGE", "86400"))
+# None: host, PID and start time (see process_name)
+PROCESS_NAME = os.environ.get("METRICS_PROCESS_NAME") or None
+
+# Seconds; wide enough for both SQLite commits and multi-minute LLM calls
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> {"type", "help", "buckets", "samples": {label items: value}}
+        self._metrics = {}
+        self._last_flush = 0.0
+        self._pid = os.getpid()  # process whose counts these are
+
+    def _metric(self, name, kind, help, buckets=None):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = {
+                "type": kind,
+                "help": help,
+                "buckets": list(buckets) if buckets else None,
+                "samples": {},
+            }
+        return metric
+
+    def inc(self, name, value=1.0, help="", **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._metric(name, "counter", help)["samples"]
+            samples[key] = samples.get(key, 0.0) + value
+
+    def set(self, name, value, help="", **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._metric(name, "gauge", help)["samples"][key] = value
+
+    def observe(self, name, value, help="", buckets=DEFAULT_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metric(name, "histogram", help, buckets)
+            sample = metric["samples"].get(key)
+            if sample is None:
+                sample = metric["samples"][key] = {
+                    "buckets": [0] * len(metric["buckets"]),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for i, bound in enumerate(metric["buckets"]):
+                if value <= bound:
+                    sample["buckets"][i] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "type": m["type"],
+                    "help": m["help"],
+                    "buckets": m["buckets"],
+                    "samples": [
+                        {"labels": dict(key), "value": value}
+                        for key, value in m["samples"].items()
+                    ],
+                }
+                for name, m in self._metrics.items()
+            }
+
+    def restore(self, snapshot):
+        """Replace the registry's contents with a snapshot()."""
+        metrics = {}
+        _merge(metrics, snapshot)
+        with self._lock:
+            self._metrics = metrics
+
+
+REGISTRY = Registry()
+
+
+def inc(name, value=1.0, help="", **labels):
+    REGISTRY.inc(name, value, help, **labels)
+
+
+def set_gauge(name, value, help="", **labels):
+    REGISTRY.set(name, value, help, **labels)
+
+
+def observe(name, value, help="", **labels):
+    REGISTRY.observe(name, value, help, **labels)
+
+
+@contextmanager
+def timer(name, help="", **labels):
+    """Observe the duration of the with-block, in seconds, into a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - start, help, **labels)
+
+
+_started = {}  # pid -> start time, for the default process name
+
+
+def process_name():
+    """Name this process's snapshot is flushed under.
+
+    Defaults to host, PID and start time, so a reused PID never overwrites
+    an older process's snapshot with smaller counts.
+    """
+    if PROCESS_NAME:
+        return PROCESS_NAME
+    pid = os.getpid()
+    started = _started.setdefault(pid, int(time.time()))
+    return f"{socket.gethostname()}-{pid}-{started}"
+
+
+def set_process_name(name):
+    """Flush under name, e.g. the RQ worker's, in this process and its forks."""
+    global PROCESS_NAME
+    PROCESS_NAME = name
+
+
+def _snapshot_path(metrics_dir=None):
+    return os.path.join(metrics_dir or METRICS_DIR, f"{process_name()}.json")
+
+
+def resume(metrics_dir=None):
+    """In a forked process, continue from the last snapshot under PROCESS_NAME.
+
+    An RQ work-horse inherits the registry as it was at the fork, so without
+    this each job would flush counts that start over and counters would go
+    backwards. Does nothing in the process that owns the registry.
+    """
+    if REGISTRY._pid == os.getpid():
+        return
+    REGISTRY._pid = os.getpid()
+    try:
+        with open(_snapshot_path(metrics_dir)) as f:
+            REGISTRY.restore(json.load(f))
+    except FileNotFoundError:
+        return  # the worker's first job
+    except (OSError, ValueError) as e:
+        log.warning("Could not resume metrics snapshot: %s", e)
+
+
+def flush(metrics_dir=None):
+    """Write this process's snapshot for the API to pick up."""
+    metrics_dir = metrics_dir or METRICS_DIR
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = _snapshot_path(metrics_dir)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp, path)
+    REGISTRY._last_flush = time.monotonic()
+
+
+def maybe_flush(interval=15.0):
+    """flush() at most every `interval` seconds; cheap enough for hot loops."""
+    if time.monotonic() - REGISTRY._last_flush >= interval:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _merge(into, snapshot):
+    for name, m in snapshot.items():
+        target = into.setdefault(
+            name,
+            {
+                "type": m["type"],
+                "help": m["help"],
+                "buckets": m["buckets"],
+                "samples": {},
+            },
+        )
+        for sample in m["samples"]:
+            key = tuple(sorted(sample["labels"].items()))
+            value = sample["value"]
+            current = target["samples"].get(key)
+            if current is None or m["type"] == "gauge":
+                target["samples"][key] = (
+                    dict(value, buckets=list(value["buckets"]))
+                    if m["type"] == "histogram"
+                    else value
+                )
+            elif m["type"] == "counter":
+                target["samples"][key] = current + value
+            else:
+                current["buckets"] = [
+                    a + b for a, b in zip(current["buckets"], value["buckets"])
+                ]
+                current["sum"] += value["sum"]
+                current["count"] += value["count"]
+
+
+def _labels(items, extra=()):
+    pairs = list(items) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _snapshots(metrics_dir):
+    """(mtime, path) of every snapshot, oldest first."""
+    dated = []
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        try:
+            dated.append((os.path.getmtime(path), path))
+        except OSError:
+            continue  # pruned meanwhile
+    return sorted(dated)
+
+
+def prune(metrics_dir=None, max_age=None):
+    """Delete snapshots nobody has flushed for max_age seconds.
+
+    Called when a worker starts rather than on every scrape, so rendering
+    /metrics never writes to METRICS_DIR. Returns how many were deleted.
+    """
+    cutoff = time.time() - (max_age or METRICS_MAX_AGE)
+    pruned = 0
+    for mtime, path in _snapshots(metrics_dir or METRICS_DIR):
+        if mtime < cutoff:
+            try:
+                os.remove(path)
+                pruned += 1
+            except OSError:
+                continue  # pruned by another worker
+    return pruned
+
+
+def render_prometheus(metrics_dir=None, max_age=None):
+    """Merge flushed worker snapshots with this process and render them.
+
+    Snapshots are merged oldest first, so a gauge reports the most recently
+    flushed value; this process's own registry is merged last.
+    """
+    metrics_dir = metrics_dir or METRICS_DIR
+    merged = {}
+    own = _snapshot_path(metrics_dir)
+    cutoff = time.time() - (max_age or METRICS_MAX_AGE)
+    for mtime, path in _snapshots(metrics_dir):
+        if path == own or mtime < cutoff:
+            continue  # stale snapshots are from exited processes
+        try:
+            with open(path) as f:
+                _merge(merged, json.load(f))
+        except (OSError, ValueError):
+            continue
+    _merge(merged, REGISTRY.snapshot())
+
+    lines = []
+    for name in sorted(merged):
+        m = merged[name]
+        if m["help"]:
+            lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['type']}")
+        for key, value in sorted(m["samples"].items()):
+            if m["type"] != "histogram":
+                lines.append(f"{name}{_labels(key)} {value}")
+                continue
+            for bound, count in zip(m["buckets"], value["buckets"]):
+                lines.append(f"{name}_bucket{_labels(key, [('le', bound)])} {count}")
+            lines.append(
+                f"{name}_bucket{_labels(key, [('le', '+Inf')])} {value['count']}"
+            )
+            lines.append(f"{name}_sum{_labels(key)} {value['sum']}")
+            lines.append(f"{name}_count{_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
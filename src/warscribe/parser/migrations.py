@@ -0,0 +1,327 @@
+"""
+Versioned schema migrations for the Warscribe SQLite database.
+
+The applied version is kept in SQLite's ``PRAGMA user_version``. Each entry
+of MIGRATIONS brings the schema from version N to N+1 and runs in its own
+write transaction, so concurrent processes opening the same database apply
+every step exactly once. To change the schema, append a function; never
+edit one that has shipped.
+
+Databases created before versioning report version 0. The baseline step
+only uses ``IF NOT EXISTS`` and column checks, so it upgrades them in place.
+
+Usage:
+    python migrations.py [db_path]   # apply pending migrations, print version
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+
+log = logging.getLogger("warscribe.migrations")
+
+
+def _ensure_column(c, table, column, decl):
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in c.fetchall()}:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _baseline(c):
+    """Schema as it was built by Database._init_db before versioning."""
+    # Jobs table: tracks the overall video processing
+    c.execute("""CREATE TABLE IF NOT EXISTS jobs (
+        video_id TEXT PRIMARY KEY,
+        url TEXT,
+        status TEXT, -- 'pending', 'downloading', 'downloaded', 'transcribing', 'transcribed',
+                     -- 'analyzing', 'analyzed', 'embedding', 'completed', 'failed'
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+    # Segments table: tracks chunks of the video
+    c.execute("""CREATE TABLE IF NOT EXISTS segments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id TEXT,
+        segment_index INTEGER,
+        start_time REAL,
+        end_time REAL,
+        audio_path TEXT,
+        transcript TEXT,
+        chat_data TEXT,
+        warscribe_json TEXT,
+        status TEXT, -- 'created', 'transcribed', 'analyzed'
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+
+    c.execute("""CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id TEXT,
+        timestamp REAL,
+        author TEXT,
+        message TEXT,
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_timestamp ON chat_messages(video_id, timestamp)"
+    )
+
+    # Chat rollup: activity per fixed time bucket, built at chat ingest,
+    # for finding hype spikes without scanning every message
+    c.execute("""CREATE TABLE IF NOT EXISTS chat_buckets (
+        video_id TEXT,
+        bucket_seconds REAL,
+        bucket_start REAL,
+        messages INTEGER,
+        unique_authors INTEGER,
+        keyword_hits INTEGER,
+        PRIMARY KEY(video_id, bucket_seconds, bucket_start),
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+
+    # Actions table: validated WARScribe actions extracted from segments
+    c.execute("""CREATE TABLE IF NOT EXISTS actions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id TEXT,
+        segment_id INTEGER,
+        action_type TEXT,
+        turn INTEGER,
+        phase TEXT,
+        actor TEXT,
+        result TEXT,
+        payload TEXT, -- full action model as JSON
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id),
+        FOREIGN KEY(segment_id) REFERENCES segments(id)
+    )""")
+
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_actions_video ON actions(video_id, segment_id)"
+    )
+
+    # Transcription work units: disjoint time ranges of a video, leased to
+    # one worker at a time so several processes or nodes can share a VOD
+    c.execute("""CREATE TABLE IF NOT EXISTS work_units (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id TEXT,
+        start_time REAL,
+        end_time REAL,
+        status TEXT, -- 'pending', 'leased', 'done', 'failed'
+        lease_owner TEXT,
+        lease_expires REAL,
+        attempts INTEGER DEFAULT 0,
+        updated_at REAL,
+        UNIQUE(video_id, start_time),
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_work_units_claim ON work_units(status, lease_expires)"
+    )
+
+    # Text ingestion state: lets directory ingest skip unchanged files
+    # and chunks that are already embedded
+    c.execute("""CREATE TABLE IF NOT EXISTS ingested_files (
+        path TEXT PRIMARY KEY,
+        mtime REAL,
+        size INTEGER,
+        sha256 TEXT,
+        chunks INTEGER,
+        ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+    c.execute("""CREATE TABLE IF NOT EXISTS ingested_chunks (
+        hash TEXT PRIMARY KEY,
+        source TEXT
+    )""")
+
+    # Columns added after the initial schema; per-stage completion times
+    # (unix seconds) back the progress endpoint's throughput figures
+    _ensure_column(c, "jobs", "audio_duration", "REAL")
+    _ensure_column(c, "segments", "transcribed_at", "REAL")
+    _ensure_column(c, "segments", "analyzed_at", "REAL")
+    _ensure_column(c, "segments", "embedded_at", "REAL")
+
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_segments_video_status ON segments(video_id, status)"
+    )
+    # Scheduler polling: oldest jobs in a given status
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+
+def _segment_indexes(c):
+    """Indexes for the per-video segment reads every stage makes."""
+    # get_segments and resume lookups: WHERE video_id = ? ORDER BY start_time
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_segments_video_start ON segments(video_id, start_time)"
+    )
+    # Work queues for the LLM and embedding stages; partial, so they only
+    # hold the rows still waiting and shrink to nothing as a video finishes
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_segments_unanalyzed ON segments(video_id, start_time)
+                 WHERE warscribe_json IS NULL"""
+    )
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_segments_unembedded ON segments(video_id, start_time)
+                 WHERE embedded_at IS NULL"""
+    )
+
+
+def _archive_blocks(c):
+    """Compressed cold storage for completed jobs (see archive.py)."""
+    c.execute("""CREATE TABLE IF NOT EXISTS archive_blocks (
+        video_id TEXT,
+        kind TEXT, -- 'segments' or 'chat'
+        block INTEGER,
+        start_time REAL,
+        end_time REAL,
+        codec TEXT, -- 'zstd' or 'zlib'
+        rows INTEGER,
+        raw_bytes INTEGER,
+        data BLOB,
+        created_at REAL,
+        PRIMARY KEY(video_id, kind, block),
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+    _ensure_column(c, "jobs", "archived_at", "REAL")
+
+
+def _job_profile(c):
+    """Per-job Whisper decoding profile (see transcriber.PROFILES)."""
+    _ensure_column(c, "jobs", "profile", "TEXT")
+
+
+def _audio_fingerprints(c):
+    """Fingerprint index and copied ranges for re-upload dedup (see fingerprint.py)."""
+    c.execute("""CREATE TABLE IF NOT EXISTS fingerprints (
+        hash INTEGER,
+        video_id TEXT,
+        frame INTEGER,
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_fingerprints_hash ON fingerprints(hash)")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fingerprints_video ON fingerprints(video_id)"
+    )
+
+    # Ranges of a video whose segments were copied from an earlier upload
+    # rather than transcribed; the transcriber leaves them out of work units
+    c.execute("""CREATE TABLE IF NOT EXISTS audio_matches (
+        video_id TEXT,
+        start_time REAL,
+        end_time REAL,
+        source_video_id TEXT,
+        offset REAL, -- source time = time + offset
+        segments INTEGER,
+        created_at REAL,
+        PRIMARY KEY(video_id, start_time),
+        FOREIGN KEY(video_id) REFERENCES jobs(video_id)
+    )""")
+
+
+def _progress_index(c):
+    """Covering index for Database.get_job_progress.
+
+    Its aggregates only touch these small columns, so they are answered from
+    the index instead of reading segment rows with their transcript and LLM
+    output text.
+    """
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_segments_progress ON segments(
+               video_id, status, start_time, end_time,
+               transcribed_at, analyzed_at, embedded_at)"""
+    )
+
+
+def _ingested_chunk_sources(c):
+    """Look up a file's ingested chunks, to delete them when it changes."""
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ingested_chunks_source ON ingested_chunks(source)"
+    )
+
+
+def _job_claims(c):
+    """Who is running a job's stage and until when, so crashed claims expire."""
+    _ensure_column(c, "jobs", "claim_owner", "TEXT")
+    _ensure_column(c, "jobs", "claim_expires", "REAL")
+
+
+def _ingested_chunk_pairs(c):
+    """Key ingested_chunks by (hash, source), one row per file sharing a chunk.
+
+    Keyed by hash alone, a chunk was only recorded under the first file it
+    was seen in, so that file changing deleted a vector others still used.
+    """
+    c.execute("""CREATE TABLE ingested_chunks_pairs (
+        hash TEXT,
+        source TEXT,
+        PRIMARY KEY(hash, source)
+    )""")
+    c.execute(
+        "INSERT OR IGNORE INTO ingested_chunks_pairs SELECT hash, source FROM ingested_chunks"
+    )
+    c.execute("DROP TABLE ingested_chunks")
+    c.execute("ALTER TABLE ingested_chunks_pairs RENAME TO ingested_chunks")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ingested_chunks_source ON ingested_chunks(source)"
+    )
+
+
+MIGRATIONS = [
+    _baseline,
+    _segment_indexes,
+    _archive_blocks,
+    _job_profile,
+    _audio_fingerprints,
+    _progress_index,
+    _ingested_chunk_sources,
+    _job_claims,
+    _ingested_chunk_pairs,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations; returns the resulting schema version.
+
+    conn must be in autocommit mode (isolation_level=None) so each step's
+    BEGIN IMMEDIATE ... COMMIT is under our control.
+    """
+    while schema_version(conn) < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another process may have migrated
+            version = schema_version(conn)
+            if version < SCHEMA_VERSION:
+                step = MIGRATIONS[version]
+                step(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                log.info("Migrated schema to v%d (%s)", version + 1, step.__name__)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        log.warning(
+            "Database schema v%d is newer than this code (v%d)", version, SCHEMA_VERSION
+        )
+    return version
+
+
+if __name__ == "__main__":
+    from utils import setup_logging
+
+    setup_logging()
+    path = (
+        sys.argv[1] if len(sys.argv) > 1 else os.environ.get("DB_PATH", "warscribe.db")
+    )
+    conn = sqlite3.connect(path, isolation_level=None)
+    print(f"{path}: schema v{migrate(conn)}")
+    conn.close()
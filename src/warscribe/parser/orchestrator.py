@@ -1,63 +1,328 @@
-import time
-import sys
+"""
+Warscribe Orchestrator — single-node pipeline without Redis.
+
+``add_job`` runs every stage for one video in the foreground. ``run_loop``
+is a daemon that polls the jobs table and moves many videos through the
+stages concurrently, each stage on its own bounded thread pool:
+
+    pending -> downloading -> downloaded -> transcribing -> transcribed
+            -> analyzing -> analyzed -> embedding -> completed
+
+Jobs are claimed with a compare-and-set on their status, leased to this
+process for CLAIM_LEASE_SECONDS and renewed while the stage runs. Jobs whose
+lease ran out, because the process running them died, are put back in front
+of their stage; every stage resumes where it stopped. SIGTERM/SIGINT stop
+claiming new work and wait for the running stages to finish.
+
+Run the daemon:
+    python orchestrator.py run
+or process a single URL in the foreground:
+    python orchestrator.py add <url>
+"""
+
+import argparse
+import logging
 import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
+import metrics
 from db import Database
 from downloader import Downloader
-from transcriber import Transcriber
 from chat_parser import ChatParser
-from warscribe_llm import WarscribeLLM
+from utils import extract_video_id, setup_logging
+
+log = logging.getLogger("warscribe.orchestrator")
+
+CLAIM_LEASE_SECONDS = float(os.environ.get("CLAIM_LEASE_SECONDS", "120"))
+
+# Stage -> (status it claims jobs from, status while running, default concurrency)
+STAGES = {
+    "download": ("pending", "downloading", 2),
+    "transcribe": ("downloaded", "transcribing", 1),
+    "analyze": ("transcribed", "analyzing", 1),
+    "embed": ("analyzed", "embedding", 1),
+}
+
+
+def stage_concurrency(stage):
+    """Configured parallelism for a stage, from STAGE_CONCURRENCY_<STAGE>."""
+    env = f"STAGE_CONCURRENCY_{stage.upper()}"
+    return int(os.environ.get(env, STAGES[stage][2]))
 
 
 class Orchestrator:
-    def __init__(self, db_path="warscribe.db"):
-        self.db = Database(db_path)
-        self.downloader = Downloader("input", db_path=db_path)
-        self.transcriber = Transcriber(
-            model_size="tiny", device="cpu", db_path=db_path, input_dir="input"
-        )
+    def __init__(self, db_path="warscribe.db", input_dir="input", concurrency=None):
+        self.db_path = db_path
+        self.input_dir = input_dir
+        self.db = Database(db_path, with_chroma=False)
+        self.downloader = Downloader(input_dir, db_path=db_path)
         self.chat_parser = ChatParser(db_path=db_path)
-        self.warscribe_llm = WarscribeLLM(db_path=db_path)
+        self.concurrency = {
+            stage: (concurrency or {}).get(stage) or stage_concurrency(stage)
+            for stage in STAGES
+        }
+        # Heavy models are loaded on first use, once per process
+        self._transcriber = None
+        self._embed_db = None
+        self._init_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._running = {stage: set() for stage in STAGES}
+        self._running_lock = threading.Lock()
+        # Claims are leased to this instance and renewed while stages run
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = CLAIM_LEASE_SECONDS
+
+    @property
+    def transcriber(self):
+        with self._init_lock:
+            if self._transcriber is None:
+                from transcriber import Transcriber
+
+                self._transcriber = Transcriber(
+                    model_size=os.environ.get("WHISPER_MODEL", "tiny"),
+                    device=os.environ.get("WHISPER_DEVICE", "cpu"),
+                    db_path=self.db_path,
+                    input_dir=self.input_dir,
+                )
+            return self._transcriber
+
+    @property
+    def embed_db(self):
+        with self._init_lock:
+            if self._embed_db is None:
+                self._embed_db = Database(self.db_path)
+            return self._embed_db
+
+    # ── Foreground ─────────────────────────────────────────
 
     def add_job(self, url):
-        # Step 1: Download audio
-        print("Starting download phase...")
-        video_id = self.downloader.process(url)
+        """Run every stage for one URL in the calling thread.
+
+        Each stage is claimed and leased like the daemon's, so a daemon
+        polling the same database never recovers a job this is running.
+        """
+        video_id = extract_video_id(url) or self.downloader.get_video_id(url)
+        self.db.submit_job(video_id, url)
+        with self._heartbeats():
+            for stage in STAGES:
+                if not self._claim(stage, video_id):
+                    log.error(
+                        "Job %s is '%s', stopping before %s",
+                        video_id,
+                        self.db.get_job_status(video_id),
+                        stage,
+                    )
+                    return video_id
+                try:
+                    self._run_stage(stage, video_id)
+                finally:
+                    self._release(stage, video_id)
+        log.info("Job finished for %s", video_id)
+        return video_id
+
+    def submit(self, url, profile=None):
+        """Queue a URL for the daemon; returns (created, job)."""
+        video_id = extract_video_id(url) or self.downloader.get_video_id(url)
+        created, job = self.db.submit_job(video_id, url, profile)
+        self._wake.set()
+        return created, job
 
-        # Step 2: Parse live chat (independent of download success)
-        print("Starting chat parsing...")
+    # ── Stages ─────────────────────────────────────────────
+
+    def _download(self, video_id):
+        self.downloader.process(self.db.get_job_url(video_id))
+        # Chat parsing is independent of download success and non-fatal
         try:
             self.chat_parser.process_chat(video_id)
         except Exception as e:
-            print(f"Chat parsing failed (non-fatal): {e}")
+            log.warning("Chat parsing failed (non-fatal): %s", e)
 
-        # Step 3: Transcribe audio
-        print("Starting transcription...")
+    def _transcribe(self, video_id):
         self.transcriber.process_job(video_id)
 
-        # Step 4: Extract Warscribe events via LLM
-        print("Starting Warscribe extraction...")
-        self.warscribe_llm.process_job(video_id)
+    def _analyze(self, video_id):
+        from warscribe_llm import WarscribeLLM
+
+        WarscribeLLM(db_path=self.db_path).process_job(video_id)
+        self.db.update_job_status(video_id, "analyzed")
+
+    def _embed(self, video_id):
+        self.embed_db.add_transcript_embeddings(
+            video_id, self.db.get_segments_needing_embedding(video_id)
+        )
+        self.db.update_job_status(video_id, "completed")
+
+    def _run_stage(self, stage, video_id):
+        log.info("Starting %s for %s", stage, video_id)
+        status = "ok"
+        try:
+            with metrics.timer(
+                "warscribe_task_seconds", "Pipeline task duration", stage=stage
+            ):
+                getattr(self, f"_{stage}")(video_id)
+        except Exception:
+            status = "error"
+            log.exception("%s failed for %s", stage, video_id)
+            self.db.update_job_status(video_id, "failed")
+        finally:
+            metrics.inc(
+                "warscribe_tasks_total",
+                help="Pipeline tasks run",
+                stage=stage,
+                status=status,
+            )
+
+    # ── Claims ─────────────────────────────────────────────
+
+    def _claim(self, stage, video_id):
+        ready, running, _ = STAGES[stage]
+        if not self.db.claim_job(
+            video_id, ready, running, owner=self.owner, lease_seconds=self.lease_seconds
+        ):
+            return False
+        with self._running_lock:
+            self._running[stage].add(video_id)
+        return True
+
+    def _release(self, stage, video_id):
+        with self._running_lock:
+            self._running[stage].discard(video_id)
+
+    def heartbeat(self):
+        """Renew the lease on every job this instance is running."""
+        with self._running_lock:
+            claimed = [v for running in self._running.values() for v in running]
+        for video_id in claimed:
+            if not self.db.heartbeat_job(video_id, self.owner, self.lease_seconds):
+                log.warning("Lost the claim on %s to another process", video_id)
+
+    @contextmanager
+    def _heartbeats(self):
+        """Renew leases in the background for the duration of the block."""
+        done = threading.Event()
 
-        # Step 5: Generate embeddings for RAG
-        print("Generating Embeddings...")
-        segments = self.db.get_segments(video_id)
-        self.db.add_transcript_embeddings(video_id, segments)
+        def beat():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    self.heartbeat()
+                except Exception as e:
+                    log.warning("Could not renew job claims: %s", e)
 
-        print(f"Job finished for {video_id}")
+        thread = threading.Thread(target=beat, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    # ── Daemon ─────────────────────────────────────────────
+
+    def recover(self):
+        """Put jobs whose claim expired back in front of their stage.
 
-    def run_loop(self):
-        # Placeholder for daemon mode
-        while True:
-            # check pending jobs
-            # check processing jobs
-            time.sleep(10)
+        Claims held by a live orchestrator keep being renewed, so only jobs
+        of a process that died (or rows from before claims were leased) move.
+        """
+        now = time.time()
+        for ready, running, _ in STAGES.values():
+            moved = self.db.requeue_jobs(running, ready, expired_before=now)
+            if moved:
+                log.warning("Recovered %d job(s) stuck in '%s'", moved, running)
+
+    def stop(self, *_):
+        """Stop claiming work; run_loop returns once running stages finish."""
+        self._stop.set()
+        self._wake.set()
+
+    def run_loop(self, poll_interval=10.0):
+        self.recover()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        pools = {
+            stage: ThreadPoolExecutor(
+                max_workers=self.concurrency[stage], thread_name_prefix=stage
+            )
+            for stage in STAGES
+        }
+        log.info(
+            "Orchestrator running (%s)",
+            ", ".join(f"{s}={n}" for s, n in self.concurrency.items()),
+        )
+        with self._heartbeats():
+            try:
+                while not self._stop.is_set():
+                    self._wake.clear()
+                    for stage in STAGES:
+                        self._schedule(stage, pools[stage])
+                    self._wake.wait(poll_interval)
+                    # Claims of a process that died while this one runs
+                    self.recover()
+                    metrics.maybe_flush()
+            finally:
+                with self._running_lock:
+                    running = sum(len(r) for r in self._running.values())
+                if running:
+                    log.info("Shutting down, waiting for %d running stage(s)", running)
+                for pool in pools.values():
+                    pool.shutdown(wait=True)
+                metrics.flush()
+
+    def _schedule(self, stage, pool):
+        ready = STAGES[stage][0]
+        with self._running_lock:
+            free = self.concurrency[stage] - len(self._running[stage])
+        if free <= 0:
+            return
+        for job in self.db.get_jobs_by_status(ready, limit=free):
+            if not self._claim(stage, job["video_id"]):
+                continue  # taken by another scheduler
+            pool.submit(self._run_scheduled, stage, job["video_id"])
+
+    def _run_scheduled(self, stage, video_id):
+        try:
+            self._run_stage(stage, video_id)
+        finally:
+            self._release(stage, video_id)
+            # Let the next stage pick the job up without waiting for a poll
+            self._wake.set()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        orch = Orchestrator()
-        orch.add_job(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Warscribe single-node orchestrator")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="run the scheduling daemon")
+    run.add_argument("--poll-interval", type=float, default=10.0)
+    add = sub.add_parser("add", help="process one URL in the foreground")
+    add.add_argument("url")
+    submit = sub.add_parser("submit", help="queue a URL for the daemon")
+    submit.add_argument("url")
+    submit.add_argument(
+        "--profile", choices=("fast", "accurate"), help="Whisper decoding profile"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    db_path = os.environ.get("DB_PATH", "warscribe.db")
+    orch = Orchestrator(db_path, input_dir=os.environ.get("INPUT_DIR", "input"))
+    if args.command == "run":
+        orch.run_loop(args.poll_interval)
+    elif args.command == "add":
+        orch.add_job(args.url)
+    else:
+        created, job = orch.submit(args.url, args.profile)
+        print(f"{job['video_id']}: {job['status']}{'' if created else ' (existing)'}")
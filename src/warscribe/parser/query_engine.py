@@ -1,8 +1,79 @@
-import chromadb
-from chromadb.utils import embedding_functions
-from db import Database
+import logging
+import os
+
 import ollama
 
+import metrics
+from db import Database
+from utils import estimate_tokens, setup_logging
+
+log = logging.getLogger("warscribe.query")
+
+RESULTS = int(os.environ.get("RAG_RESULTS", "10"))
+CONTEXT_TOKENS = int(os.environ.get("RAG_CONTEXT_TOKENS", "1500"))
+# Transcript hits are widened by this much on each side before merging
+NEIGHBOR_SECONDS = float(os.environ.get("RAG_NEIGHBOR_SECONDS", "20"))
+MIN_PASSAGE_TOKENS = 16  # don't squeeze in passages trimmed smaller than this
+SEPARATOR = "\n\n---\n\n"
+
+
+def _clock(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _drop_overlap(previous, text):
+    """text without leading words that repeat the end of previous."""
+    before, words = previous.split(), text.split()
+    for n in range(min(len(before), len(words)), 0, -1):
+        if before[-n:] == words[:n]:
+            return " ".join(words[n:])
+    return text
+
+
+def _render(passage, parts):
+    """Header plus the kept parts; gaps left by trimming are marked."""
+    body, last = [], None
+    for index, text, _ in parts:
+        if last is not None and index != last + 1:
+            body.append("...")
+        body.append(text)
+        last = index
+    return f"{passage['header'](parts)}\n{' '.join(body)}"
+
+
+def _fit(passage, budget):
+    """The passage rendered within budget tokens, or None.
+
+    Parts are dropped least relevant first (for transcript windows, the
+    segments furthest from a hit); a single part left over budget is cut
+    at the word level.
+    """
+    parts = sorted(passage["parts"])
+    while parts:
+        text = _render(passage, parts)
+        cost = estimate_tokens(text)
+        if cost <= budget:
+            return text, cost
+        if len(parts) == 1:
+            break
+        worst = max(parts, key=lambda part: part[2])
+        parts.remove(worst)
+    if not parts or budget < MIN_PASSAGE_TOKENS:
+        return None
+    index, text, priority = parts[0]
+    header = estimate_tokens(_render(passage, [(index, "", priority)]))
+    kept, total = [], header
+    for word in text.split():
+        total += max(1, estimate_tokens(word))
+        if total > budget:
+            break
+        kept.append(word)
+    if len(kept) < MIN_PASSAGE_TOKENS // 2:
+        return None
+    text = _render(passage, [(index, " ".join(kept) + " ...", priority)])
+    return text, estimate_tokens(text)
+
 
 class QueryEngine:
     def __init__(
@@ -11,48 +82,203 @@ class QueryEngine:
         chroma_path="warscribe_chroma",
         llm_model="llama3.2",
     ):
-        self.db = Database(db_path)
+        # Database picks the vector backend (see VECTOR_BACKEND)
+        self.db = Database(db_path, chroma_path=chroma_path)
         self.llm_model = llm_model
+        self.collection = self.db.collection
 
-        try:
-            self.chroma_client = chromadb.PersistentClient(path=chroma_path)
-            self.embedding_fn = (
-                embedding_functions.SentenceTransformerEmbeddingFunction(
-                    model_name="all-MiniLM-L6-v2"
-                )
-            )
-            self.collection = self.chroma_client.get_collection(
-                name="transcripts", embedding_function=self.embedding_fn
-            )
-        except Exception as e:
-            print(f"Error initializing ChromaDB for QueryEngine: {e}")
-            self.collection = None
+    def where(self, video_id=None, start=None, end=None, source_type=None, source=None):
+        """Metadata filter for the vector store, or None for no filter.
 
-    def retrieve(self, query, n_results=5, video_id=None):
-        if not self.collection:
-            return []
-
-        where = None
+        start/end keep transcript hits overlapping [start, end) seconds;
+        negative values count back from the end of video_id's recording, so
+        start=-3600 means its last hour. source_type is "transcript" or
+        "document" (ingested files); source matches the ingested file name.
+        """
+        if (start is not None and start < 0) or (end is not None and end < 0):
+            if not video_id:
+                raise ValueError("Times relative to the end need a video_id")
+            last = self.db.get_last_segment_end(video_id) or 0.0
+            start = last + start if start is not None and start < 0 else start
+            end = last + end if end is not None and end < 0 else end
+        clauses = []
         if video_id:
-            where = {"video_id": video_id}
+            clauses.append({"video_id": video_id})
+        if source_type == "transcript":
+            clauses.append({"source": "transcript"})
+        elif source_type == "document":
+            clauses.append({"source": {"$ne": "transcript"}})
+        elif source_type is not None:
+            raise ValueError(f"Unknown source_type: {source_type}")
+        if source:
+            clauses.append({"source": source})
+        if start is not None:
+            clauses.append({"end": {"$gt": start}})
+        if end is not None:
+            clauses.append({"start": {"$lt": end}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def search(self, query, n_results=5, video_id=None, **filters):
+        """Ranked hits as dicts with id, document and metadata.
 
+        filters are the keyword arguments of where(); the vector store
+        applies them before ranking, so only matching vectors are scored.
+        """
+        if self.collection is None:
+            return []
+
+        where = self.where(video_id, **filters)
         results = self.collection.query(
             query_texts=[query], n_results=n_results, where=where
         )
 
-        # results['documents'] is list of list (batch)
-        if results and results["documents"]:
-            return results["documents"][0]
-        return []
+        # Chroma returns one list per query text
+        if not results or not results["documents"]:
+            return []
+        return [
+            {"id": id_, "document": document, "metadata": metadata or {}}
+            for id_, document, metadata in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0]
+            )
+        ]
+
+    def retrieve(self, query, n_results=5, video_id=None, **filters):
+        return [
+            hit["document"]
+            for hit in self.search(query, n_results, video_id, **filters)
+        ]
+
+    def _windows(self, hits):
+        """Transcript hits widened by NEIGHBOR_SECONDS and merged per video.
 
-    def query(self, question, video_id=None):
-        print(f"Retrieving context for: '{question}'...")
-        context_docs = self.retrieve(question, n_results=5, video_id=video_id)
+        Yields (rank, video_id, hit spans, segments); segments come from an
+        indexed range lookup, so surrounding lines that were never retrieved
+        fill the window.
+        """
+        spans = []
+        for rank, hit in enumerate(hits):
+            meta = hit["metadata"]
+            if meta.get("source") == "transcript" and "start" in meta:
+                spans.append((meta["video_id"], meta["start"], meta["end"], rank))
+        spans.sort()
+        merged = []
+        for video_id, start, end, rank in spans:
+            low, high = start - NEIGHBOR_SECONDS, end + NEIGHBOR_SECONDS
+            last = merged[-1] if merged else None
+            if last and last["video_id"] == video_id and low <= last["end"]:
+                last["end"] = max(last["end"], high)
+                last["rank"] = min(last["rank"], rank)
+                last["hits"].append((start, end))
+            else:
+                merged.append(
+                    {
+                        "video_id": video_id,
+                        "start": max(low, 0.0),
+                        "end": high,
+                        "rank": rank,
+                        "hits": [(start, end)],
+                    }
+                )
+        for window in merged:
+            segments = self.db.get_segments_in_range(
+                window["video_id"], window["start"], window["end"]
+            )
+            yield window["rank"], window["video_id"], window["hits"], segments
+
+    def build_context(self, hits, max_tokens=None):
+        """Pack retrieved hits into passages within max_tokens estimated tokens.
+
+        Transcript hits become time windows of their video with neighbouring
+        segments, overlapping windows merged into one. Consecutive chunks of
+        the same ingested file are joined with their overlap removed, and
+        duplicate documents are dropped. Passages are taken best hit first
+        and trimmed to fit what is left of the budget.
+        """
+        budget = CONTEXT_TOKENS if max_tokens is None else max_tokens
+        passages = []
+
+        for rank, video_id, spans, segments in self._windows(hits):
+            parts = []
+            for index, seg in enumerate(segments):
+                text = (seg["transcript"] or "").strip()
+                if not text:
+                    continue
+                distance = min(
+                    max(start - seg["end_time"], seg["start_time"] - end, 0.0)
+                    for start, end in spans
+                )
+                parts.append((index, text, distance))
+            if not parts:
+                continue
+
+            def header(kept, video_id=video_id, segments=segments):
+                first, last = segments[kept[0][0]], segments[kept[-1][0]]
+                return (
+                    f"[{video_id} {_clock(first['start_time'])}"
+                    f"-{_clock(last['end_time'])}]"
+                )
+
+            passages.append({"rank": rank, "header": header, "parts": parts})
+
+        chunks = {}
+        for rank, hit in enumerate(hits):
+            meta = hit["metadata"]
+            if meta.get("source") == "transcript" and "start" in meta:
+                continue
+            if "chunk_index" in meta:
+                chunks.setdefault(meta["source"], []).append(
+                    (meta["chunk_index"], rank, hit["document"])
+                )
+            else:
+                chunks.setdefault(hit["id"], []).append((0, rank, hit["document"]))
+        seen = set()
+        for source, found in chunks.items():
+            found.sort()
+            groups = []
+            for chunk_index, rank, document in found:
+                if document in seen:
+                    continue
+                seen.add(document)
+                group = groups[-1] if groups else None
+                if group and chunk_index == group[-1][0] + 1:
+                    document = _drop_overlap(group[-1][2], document)
+                    group.append((chunk_index, rank, document))
+                else:
+                    groups.append([(chunk_index, rank, document)])
+            for group in groups:
+                passages.append(
+                    {
+                        "rank": min(rank for _, rank, _ in group),
+                        "header": lambda kept, source=source: f"[{source}]",
+                        # Chunks that were not hits themselves go first when trimming
+                        "parts": [(i, text, rank) for i, rank, text in group],
+                    }
+                )
+
+        context, used = [], 0
+        for passage in sorted(passages, key=lambda p: p["rank"]):
+            separator = estimate_tokens(SEPARATOR) if context else 0
+            fitted = _fit(passage, budget - used - separator)
+            if fitted:
+                context.append(fitted[0])
+                used += fitted[1] + separator
+        metrics.observe(
+            "warscribe_rag_context_tokens", used, "Estimated tokens of RAG context"
+        )
+        return context
+
+    def query(self, question, video_id=None, **filters):
+        """Answer question from retrieved context; filters as in where()."""
+        log.info("Retrieving context for: %r", question)
+        hits = self.search(question, n_results=RESULTS, video_id=video_id, **filters)
+        context_docs = self.build_context(hits)
 
         if not context_docs:
             return "No relevant context found in the database."
 
-        context_text = "\n\n---\n\n".join(context_docs)
+        context_text = SEPARATOR.join(context_docs)
 
         prompt = f"""
 You are Warscribe, an AI assistant analyzing YouTube video transcripts.
@@ -67,13 +293,16 @@ Question: {question}
 Answer:
 """
         try:
-            print("Querying Ollama...")
-            response = ollama.chat(
-                model=self.llm_model,
-                messages=[
-                    {"role": "user", "content": prompt},
-                ],
-            )
+            log.debug("Querying Ollama (%s)", self.llm_model)
+            with metrics.timer(
+                "warscribe_rag_llm_seconds", "RAG answer generation latency"
+            ):
+                response = ollama.chat(
+                    model=self.llm_model,
+                    messages=[
+                        {"role": "user", "content": prompt},
+                    ],
+                )
             return response["message"]["content"]
         except Exception as e:
             return f"Error communicating with Ollama: {e}"
@@ -82,6 +311,7 @@ Answer:
 if __name__ == "__main__":
     import sys
 
+    setup_logging()
     engine = QueryEngine()
 
     if len(sys.argv) > 1:
@@ -0,0 +1,157 @@
+"""
+RQ queue layout for the Warscribe pipeline.
+
+Each pipeline phase runs on a queue for its resource class, so network-bound
+downloads never wait behind CPU-bound transcriptions. Every class also has a
+high-priority twin that its workers drain first, used for short and
+near-live jobs. Jobs still on the single queue from before the split are
+moved onto these queues when workers start (migrate_legacy_queue).
+"""
+
+import os
+from datetime import datetime, timezone
+
+from rq import Queue, Worker
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from rq.registry import StartedJobRegistry
+from rq.utils import as_text
+
+from utils import percentile
+
+# Resource class -> default number of worker processes
+RESOURCE_CLASSES = {
+    "io": 4,  # downloads and chat
+    "transcribe": 1,  # faster-whisper, CPU/GPU bound
+    "llm": 1,  # Ollama extraction
+    "embed": 1,  # sentence-transformer embeddings
+}
+
+PRIORITIES = ("high", "normal")
+
+LEGACY_QUEUE = "warscribe"
+# Task -> resource class of the jobs the pre-split pipeline enqueued
+LEGACY_TASKS = {
+    "task_download": "io",
+    "task_transcribe": "transcribe",
+    "task_llm_embed": "llm",
+}
+
+# Jobs with audio at most this long go to the high-priority queues
+SHORT_JOB_SECONDS = float(os.environ.get("SHORT_JOB_SECONDS", "1800"))
+
+# Number of recent queue wait times kept per queue for the metrics
+WAIT_SAMPLES = 1000
+
+
+def queue_name(resource_class, priority="normal"):
+    if resource_class not in RESOURCE_CLASSES:
+        raise ValueError(f"Unknown resource class: {resource_class}")
+    name = f"warscribe-{resource_class}"
+    return f"{name}-high" if priority == "high" else name
+
+
+def get_queue(connection, resource_class, priority="normal"):
+    return Queue(queue_name(resource_class, priority), connection=connection)
+
+
+def worker_queues(connection, resource_class):
+    """Queues a worker of this class listens on, highest priority first."""
+    return [get_queue(connection, resource_class, p) for p in PRIORITIES]
+
+
+def migrate_legacy_queue(connection):
+    """Move jobs left on the pre-split queue to their class's queue.
+
+    The old queue mixed every phase, 12-hour transcriptions included, so no
+    one class of worker should drain it. Job ids are popped atomically, so
+    workers starting together never move a job twice. Returns how many moved.
+    """
+    legacy = Queue(LEGACY_QUEUE, connection=connection)
+    moved = 0
+    while True:
+        job_id = connection.lpop(legacy.key)
+        if job_id is None:
+            return moved
+        try:
+            job = Job.fetch(as_text(job_id), connection=connection)
+        except NoSuchJobError:
+            continue  # expired while it waited
+        task = (job.func_name or "").rsplit(".", 1)[-1]
+        get_queue(connection, LEGACY_TASKS.get(task, "io")).enqueue_job(job)
+        moved += 1
+
+
+def worker_count(resource_class):
+    """Configured pool size for a class, from WORKERS_<CLASS>."""
+    env = f"WORKERS_{resource_class.upper()}"
+    return int(os.environ.get(env, RESOURCE_CLASSES[resource_class]))
+
+
+def resolve_priority(requested=None, duration=None):
+    """Explicit priority wins; otherwise short recordings are prioritised."""
+    if requested in PRIORITIES:
+        return requested
+    if duration is not None and duration <= SHORT_JOB_SECONDS:
+        return "high"
+    return "normal"
+
+
+def record_wait(connection, job):
+    """Remember how long an RQ job sat in its queue before a worker took it."""
+    if job is None or not job.enqueued_at or not job.started_at:
+        return
+    wait = (_utc(job.started_at) - _utc(job.enqueued_at)).total_seconds()
+    key = f"warscribe:wait:{job.origin}"
+    pipe = connection.pipeline()
+    pipe.lpush(key, wait)
+    pipe.ltrim(key, 0, WAIT_SAMPLES - 1)
+    pipe.execute()
+
+
+def _utc(dt):
+    # Older RQ releases store naive UTC datetimes
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def queue_stats(connection):
+    """Depth, in-flight jobs, workers and wait times for every queue.
+
+    The legacy queue is listed last, with no class or priority; anything on
+    it waits for the next worker start to be migrated.
+    """
+    now = datetime.now(timezone.utc)
+    queues = [
+        (get_queue(connection, resource_class, priority), resource_class, priority)
+        for resource_class in RESOURCE_CLASSES
+        for priority in PRIORITIES
+    ]
+    queues.append((Queue(LEGACY_QUEUE, connection=connection), None, None))
+    stats = []
+    for q, resource_class, priority in queues:
+        oldest_wait = None
+        oldest = q.get_job_ids(0, 1)
+        if oldest:
+            job = Job.fetch(oldest[0], connection=connection)
+            if job.enqueued_at:
+                oldest_wait = (now - _utc(job.enqueued_at)).total_seconds()
+
+        waits = [float(w) for w in connection.lrange(f"warscribe:wait:{q.name}", 0, -1)]
+        stats.append(
+            {
+                "queue": q.name,
+                "resource_class": resource_class,
+                "priority": priority,
+                "depth": q.count,
+                "started": StartedJobRegistry(queue=q).count,
+                "workers": Worker.count(queue=q),
+                "oldest_wait_s": oldest_wait,
+                "wait_s": {
+                    "samples": len(waits),
+                    "mean": sum(waits) / len(waits) if waits else None,
+                    "p50": percentile(waits, 0.5),
+                    "p95": percentile(waits, 0.95),
+                },
+            }
+        )
+    return stats
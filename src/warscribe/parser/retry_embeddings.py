@@ -4,13 +4,16 @@ from db import Database
 
 def retry_embeddings(video_id):
     db = Database()
-    segments = db.get_segments(video_id)
+    segments = db.get_segments_needing_embedding(video_id)
 
     if not segments:
-        print(f"No segments found for {video_id}. Transcription might have failed.")
+        print(
+            f"No unembedded segments for {video_id}. "
+            "Transcription might have failed, or everything is embedded already."
+        )
         return
 
-    print(f"Found {len(segments)} segments. Generating embeddings...")
+    print(f"Found {len(segments)} unembedded segments. Generating embeddings...")
     db.add_transcript_embeddings(video_id, segments)
     print("Done.")
 
@@ -1,7 +1,44 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
 from faster_whisper import WhisperModel
+import metrics
+from audio import SAMPLE_RATE, npy_path, open_pcm, transcribe_windowed
 from db import Database
 from utils import find_audio
 
+log = logging.getLogger("warscribe.transcriber")
+
+# Gaps of at least this long between VAD-filtered segments are stored as silence
+MIN_SILENCE_SECONDS = float(os.environ.get("WHISPER_MIN_SILENCE_SECONDS", "2"))
+
+# Decoding options per profile, chosen per job (jobs.profile) or WHISPER_PROFILE.
+# without_timestamps is left off even for "fast": segment boundaries drive
+# chat alignment, silence records and RAG windows, and it would stretch
+# segments to whole 30s decode windows.
+PROFILES = {
+    # Greedy decoding of VAD-detected speech only; dead air, intermissions
+    # and music are skipped and recorded as silence segments
+    "fast": {
+        "beam_size": 1,
+        "best_of": 1,
+        "condition_on_previous_text": False,
+        "vad_filter": True,
+        "vad_parameters": {"min_silence_duration_ms": int(MIN_SILENCE_SECONDS * 1000)},
+    },
+    # Beam search over all audio
+    "accurate": {"beam_size": 5},
+}
+PROFILE = os.environ.get("WHISPER_PROFILE", "accurate")
+
+
+class LeaseLost(Exception):
+    """Our lease on a work unit expired and another worker took it over."""
+
 
 class Transcriber:
     def __init__(
@@ -11,63 +48,305 @@ class Transcriber:
         compute_type="int8",
         db_path="warscribe.db",
         input_dir="input",
+        window_seconds=None,
+        unit_seconds=None,
+        lease_seconds=None,
+        profile=None,
     ):
         self.db_path = db_path
+        # Default profile for jobs that don't name one
+        self.profile = profile or PROFILE
+        if self.profile not in PROFILES:
+            raise ValueError(f"Unknown Whisper profile: {self.profile}")
         self.input_dir = input_dir
-        print(f"Loading Whisper model: {model_size} on {device}...")
+        # Audio decoded per model call when streaming from mapped PCM
+        self.window_seconds = window_seconds or float(
+            os.environ.get("TRANSCRIBE_WINDOW_SECONDS", "300")
+        )
+        # Length of the leasable work units a recording is split into
+        self.unit_seconds = unit_seconds or float(
+            os.environ.get("TRANSCRIBE_UNIT_SECONDS", "1800")
+        )
+        self.lease_seconds = lease_seconds or float(
+            os.environ.get("TRANSCRIBE_LEASE_SECONDS", "120")
+        )
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        log.info("Loading Whisper model: %s on %s", model_size, device)
         try:
             self.model = WhisperModel(
                 model_size, device=device, compute_type=compute_type
             )
         except Exception as e:
-            print(f"Failed to load model on {device}: {e}. Falling back to cpu.")
+            log.warning(
+                "Failed to load model on %s: %s. Falling back to cpu.", device, e
+            )
             self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
 
-    def process_job(self, video_id):
-        print(f"Processing transcription for job: {video_id}")
-        db = Database(self.db_path)
+    def process_job(self, video_id, on_units=None):
+        """Transcribe a downloaded job. Returns True if this call finished it.
+
+        Mapped audio is split into leased work units; this call works
+        through the units of video_id that nobody else holds, so other
+        processes or nodes can share the video (see process_units), then
+        waits for units others still hold. Whoever completes the last unit
+        marks the job 'transcribed'. on_units is called with the number of
+        units once they exist.
+        """
+        log.info("Processing transcription for job: %s", video_id)
+        db = Database(self.db_path, with_chroma=False)
         job_status = self._get_job_status(db, video_id)
 
         if job_status not in ["downloaded", "transcribing"]:
-            print(f"Job {video_id} is in status '{job_status}'. Skipping.")
-            return
+            log.info("Job %s is in status '%s'. Skipping.", video_id, job_status)
+            return False
 
         db.update_job_status(video_id, "transcribing")
 
         audio_path = find_audio(self.input_dir, video_id)
         if not audio_path:
-            print(f"Audio file not found for {video_id} in {self.input_dir}")
+            log.error("Audio file not found for %s in %s", video_id, self.input_dir)
             db.update_job_status(video_id, "failed")
-            return
+            return False
 
-        print(f"Using audio file: {audio_path}")
+        log.info("Using audio file: %s", audio_path)
 
-        # Resume from last processed segment if any exist
-        existing_segments = db.get_segments(video_id)
-        last_end_time = 0.0
-        if existing_segments:
-            last_end_time = existing_segments[-1]["end_time"]
-            print(f"Resuming transcription from {last_end_time}s")
+        try:
+            samples = self._open_samples(audio_path, video_id)
+            if samples is None:
+                return self._transcribe_file(db, video_id, audio_path)
+
+            duration = len(samples) / SAMPLE_RATE
+            db.set_job_duration(video_id, duration)
+            # Ranges copied from an earlier upload (see fingerprint.py) need no units
+            copied = [
+                (m["start_time"], m["end_time"]) for m in db.get_audio_matches(video_id)
+            ]
+            db.create_work_units(video_id, duration, self.unit_seconds, skip=copied)
+            units = len(db.get_work_units(video_id))
+            if not units:
+                log.info("All audio of %s was copied from earlier uploads", video_id)
+                return db.claim_job(video_id, "transcribing", "transcribed")
+            if on_units:
+                on_units(units)
+            return video_id in self.process_units(video_id, wait=True)
+
+        except Exception:
+            log.exception("Transcription failed for %s", video_id)
+            db.update_job_status(video_id, "failed")
+            return False
+
+    def process_units(self, video_id=None, wait=False):
+        """Claim and transcribe work units until none are free.
+
+        Limited to one video if video_id is given, otherwise any video with
+        pending units. With wait, keep polling while other workers hold
+        leases on the video, so units of a worker that dies are picked up
+        once its lease expires. Returns the ids of videos whose last unit
+        this call completed.
+        """
+        db = Database(self.db_path, with_chroma=False)
+        finished = set()
+        while True:
+            unit = db.claim_work_unit(self.owner, self.lease_seconds, video_id)
+            if unit is not None:
+                if self.process_range(db, unit):
+                    finished.add(unit["video_id"])
+                continue
+            if not wait or not any(
+                u["status"] == "leased" for u in db.get_work_units(video_id)
+            ):
+                return finished
+            time.sleep(min(self.lease_seconds / 3, 10.0))
+
+    def process_range(self, db, unit):
+        """Transcribe one leased unit into segments. True if it finished the video.
+
+        The unit is a hard cut: only audio in [start_time, end_time) is
+        decoded, so units never overlap. A background thread renews the
+        lease while decoding; segments are written in batches that are
+        rejected once the lease is lost, and transcription resumes after
+        the last segment already stored in the range.
+        """
+        video_id = unit["video_id"]
+        audio_path = find_audio(self.input_dir, video_id)
+        samples = self._open_samples(audio_path, video_id) if audio_path else None
+        if samples is None:
+            db.release_work_unit(unit["id"], self.owner)
+            raise FileNotFoundError(f"No mapped audio for {video_id}")
+
+        lost = threading.Event()
+        done = threading.Event()
 
+        def heartbeat():
+            while not done.wait(self.lease_seconds / 3):
+                if not db.heartbeat_work_unit(
+                    unit["id"], self.owner, self.lease_seconds
+                ):
+                    lost.set()
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
         try:
-            segments, info = self.model.transcribe(audio_path, beam_size=5)
+            resume = db.get_last_segment_end(
+                video_id, unit["start_time"], unit["end_time"]
+            )
+            resume = max(resume or 0.0, unit["start_time"])
+            profile = self._profile(db, video_id)
+            options = PROFILES[profile]
+            log.info(
+                "Transcribing %s [%.0fs, %.0fs) from %.2fs (%s)",
+                video_id,
+                unit["start_time"],
+                unit["end_time"],
+                resume,
+                profile,
+            )
+            segments = transcribe_windowed(
+                self.model,
+                samples[: int(round(unit["end_time"] * SAMPLE_RATE))],
+                start_time=resume,
+                window_seconds=self.window_seconds,
+                min_silence=MIN_SILENCE_SECONDS if options.get("vad_filter") else None,
+                **options,
+            )
+
+            started = time.perf_counter()
+            count, audio_seconds, silence_seconds = 0, 0.0, 0.0
+            batch, flushed = [], time.monotonic()
+            for start, end, text in segments:
+                batch.append((start, end, text))
+                audio_seconds += end - start
+                if text is None:
+                    silence_seconds += end - start
+                    log.debug("[%.2fs -> %.2fs] (silence)", start, end)
+                else:
+                    count += 1
+                    log.debug("[%.2fs -> %.2fs] %s", start, end, text)
+                if lost.is_set():
+                    break
+                if len(batch) >= 32 or time.monotonic() - flushed > 10:
+                    self._save(db, unit, audio_path, batch)
+                    batch, flushed = [], time.monotonic()
+                    metrics.maybe_flush()
+            if lost.is_set():
+                raise LeaseLost(unit["id"])
+            self._save(db, unit, audio_path, batch)
 
-            print("Starting transcription loop...")
-            for segment in segments:
-                if segment.end <= last_end_time:
-                    continue  # skip already-processed segments
+            held, video_done = db.complete_work_unit(unit["id"], self.owner)
+            if not held:
+                raise LeaseLost(unit["id"])
+            self._record(
+                video_id,
+                count,
+                audio_seconds,
+                time.perf_counter() - started,
+                silence_seconds,
+            )
+            return video_done
+        except LeaseLost:
+            metrics.inc("warscribe_transcribe_leases_lost_total", help="Leases lost")
+            log.warning(
+                "Lost lease on %s [%.0fs, %.0fs)",
+                video_id,
+                unit["start_time"],
+                unit["end_time"],
+            )
+            return False
+        except BaseException:
+            db.release_work_unit(unit["id"], self.owner)
+            raise
+        finally:
+            done.set()
 
-                seg_id = db.add_segment(
-                    video_id, segment.start, segment.end, audio_path
-                )
-                db.update_segment_transcript(seg_id, segment.text)
-                print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
+    def _save(self, db, unit, audio_path, batch):
+        if not db.save_unit_segments(
+            unit["id"], self.owner, unit["video_id"], audio_path, batch
+        ):
+            raise LeaseLost(unit["id"])
 
-            db.update_job_status(video_id, "transcribed")
+    def _transcribe_file(self, db, video_id, audio_path):
+        """Fallback for audio that can't be memory-mapped: one pass over the file."""
+        # Resume from last processed segment if any exist
+        last_end_time = db.get_last_segment_end(video_id) or 0.0
+        if last_end_time:
+            log.info("Resuming transcription from %.2fs", last_end_time)
 
-        except Exception as e:
-            print(f"Transcription failed: {e}")
-            db.update_job_status(video_id, "failed")
+        profile = self._profile(db, video_id)
+        result, info = self.model.transcribe(audio_path, **PROFILES[profile])
+        db.set_job_duration(video_id, info.duration)
+
+        started = time.perf_counter()
+        count, audio_seconds = 0, 0.0
+        for s in result:
+            if s.end <= last_end_time:
+                continue  # skip already-processed segments
+
+            seg_id = db.add_segment(video_id, s.start, s.end, audio_path)
+            db.update_segment_transcript(seg_id, s.text)
+            count += 1
+            audio_seconds += s.end - s.start
+            log.debug("[%.2fs -> %.2fs] %s", s.start, s.end, s.text)
+            metrics.maybe_flush()
+
+        db.update_job_status(video_id, "transcribed")
+        self._record(video_id, count, audio_seconds, time.perf_counter() - started)
+        return True
+
+    def _record(self, video_id, count, audio_seconds, elapsed, silence_seconds=0.0):
+        metrics.inc(
+            "warscribe_transcribe_segments_total", count, "Segments transcribed"
+        )
+        metrics.inc(
+            "warscribe_transcribe_audio_seconds_total",
+            audio_seconds,
+            "Seconds of audio transcribed",
+        )
+        metrics.inc(
+            "warscribe_transcribe_silence_seconds_total",
+            silence_seconds,
+            "Seconds of audio skipped as silence by VAD",
+        )
+        metrics.inc(
+            "warscribe_transcribe_seconds_total",
+            elapsed,
+            "Wall time spent transcribing",
+        )
+        if elapsed > 0:
+            metrics.set_gauge(
+                "warscribe_transcribe_segments_per_second",
+                count / elapsed,
+                "Segments per second of the last transcription",
+            )
+            metrics.set_gauge(
+                "warscribe_transcribe_realtime_factor",
+                audio_seconds / elapsed,
+                "Audio seconds per wall second of the last transcription",
+            )
+        log.info(
+            "Transcribed %d segments (%.0fs of audio, %.0fs silence) for %s in %.1fs",
+            count,
+            audio_seconds,
+            silence_seconds,
+            video_id,
+            elapsed,
+        )
+
+    def _open_samples(self, audio_path, video_id):
+        """Memory-map pre-decoded samples for video_id, or None to decode the file."""
+        npy = npy_path(self.input_dir, video_id)
+        if os.path.exists(npy):
+            return open_pcm(npy)
+        return open_pcm(audio_path)
+
+    def _profile(self, db, video_id):
+        """The job's own Whisper profile if it set one, else the default."""
+        job = db.get_job(video_id)
+        profile = (job or {}).get("profile") or self.profile
+        if profile not in PROFILES:
+            log.warning("Unknown Whisper profile %r for %s", profile, video_id)
+            return self.profile
+        return profile
 
     def _get_job_status(self, db, video_id):
         return db.get_job_status(video_id)
@@ -76,6 +355,9 @@ class Transcriber:
 if __name__ == "__main__":
     import sys
 
+    from utils import setup_logging
+
+    setup_logging()
     t = Transcriber()
     if len(sys.argv) > 1:
         t.process_job(sys.argv[1])
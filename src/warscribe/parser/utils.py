@@ -2,6 +2,21 @@
 
 import os
 import glob
+import logging
+import re
+from urllib.parse import parse_qs, urlparse
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_HOSTS = {
+    "youtube.com",
+    "www.youtube.com",
+    "m.youtube.com",
+    "music.youtube.com",
+    "youtube-nocookie.com",
+    "www.youtube-nocookie.com",
+}
+_YOUTUBE_PATH_PREFIXES = {"live", "shorts", "embed", "v", "e"}
 
 
 def find_audio(input_dir, video_id):
@@ -16,7 +31,75 @@ def find_audio(input_dir, video_id):
         path = os.path.join(input_dir, f"{video_id}.{ext}")
         if os.path.exists(path):
             return path
-    # Last resort: glob
+    # Last resort: glob, minus sidecars, partial downloads and the raw
+    # headerless PCM a live capture spools to (nothing can decode it)
     pattern = os.path.join(input_dir, f"{video_id}.*")
-    matches = [f for f in glob.glob(pattern) if not f.endswith(".json")]
+    matches = [
+        f
+        for f in glob.glob(pattern)
+        if not f.endswith((".json", ".npy", ".part", ".tmp", ".pcm"))
+    ]
     return matches[0] if matches else None
+
+
+def extract_video_id(url):
+    """Extract a YouTube video id from a URL without spawning yt-dlp.
+
+    Understands watch, youtu.be, live, shorts and embed URLs as well as a
+    bare 11-character id. Returns None for anything else, in which case
+    callers should fall back to asking yt-dlp.
+    """
+    url = url.strip()
+    if _YOUTUBE_ID.match(url):
+        return url
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    parts = [p for p in parsed.path.split("/") if p]
+
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = parts[0] if parts else None
+    elif host in _YOUTUBE_HOSTS:
+        if parts == ["watch"]:
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        elif len(parts) >= 2 and parts[0] in _YOUTUBE_PATH_PREFIXES:
+            candidate = parts[1]
+
+    if candidate and _YOUTUBE_ID.match(candidate):
+        return candidate
+    return None
+
+
+def canonical_url(video_id):
+    """Canonical watch URL for a YouTube video id."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def estimate_tokens(text):
+    """Cheap token count estimate: words and punctuation marks.
+
+    Close enough to WordPiece/BPE counts for budgeting chunk and prompt
+    sizes without loading a tokenizer.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def percentile(values, q):
+    """Nearest-rank q-quantile of values, or None if there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def setup_logging(level=None):
+    """Configure the root logger once per process from LOG_LEVEL (default INFO).
+
+    Per-segment and per-batch messages are logged at DEBUG, so hot loops pay
+    only a level check unless LOG_LEVEL=DEBUG.
+    """
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    logging.basicConfig(
+        level=level.upper() if isinstance(level, str) else level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
@@ -0,0 +1,507 @@
+"""
+Warscribe vector index — a local, dependency-light alternative to ChromaDB.
+
+Embeddings are L2-normalised and stored quantized in a flat memory-mapped
+matrix: int8 with one float32 scale per row (4x smaller than float32), or
+float16. Search is an exact dot-product top-k computed block by block with
+NumPy over only the rows in scope. Rows are appended batch by batch, so a
+video's rows form a few contiguous ranges; these are recorded per video and
+a video-filtered query reads just those slices of the matrix.
+
+Ids, documents, metadata and row ranges live in a small SQLite file next to
+the matrix. Appends hold its write lock, so several processes can add to
+and query the same index. Deleting rows only drops their metadata and
+records them as deleted; their vectors stay in the matrix, skipped by search.
+
+LocalCollection wraps an index in the subset of the Chroma collection API
+the pipeline uses (add / query / count / delete). Database picks the backend from
+VECTOR_BACKEND:
+- chroma: ChromaDB only
+- local: this index only
+- auto (default): ChromaDB, falling back to this index if it fails to start
+
+Usage:
+    python vector_index.py stats [--path warscribe_vectors]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+BACKEND = os.environ.get("VECTOR_BACKEND", "auto")
+INDEX_PATH = os.environ.get("VECTOR_INDEX_PATH", "warscribe_vectors")
+DTYPE = os.environ.get("VECTOR_DTYPE", "int8")
+BLOCK_ROWS = 16384  # rows dequantized at a time while scoring
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    video_id TEXT,
+    document TEXT,
+    metadata TEXT,
+    source TEXT,
+    start_time REAL,
+    end_time REAL
+);
+CREATE TABLE IF NOT EXISTS ranges (
+    video_id TEXT NOT NULL,
+    start_row INTEGER NOT NULL,
+    end_row INTEGER NOT NULL,
+    PRIMARY KEY (video_id, start_row)
+);
+CREATE TABLE IF NOT EXISTS deleted (row INTEGER PRIMARY KEY);
+"""
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_rows_video_start ON rows (video_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_rows_source ON rows (source);
+"""
+
+# Metadata keys copied into indexed columns; others are matched in the JSON
+_COLUMNS = {
+    "video_id": "video_id",
+    "source": "source",
+    "start": "start_time",
+    "end": "end_time",
+}
+_OPERATORS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+    "$in": "IN",
+    "$nin": "NOT IN",
+}
+
+
+def quantize(vectors, dtype):
+    """Quantize normalised float32 rows; returns (matrix, per-row scales or None)."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    matrix = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return matrix, scales.astype(np.float32)
+
+
+def _conditions(where):
+    """Flatten a Chroma-style where clause into (key, operator, value) triples."""
+    if not where:
+        return []
+    conditions = []
+    for key, value in where.items():
+        if key == "$and":
+            for clause in value:
+                conditions.extend(_conditions(clause))
+        elif isinstance(value, dict):
+            for op, operand in value.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported filter on {key}: {value}")
+                conditions.append((key, op, operand))
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported filter: {key}")
+        else:
+            conditions.append((key, "$eq", value))
+    return conditions
+
+
+class VectorIndex:
+    """Append-only quantized embedding matrix with exact top-k search."""
+
+    def __init__(self, path=None, dtype=None):
+        """dtype applies to a new index; an existing one keeps its own."""
+        self.path = path or INDEX_PATH
+        if dtype not in (None, "int8", "float16"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        os.makedirs(self.path, exist_ok=True)
+        self._meta_path = os.path.join(self.path, "meta.db")
+        conn = sqlite3.connect(self._meta_path, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(rows)")}
+        if "source" not in columns:
+            # Indexes from before filter columns existed: add and backfill them
+            for column, type_ in (
+                ("source", "TEXT"),
+                ("start_time", "REAL"),
+                ("end_time", "REAL"),
+            ):
+                conn.execute(f"ALTER TABLE rows ADD COLUMN {column} {type_}")
+            conn.execute(
+                """UPDATE rows SET source = json_extract(metadata, '$.source'),
+                                   start_time = json_extract(metadata, '$.start'),
+                                   end_time = json_extract(metadata, '$.end')"""
+            )
+        conn.executescript(_INDEXES)
+        conn.execute(
+            "INSERT OR IGNORE INTO info (key, value) VALUES ('dtype', ?)",
+            (dtype or DTYPE,),
+        )
+        stored = conn.execute("SELECT value FROM info WHERE key = 'dtype'").fetchone()
+        conn.close()
+        if dtype and stored[0] != dtype:
+            raise ValueError(f"Index at {self.path} holds {stored[0]} vectors")
+        self.dtype = stored[0]
+        self._vectors_path = os.path.join(self.path, f"vectors.{self.dtype}")
+        self._scales_path = os.path.join(self.path, "scales.f32")
+        self._mapped = (0, None, None)  # (rows, vectors, scales)
+
+    def _connect(self):
+        return sqlite3.connect(self._meta_path, timeout=30)
+
+    def _dim(self, conn):
+        row = conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    @staticmethod
+    def _rows_written(conn):
+        """Rows in the matrix, deleted ones included."""
+        return conn.execute(
+            """SELECT MAX((SELECT COALESCE(MAX(row) + 1, 0) FROM rows),
+                          (SELECT COALESCE(MAX(row) + 1, 0) FROM deleted))"""
+        ).fetchone()[0]
+
+    def __len__(self):
+        conn = self._connect()
+        n = conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        conn.close()
+        return n
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Append rows; ids already in the index are skipped, as Chroma does.
+
+        Returns the ids that were added. Vectors are written past the last
+        committed row before the metadata commits, so readers never map a
+        row whose vector is incomplete, and a failed add leaves only bytes
+        the next add overwrites.
+        """
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{} for _ in ids]
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        conn = sqlite3.connect(self._meta_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            dim = self._dim(conn)
+            if dim is None:
+                dim = vectors.shape[1]
+                c.execute("INSERT INTO info (key, value) VALUES ('dim', ?)", (dim,))
+            elif vectors.shape[1] != dim:
+                raise ValueError(f"Expected {dim}-d embeddings, got {vectors.shape[1]}")
+
+            existing = set()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                c.execute(
+                    f"SELECT id FROM rows WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                existing.update(row[0] for row in c.fetchall())
+            keep = []
+            for i, id_ in enumerate(ids):
+                if id_ not in existing:
+                    existing.add(id_)
+                    keep.append(i)
+            if keep:
+                start = self._rows_written(conn)
+                matrix, scales = quantize(vectors[keep], self.dtype)
+                _pwrite(self._vectors_path, start * dim * matrix.itemsize, matrix)
+                if scales is not None:
+                    _pwrite(self._scales_path, start * 4, scales)
+                records = []
+                for offset, i in enumerate(keep):
+                    meta = metadatas[i] or {}
+                    records.append(
+                        (
+                            start + offset,
+                            ids[i],
+                            meta.get("video_id"),
+                            documents[i],
+                            json.dumps(meta),
+                            meta.get("source"),
+                            meta.get("start"),
+                            meta.get("end"),
+                        )
+                    )
+                c.executemany(
+                    """INSERT INTO rows (row, id, video_id, document, metadata, source, start_time, end_time)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    records,
+                )
+                self._add_ranges(c, [(r[0], r[2]) for r in records])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return [ids[i] for i in keep]
+
+    def delete(self, ids):
+        """Remove rows by id; returns how many there were."""
+        conn = sqlite3.connect(self._meta_path, isolation_level=None, timeout=30)
+        c = conn.cursor()
+        deleted = 0
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            ids = list(ids)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                marks = ",".join("?" * len(chunk))
+                c.execute(
+                    f"INSERT OR IGNORE INTO deleted (row) SELECT row FROM rows WHERE id IN ({marks})",
+                    chunk,
+                )
+                c.execute(f"DELETE FROM rows WHERE id IN ({marks})", chunk)
+                deleted += c.rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return deleted
+
+    @staticmethod
+    def _add_ranges(c, rows):
+        """Record runs of consecutive rows per video, extending the last run."""
+        runs = []
+        for row, video_id in rows:
+            if video_id is None:
+                continue
+            if runs and runs[-1][0] == video_id and runs[-1][2] == row:
+                runs[-1][2] = row + 1
+            else:
+                runs.append([video_id, row, row + 1])
+        for video_id, start, end in runs:
+            c.execute(
+                "UPDATE ranges SET end_row = ? WHERE video_id = ? AND end_row = ?",
+                (end, video_id, start),
+            )
+            if c.rowcount == 0:
+                c.execute(
+                    "INSERT INTO ranges (video_id, start_row, end_row) VALUES (?, ?, ?)",
+                    (video_id, start, end),
+                )
+
+    def _matrix(self, conn):
+        """(vectors, scales) memory-mapped over the committed rows."""
+        n = self._rows_written(conn)
+        if n == 0:
+            return None, None
+        if self._mapped[0] != n:
+            dim = self._dim(conn)
+            vectors = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r", shape=(n, dim)
+            )
+            scales = None
+            if self.dtype == "int8":
+                scales = np.memmap(
+                    self._scales_path, dtype=np.float32, mode="r", shape=(n,)
+                )
+            self._mapped = (n, vectors, scales)
+        return self._mapped[1], self._mapped[2]
+
+    def _selection(self, conn, where):
+        """Rows in scope: a list of (start, end) slices or an array of rows.
+
+        A lone video_id filter resolves through the range table; anything
+        else selects candidate rows in SQLite first (video, source and time
+        bounds through indexed columns), so only those vectors are scored.
+        """
+        conditions = _conditions(where)
+        if not conditions:
+            return None
+        if len(conditions) == 1 and conditions[0][:2] == ("video_id", "$eq"):
+            return conn.execute(
+                "SELECT start_row, end_row FROM ranges WHERE video_id = ? ORDER BY start_row",
+                (conditions[0][2],),
+            ).fetchall()
+        clauses, params = [], []
+        for key, op, value in conditions:
+            if key in _COLUMNS:
+                column = _COLUMNS[key]
+            else:
+                column = "json_extract(metadata, ?)"
+                params.append(f'$."{key}"')
+            if op in ("$in", "$nin"):
+                clauses.append(
+                    f"{column} {_OPERATORS[op]} ({','.join('?' * len(value))})"
+                )
+                params.extend(value)
+            else:
+                clauses.append(f"{column} {_OPERATORS[op]} ?")
+                params.append(value)
+        rows = conn.execute(
+            f"SELECT row FROM rows WHERE {' AND '.join(clauses)} ORDER BY row", params
+        ).fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    def search(self, queries, k=10, where=None):
+        """Top-k (row, score) lists per query vector, best first.
+
+        Scores are cosine similarities against the dequantized rows.
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        q = q.reshape(-1, q.shape[-1])
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        conn = self._connect()
+        try:
+            # One read transaction, so the row count and the selection come
+            # from the same snapshot even while another process appends
+            conn.execute("BEGIN")
+            vectors, scales = self._matrix(conn)
+            selection = self._selection(conn, where)
+            deleted = None
+            if not isinstance(selection, np.ndarray):
+                # Ranges and the whole matrix still cover deleted rows
+                rows = conn.execute("SELECT row FROM deleted").fetchall()
+                deleted = np.fromiter((r[0] for r in rows), np.int64, len(rows))
+        finally:
+            conn.close()
+        if vectors is None:
+            return [[] for _ in q]
+
+        if selection is None:
+            selection = [(0, len(vectors))]
+        if not isinstance(selection, np.ndarray):
+            selection = np.concatenate(
+                [np.arange(start, end) for start, end in selection] or [[]]
+            ).astype(np.int64)
+        selection = selection[selection < len(vectors)]
+        if deleted is not None and len(deleted):
+            selection = np.setdiff1d(selection, deleted, assume_unique=True)
+        if not len(selection):
+            return [[] for _ in q]
+        blocks = [
+            selection[i : i + BLOCK_ROWS] for i in range(0, len(selection), BLOCK_ROWS)
+        ]
+
+        best_rows = np.empty((0,), dtype=np.int64)
+        best_scores = np.empty((0, len(q)), dtype=np.float32)
+        for rows in blocks:
+            # Contiguous rows are read as a slice, straight off the mapping
+            if rows[-1] - rows[0] + 1 == len(rows):
+                part = slice(int(rows[0]), int(rows[-1]) + 1)
+            else:
+                part = rows
+            scores = vectors[part].astype(np.float32) @ q.T
+            if scales is not None:
+                scores *= scales[part][:, None]
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_rows) > k * len(q):
+                # Keep the union of every query's current top-k
+                top = np.argpartition(-best_scores, k - 1, axis=0)[:k]
+                keep = np.unique(top)
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        results = []
+        for j in range(len(q)):
+            order = np.argsort(-best_scores[:, j], kind="stable")[:k]
+            results.append(
+                [(int(best_rows[i]), float(best_scores[i, j])) for i in order]
+            )
+        return results
+
+    def fetch(self, rows):
+        """{row: (id, document, metadata)} for the given rows."""
+        conn = self._connect()
+        found = {}
+        rows = list(rows)
+        for i in range(0, len(rows), 500):
+            chunk = rows[i : i + 500]
+            for row, id_, document, metadata in conn.execute(
+                f"SELECT row, id, document, metadata FROM rows WHERE row IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                found[row] = (id_, document, json.loads(metadata))
+        conn.close()
+        return found
+
+    def stats(self):
+        conn = self._connect()
+        rows = conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        deleted = conn.execute("SELECT COUNT(*) FROM deleted").fetchone()[0]
+        videos = conn.execute("SELECT COUNT(DISTINCT video_id) FROM ranges").fetchone()[
+            0
+        ]
+        ranges = conn.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+        dim = self._dim(conn)
+        conn.close()
+        size = sum(
+            os.path.getsize(p)
+            for p in (self._vectors_path, self._scales_path)
+            if os.path.exists(p)
+        )
+        return {
+            "rows": rows,
+            "deleted": deleted,
+            "dim": dim,
+            "dtype": self.dtype,
+            "videos": videos,
+            "ranges": ranges,
+            "vector_bytes": size,
+        }
+
+
+def _pwrite(path, offset, array):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.pwrite(fd, np.ascontiguousarray(array).tobytes(), offset)
+    finally:
+        os.close(fd)
+
+
+class LocalCollection:
+    """A VectorIndex behind the Chroma collection calls Database and QueryEngine make.
+
+    Distances are cosine distances (1 - similarity).
+    """
+
+    def __init__(self, index, embedding_fn):
+        self.index = index
+        self.embedding_fn = embedding_fn
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        if embeddings is None:
+            embeddings = self.embedding_fn(documents)
+        return self.index.add(ids, embeddings, documents, metadatas)
+
+    def count(self):
+        return len(self.index)
+
+    def delete(self, ids):
+        self.index.delete(ids)
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None):
+        if query_embeddings is None:
+            query_embeddings = self.embedding_fn(query_texts)
+        hits = self.index.search(query_embeddings, n_results, where)
+        found = self.index.fetch({row for result in hits for row, _ in result})
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for result in hits:
+            rows = [found[row] for row, _ in result]
+            out["ids"].append([r[0] for r in rows])
+            out["documents"].append([r[1] for r in rows])
+            out["metadatas"].append([r[2] for r in rows])
+            out["distances"].append([1.0 - score for _, score in result])
+        return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warscribe local vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("stats", help="rows, videos and size of an index")
+    info.add_argument("--path", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    print(json.dumps(VectorIndex(args.path).stats(), indent=2))
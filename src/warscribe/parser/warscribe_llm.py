@@ -1,79 +1,339 @@
+import json
+import logging
+import os
+from typing import Union
+
+import metrics
+from chat_compactor import compact_chat
+from chat_rollup import get_spikes
 from db import Database
+from llm_cache import get_cache
 import ollama
+from pydantic import TypeAdapter, ValidationError
+
+from warscribe.core.schema.action import (
+    BaseAction,
+    ChargeAction,
+    FightAction,
+    MoveAction,
+    ShootAction,
+    parse_action,
+)
+
+# Bump whenever the prompt templates change so cached responses are not reused
+PROMPT_VERSION = "2"
+
+log = logging.getLogger("warscribe.llm")
+
+
+def _extraction_schema():
+    """JSON schema for the extraction envelope, used for constrained decoding."""
+    actions = TypeAdapter(
+        list[Union[MoveAction, ShootAction, ChargeAction, FightAction, BaseAction]]
+    ).json_schema(ref_template="#/$defs/{model}")
+    defs = actions.pop("$defs", {})
+    return {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "actions": actions,
+        },
+        "required": ["summary", "actions"],
+        "$defs": defs,
+    }
 
 
 class WarscribeLLM:
-    def __init__(self, model="llama3", db_path="warscribe.db"):
+    def __init__(
+        self,
+        model="llama3",
+        db_path="warscribe.db",
+        max_retries=2,
+        use_schema=True,
+        cache=None,
+        top_spikes=None,
+        compact=True,
+    ):
         self.model = model
         self.db_path = db_path
+        self.max_retries = max_retries
+        # Schema-constrained output needs a recent Ollama; plain JSON mode otherwise
+        self.format = _extraction_schema() if use_schema else "json"
+        self.cache = cache if cache is not None else get_cache()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Only analyze segments overlapping the video's top-N chat spikes
+        # (0 analyzes everything); see chat_rollup
+        if top_spikes is None:
+            top_spikes = int(os.environ.get("LLM_TOP_SPIKES", "0"))
+        self.top_spikes = top_spikes
+        # Dedup and cap chat before prompting (chat_compactor)
+        self.compact = compact
+
+    def process_job(self, video_id, until=None, windows=None):
+        """Analyze every transcribed, not yet analyzed segment of a video.
+
+        until limits this to segments ending by that many seconds into the
+        recording, so live mode can wait for a segment's chat to arrive.
+        windows, a list of (start, end) times, limits it to segments that
+        overlap one of them; with top_spikes set it defaults to the video's
+        top chat spikes, when it has chat. Returns the number of segments analyzed.
+        """
+        log.info("Processing Warscribe extraction for %s", video_id)
+        db = Database(self.db_path, with_chroma=False)
 
-    def process_job(self, video_id):
-        print(f"Processing Warscribe extraction for {video_id}...")
-        db = Database(self.db_path)
+        if windows is None and self.top_spikes:
+            spikes = get_spikes(db, video_id, top_k=self.top_spikes)
+            if spikes:
+                windows = [(s["start"], s["end"]) for s in spikes]
+                log.info("Narrowed to %d chat spike window(s)", len(windows))
+            else:
+                log.info("No chat rollup for %s, analyzing every segment", video_id)
 
-        segments = db.get_segments(video_id)
+        segments = db.get_segments_needing_analysis(video_id, until=until)
+        analyzed = 0
+        tokens_before = tokens_after = 0
 
         for segment in segments:
-            if segment["transcript"] and not segment["warscribe_json"]:
-                # Need processing
-                print(
-                    f"Analyzing segment {segment['id']} ({segment['start_time']}-{segment['end_time']})..."
-                )
+            if windows is not None and not any(
+                segment["start_time"] < end and segment["end_time"] > start
+                for start, end in windows
+            ):
+                continue
+            log.debug(
+                "Analyzing segment %s (%s-%s)",
+                segment["id"],
+                segment["start_time"],
+                segment["end_time"],
+            )
 
-                chat_msgs = db.get_chat_for_segment(
-                    video_id, segment["start_time"], segment["end_time"]
-                )
+            chat_msgs = db.get_chat_for_segment(
+                video_id, segment["start_time"], segment["end_time"]
+            )
+            if self.compact:
+                chat_text, stats = compact_chat(chat_msgs, segment["transcript"])
+                tokens_before += stats["tokens_before"]
+                tokens_after += stats["tokens_after"]
+                for kind in ("before", "after"):
+                    metrics.inc(
+                        "warscribe_llm_chat_tokens_total",
+                        stats[f"tokens_{kind}"],
+                        "Estimated chat prompt tokens around compaction",
+                        compaction=kind,
+                    )
+            else:
                 chat_text = "\n".join(
                     [f"{m['author']}: {m['message']}" for m in chat_msgs]
                 )
 
-                prompt = self._create_prompt(segment["transcript"], chat_text)
+            try:
+                warscribe_json, actions = self.analyze(segment["transcript"], chat_text)
+            except Exception as e:
+                # Segment stays unanalyzed and is picked up on the next run
+                metrics.inc(
+                    "warscribe_llm_segment_errors_total",
+                    help="Segments left unanalyzed after an LLM failure",
+                )
+                log.error("LLM failed for segment %s: %s", segment["id"], e)
+                continue
+
+            rows = [
+                (
+                    a.action_type.value,
+                    a.turn,
+                    a.phase,
+                    a.actor.name,
+                    a.result.value,
+                    a.model_dump_json(),
+                )
+                for a in actions
+            ]
+            db.save_segment_extraction(segment["id"], video_id, warscribe_json, rows)
+            metrics.inc("warscribe_llm_segments_total", help="Segments analyzed")
+            analyzed += 1
+            metrics.maybe_flush()
+
+        if tokens_before:
+            log.info(
+                "Chat compaction saved ~%d of %d prompt tokens (%.1f%%)",
+                tokens_before - tokens_after,
+                tokens_before,
+                (tokens_before - tokens_after) / tokens_before * 100,
+            )
+        if self.cache:
+            log.info(
+                "LLM cache: %d hits, %d misses (lifetime hit rate %.1f%%)",
+                self.cache_hits,
+                self.cache_misses,
+                self.cache.stats()["hit_rate"] * 100,
+            )
+        return analyzed
 
-                try:
-                    response = ollama.chat(
-                        model=self.model,
-                        messages=[
-                            {"role": "user", "content": prompt},
-                        ],
-                    )
-                    content = response["message"]["content"]
+    def analyze(self, transcript, chat_text):
+        """Return (warscribe_json, validated actions) for one segment.
 
-                    # Try to extract JSON
-                    # Validating JSON is tricky with LLMs, usually need strict mode or parsing.
-                    # We'll assume the LLM follows instructions or we wrap in try/catch.
+        Results are served from the prompt/response cache when available;
+        only validated output is ever cached.
+        """
+        key = None
+        if self.cache:
+            key = self.cache.make_key(self.model, PROMPT_VERSION, transcript, chat_text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                metrics.inc("warscribe_llm_cache_hits_total", help="LLM cache hits")
+                data = json.loads(cached)
+                return cached, [parse_action(a) for a in data["actions"]]
+            self.cache_misses += 1
+            metrics.inc("warscribe_llm_cache_misses_total", help="LLM cache misses")
 
-                    warscribe_data = content
-                    db.update_segment_warscribe(segment["id"], warscribe_data)
+        summary, actions = self.extract(transcript, chat_text)
+        warscribe_json = json.dumps(
+            {
+                "summary": summary,
+                "actions": [a.model_dump(mode="json") for a in actions],
+            }
+        )
+        if self.cache:
+            self.cache.put(key, self.model, PROMPT_VERSION, warscribe_json)
+        return warscribe_json, actions
 
-                except Exception as e:
-                    print(f"LLM failed for segment {segment['id']}: {e}")
+    def extract(self, transcript, chat_text):
+        """Run extraction for one segment and return (summary, validated actions).
+
+        Actions that fail validation are sent back to the model with their
+        errors, up to ``max_retries`` times; only those items are re-requested.
+        A failed repair request costs an attempt, not the valid actions. Items
+        still invalid after that are dropped.
+        """
+        data = self._chat_json(self._create_prompt(transcript, chat_text))
+        summary = data.get("summary") or ""
+        valid, invalid = self._validate(data.get("actions"))
+
+        attempt = 0
+        while invalid and attempt < self.max_retries:
+            attempt += 1
+            log.debug(
+                "Retrying %d invalid action(s) (attempt %d)", len(invalid), attempt
+            )
+            metrics.inc("warscribe_llm_repairs_total", help="Repair prompts sent")
+            try:
+                fixed = self._chat_json(self._create_repair_prompt(transcript, invalid))
+            except Exception as e:
+                # Keep the actions that already validated; only the repair is lost
+                log.warning("Repair attempt %d failed: %s", attempt, e)
+                continue
+            more, invalid = self._validate(fixed.get("actions"))
+            valid.extend(more)
+
+        if invalid:
+            metrics.inc(
+                "warscribe_llm_dropped_actions_total",
+                len(invalid),
+                "Actions dropped after failing validation",
+            )
+            log.warning("Dropping %d action(s) that failed validation", len(invalid))
+        return str(summary), valid
+
+    def _chat_json(self, prompt):
+        """Call Ollama in JSON mode and parse the reply, retrying malformed output."""
+        last_error = None
+        for _ in range(self.max_retries + 1):
+            with metrics.timer(
+                "warscribe_llm_request_seconds",
+                "Ollama chat request latency",
+                model=self.model,
+            ):
+                response = ollama.chat(
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": prompt},
+                    ],
+                    format=self.format,
+                    options={"temperature": 0},
+                )
+            content = response["message"]["content"]
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError as e:
+                metrics.inc(
+                    "warscribe_llm_malformed_total", help="Replies that were not JSON"
+                )
+                last_error = e
+                continue
+            if isinstance(data, dict):
+                return data
+            last_error = ValueError(
+                f"expected a JSON object, got {type(data).__name__}"
+            )
+        raise ValueError(f"LLM did not return valid JSON: {last_error}")
+
+    def _validate(self, items):
+        """Split raw action dicts into (valid models, [(item, error), ...])."""
+        valid, invalid = [], []
+        if not isinstance(items, list):
+            return valid, invalid
+        for item in items:
+            if not isinstance(item, dict):
+                invalid.append((item, "action must be a JSON object"))
+                continue
+            try:
+                valid.append(parse_action(item))
+            except (ValidationError, ValueError) as e:
+                invalid.append((item, str(e)))
+        return valid, invalid
 
     def _create_prompt(self, transcript, chat_text):
         return f"""
-Analyze the following YouTube Live Stream segment (Transcript and Chat) and extract "Warscribe" events.
+Analyze the following Warhammer 40k YouTube Live Stream segment (Transcript and Chat) and extract "Warscribe" actions.
 Output strictly valid JSON.
 
 Transcript:
 {transcript}
 
-Chat:
+Chat (repeated lines are collapsed as "text (xN, M viewers)"):
 {chat_text}
 
-Extract significant events, sentiment, and topics.
+Extract every game action described, plus a short summary of the segment.
+Each action needs "action_type" (one of: move, shoot, charge, fight, advance,
+fall_back, consolidate, pile_in, heroic_intervention, stratagem, ability, objective),
+"turn" (>= 1), "phase", and "actor" ({{"name": ..., "faction": ...}}).
+Shoot and fight actions also need "target", "weapon_name" and "shots"/"attacks";
+move actions need "distance_inches"; charge actions need "targets", "charge_roll"
+([d6, d6]) and "distance_needed".
 JSON Format:
 {{
-  "events": [
-    {{ "type": "topic_change", "description": "...", "timestamp": ... }},
-    {{ "type": "highlight", "description": "...", "timestamp": ... }}
-  ],
-  "summary": "..."
+  "summary": "...",
+  "actions": [
+    {{ "action_type": "shoot", "turn": 1, "phase": "shooting", "actor": {{ "name": "...", "faction": "..." }}, "target": {{ "name": "...", "faction": "..." }}, "weapon_name": "...", "shots": 2 }}
+  ]
 }}
 """
 
+    def _create_repair_prompt(self, transcript, invalid):
+        items = "\n\n".join(
+            f"Action:\n{json.dumps(item, default=str)}\nErrors:\n{error}"
+            for item, error in invalid
+        )
+        return f"""
+The following Warscribe actions extracted from this transcript failed validation.
+Return corrected versions as strictly valid JSON, in the same format:
+{{ "summary": "", "actions": [ ... ] }}
+Drop any action the transcript does not support.
+
+Transcript:
+{transcript}
+
+{items}
+"""
+
 
 if __name__ == "__main__":
     import sys
 
+    from utils import setup_logging
+
+    setup_logging()
     llm = WarscribeLLM()
     if len(sys.argv) > 1:
         llm.process_job(sys.argv[1])
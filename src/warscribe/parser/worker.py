@@ -1,102 +1,293 @@
 """
 Warscribe Worker — RQ task functions for the processing pipeline.
-Each task completes one phase and enqueues the next.
+Each task completes one phase and enqueues the next on the queue for that
+phase's resource class (see queues.py).
+
+Run a pool of workers for every class:
+    python worker.py pool
+or a single worker for one class:
+    python worker.py work --class transcribe
 """
 
+import argparse
+import functools
+import logging
+import multiprocessing
 import os
+import signal
 import sys
+from typing import Optional
 
 # Ensure src/ is on the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
 from redis import Redis
-from rq import Queue
+from rq import Worker, get_current_job
 
+import metrics
 from db import Database
 from downloader import Downloader
 from transcriber import Transcriber
 from chat_parser import ChatParser
 from warscribe_llm import WarscribeLLM
+from queues import (
+    RESOURCE_CLASSES,
+    get_queue,
+    migrate_legacy_queue,
+    record_wait,
+    resolve_priority,
+    worker_count,
+    worker_queues,
+)
+from utils import setup_logging
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")
 DB_PATH = os.environ.get("DB_PATH", "warscribe.db")
 INPUT_DIR = os.environ.get("INPUT_DIR", "input")
+# Extra tasks enqueued per video to share its transcription work units
+TRANSCRIBE_HELPERS = int(os.environ.get("TRANSCRIBE_HELPERS", "3"))
+
+log = logging.getLogger("warscribe.worker")
+
+_connection = None
+
+
+def _get_connection():
+    # One connection per worker process, reused across tasks
+    global _connection
+    if _connection is None:
+        _connection = Redis.from_url(REDIS_URL)
+    return _connection
+
+
+def _get_queue(resource_class, priority="normal"):
+    return get_queue(_get_connection(), resource_class, priority)
+
+
+def _start_task():
+    try:
+        record_wait(_get_connection(), get_current_job())
+    except Exception as e:
+        log.warning("Could not record queue wait time: %s", e)
+
+
+def _task(stage):
+    """Time a task, count its outcome and flush metrics when it ends."""
 
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics.resume()  # in the work-horse RQ forked for this job
+            _start_task()
+            status = "ok"
+            try:
+                with metrics.timer(
+                    "warscribe_task_seconds", "Pipeline task duration", stage=stage
+                ):
+                    return fn(*args, **kwargs)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                metrics.inc(
+                    "warscribe_tasks_total",
+                    help="Pipeline tasks run",
+                    stage=stage,
+                    status=status,
+                )
+                try:
+                    metrics.flush()
+                except OSError as e:
+                    log.warning("Could not flush metrics: %s", e)
 
-def _get_queue():
-    conn = Redis.from_url(REDIS_URL)
-    return Queue("warscribe", connection=conn)
+        return wrapper
 
+    return decorate
 
-def task_download(url: str):
+
+@_task("download")
+def task_download(
+    url: str, priority: Optional[str] = None, profile: Optional[str] = None
+):
     """Phase 1: Download audio and parse chat."""
-    print(f"[WORKER] Starting download for {url}")
-    db = Database(DB_PATH)
+    log.info("Starting download for %s", url)
+    db = Database(DB_PATH, with_chroma=False)
     downloader = Downloader(INPUT_DIR, db_path=DB_PATH)
     video_id = downloader.process(url)
+    if profile:
+        # Jobs for URLs the API couldn't resolve are only created by the download
+        db.set_job_profile(video_id, profile)
 
     # Chat parsing (non-fatal)
     try:
         parser = ChatParser(db_path=DB_PATH)
         parser.process_chat(video_id)
     except Exception as e:
-        print(f"[WORKER] Chat parsing failed (non-fatal): {e}")
+        log.warning("Chat parsing failed (non-fatal): %s", e)
 
     # Enqueue next step
-    job_status = db.get_job_status(video_id)
-    if job_status != "failed":
-        q = _get_queue()
-        q.enqueue(task_transcribe, video_id, job_timeout="12h")
-        print(f"[WORKER] Enqueued transcription for {video_id}")
+    job = db.get_job(video_id)
+    if job and job["status"] != "failed":
+        priority = resolve_priority(priority, job.get("audio_duration"))
+        q = _get_queue("transcribe", priority)
+        q.enqueue(task_transcribe, video_id, priority, job_timeout="12h")
+        log.info("Enqueued transcription for %s (%s)", video_id, priority)
     else:
-        print(f"[WORKER] Download failed for {video_id}, not enqueuing transcription")
+        log.error("Download failed for %s, not enqueuing transcription", video_id)
 
     return video_id
 
 
-def task_transcribe(video_id: str):
-    """Phase 2: Transcribe audio with faster-whisper."""
-    print(f"[WORKER] Starting transcription for {video_id}")
-    model_size = os.environ.get("WHISPER_MODEL", "tiny")
-    device = os.environ.get("WHISPER_DEVICE", "cpu")
-
-    transcriber = Transcriber(
-        model_size=model_size,
-        device=device,
+def _transcriber():
+    return Transcriber(
+        model_size=os.environ.get("WHISPER_MODEL", "tiny"),
+        device=os.environ.get("WHISPER_DEVICE", "cpu"),
         db_path=DB_PATH,
         input_dir=INPUT_DIR,
     )
-    transcriber.process_job(video_id)
 
-    # Enqueue next step
-    db = Database(DB_PATH)
-    job_status = db.get_job_status(video_id)
-    if job_status == "transcribed":
-        q = _get_queue()
-        q.enqueue(task_llm_embed, video_id, job_timeout="6h")
-        print(f"[WORKER] Enqueued LLM+embed for {video_id}")
+
+def _enqueue_llm(video_id, priority):
+    q = _get_queue("llm", priority)
+    q.enqueue(task_llm, video_id, priority, job_timeout="6h")
+    log.info("Enqueued LLM analysis for %s", video_id)
+
+
+@_task("transcribe")
+def task_transcribe(video_id: str, priority: str = "normal"):
+    """Phase 2: Transcribe audio with faster-whisper.
+
+    Long recordings are split into leased work units; helper tasks are
+    enqueued so idle transcribe workers on any node can take units of the
+    same video. Whichever task completes the last unit enqueues the LLM.
+    """
+    log.info("Starting transcription for %s", video_id)
+
+    def add_helpers(units):
+        helpers = min(units - 1, TRANSCRIBE_HELPERS)
+        q = _get_queue("transcribe", priority)
+        for _ in range(helpers):
+            q.enqueue(task_transcribe_units, video_id, priority, job_timeout="12h")
+        if helpers:
+            log.info("Enqueued %d transcription helper(s) for %s", helpers, video_id)
+
+    if _transcriber().process_job(video_id, on_units=add_helpers):
+        _enqueue_llm(video_id, priority)
     else:
-        print(
-            f"[WORKER] Transcription ended with status '{job_status}', not enqueuing LLM"
+        db = Database(DB_PATH, with_chroma=False)
+        log.info(
+            "Transcription task ended with job status '%s'",
+            db.get_job_status(video_id),
         )
 
     return video_id
 
 
-def task_llm_embed(video_id: str):
-    """Phase 3: LLM analysis + embedding generation."""
-    print(f"[WORKER] Starting LLM analysis for {video_id}")
-    db = Database(DB_PATH)
+@_task("transcribe")
+def task_transcribe_units(video_id: str, priority: str = "normal"):
+    """Phase 2 helper: transcribe free work units of a video, if any are left."""
+    db = Database(DB_PATH, with_chroma=False)
+    if not any(u["status"] == "pending" for u in db.get_work_units(video_id)):
+        return video_id  # nothing left to share; don't load the model
+    if video_id in _transcriber().process_units(video_id):
+        _enqueue_llm(video_id, priority)
+    return video_id
 
-    # LLM warscribe extraction
+
+@_task("llm")
+def task_llm(video_id: str, priority: str = "normal"):
+    """Phase 3: LLM warscribe extraction."""
+    log.info("Starting LLM analysis for %s", video_id)
     llm = WarscribeLLM(db_path=DB_PATH)
     llm.process_job(video_id)
 
-    # Generate embeddings
-    print(f"[WORKER] Generating embeddings for {video_id}")
-    segments = db.get_segments(video_id)
+    q = _get_queue("embed", priority)
+    q.enqueue(task_embed, video_id, job_timeout="6h")
+    log.info("Enqueued embeddings for %s", video_id)
+    return video_id
+
+
+@_task("embed")
+def task_embed(video_id: str):
+    """Phase 4: Embedding generation."""
+    log.info("Generating embeddings for %s", video_id)
+    db = Database(DB_PATH)
+    segments = db.get_segments_needing_embedding(video_id)
     db.add_transcript_embeddings(video_id, segments)
 
     db.update_job_status(video_id, "completed")
-    print(f"[WORKER] Job completed for {video_id}")
+    log.info("Job completed for %s", video_id)
     return video_id
+
+
+@_task("llm_embed")
+def task_llm_embed(video_id: str):
+    """Phase 3+4 in one task; kept for jobs enqueued before the queue split."""
+    llm = WarscribeLLM(db_path=DB_PATH)
+    llm.process_job(video_id)
+    return task_embed.__wrapped__(video_id)
+
+
+def run_worker(resource_class):
+    """Work the high- then normal-priority queues of one resource class."""
+    connection = _get_connection()
+    moved = migrate_legacy_queue(connection)
+    if moved:
+        log.info("Moved %d job(s) off the legacy queue", moved)
+    worker = Worker(worker_queues(connection, resource_class), connection=connection)
+    # One metrics snapshot per worker, shared by the work-horses it forks
+    metrics.set_process_name(f"rq-{worker.name}")
+    pruned = metrics.prune()
+    if pruned:
+        log.info("Pruned %d stale metrics snapshot(s)", pruned)
+    worker.work()
+
+
+def run_pool(classes=None):
+    """Start WORKERS_<CLASS> worker processes for each class and wait on them."""
+    processes = []
+    for resource_class in classes or RESOURCE_CLASSES:
+        for _ in range(worker_count(resource_class)):
+            p = multiprocessing.Process(
+                target=run_worker, args=(resource_class,), daemon=False
+            )
+            p.start()
+            processes.append(p)
+        log.info(
+            "Started %d '%s' worker(s)", worker_count(resource_class), resource_class
+        )
+
+    def stop(signum, frame):
+        # RQ workers finish their current job on SIGTERM (warm shutdown)
+        for p in processes:
+            if p.is_alive():
+                os.kill(p.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warscribe RQ workers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pool = sub.add_parser("pool", help="run workers for every resource class")
+    pool.add_argument(
+        "--class",
+        dest="classes",
+        action="append",
+        choices=list(RESOURCE_CLASSES),
+        help="limit to these classes (repeatable)",
+    )
+    work = sub.add_parser("work", help="run a single worker")
+    work.add_argument(
+        "--class", dest="resource_class", required=True, choices=list(RESOURCE_CLASSES)
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.command == "pool":
+        run_pool(args.classes)
+    else:
+        run_worker(args.resource_class)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Parser modules use flat imports, as they are run from their own directory
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "src", "warscribe", "parser")
+)
@@ -0,0 +1,100 @@
+import sqlite3
+
+import archive
+from db import Database
+
+
+def _completed_job(tmp_path, video_id="archived001"):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    db.add_job(video_id, "https://youtu.be/" + video_id)
+    ids = db.add_transcribed_segments(
+        video_id, "a.wav", [(t, t + 20, f"said at {t}") for t in range(0, 200, 20)]
+    )
+    for seg_id in ids[:5]:
+        db.save_segment_extraction(seg_id, video_id, '{"summary": "s"}', [])
+    db.add_chat_messages(
+        [(video_id, t / 2, f"viewer{t % 7}", f"message {t}") for t in range(400)]
+    )
+    db.update_job_status(video_id, "completed")
+    return db
+
+
+def _raw(db, sql, *params):
+    conn = sqlite3.connect(db.db_path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+def test_archived_job_reads_back_unchanged(tmp_path):
+    db = _completed_job(tmp_path)
+    segments = db.get_segments("archived001")
+    chat = db.get_chat_for_segment("archived001", 55.0, 130.0)
+    all_chat = sorted(db.iter_chat_messages("archived001"))
+
+    stats = db.archive_job("archived001", block_seconds=60)
+    assert stats["segments"] == 10
+    assert stats["chat"] == 400
+    assert stats["stored_bytes"] < stats["raw_bytes"]
+
+    # The plain-text copies are gone ...
+    assert _raw(db, "SELECT COUNT(*) FROM chat_messages") == [(0,)]
+    assert _raw(db, "SELECT COUNT(transcript) FROM segments") == [(0,)]
+    # ... but reads through the usual API don't notice
+    assert db.get_segments("archived001") == segments
+    assert db.get_chat_for_segment("archived001", 55.0, 130.0) == chat
+    assert sorted(db.iter_chat_messages("archived001")) == all_chat
+    assert db.get_segments_needing_analysis("archived001") == []
+
+    # Repeated reads are served from decoded blocks
+    before = archive.load_block.cache_info().hits
+    db.get_chat_for_segment("archived001", 55.0, 130.0)
+    assert archive.load_block.cache_info().hits > before
+
+
+def test_segment_ranges_read_back_across_block_edges(tmp_path):
+    db = _completed_job(tmp_path)
+    before = db.get_segments_in_range("archived001", 65.0, 95.0)
+    # The 60-80 segment overlaps the window but is archived in the 0-61 block
+    db.archive_job("archived001", block_seconds=61)
+
+    segments = db.get_segments_in_range("archived001", 65.0, 95.0)
+    assert segments == before
+    assert [s["transcript"] for s in segments] == ["said at 60", "said at 80"]
+    window = db.get_segments_in_range("archived001", 70.0, 75.0)
+    assert [s["transcript"] for s in window] == ["said at 60"]
+
+
+def test_only_completed_jobs_are_archived_once(tmp_path):
+    db = _completed_job(tmp_path)
+    db.update_job_status("archived001", "analyzed")
+    assert db.archive_job("archived001") is None
+
+    db.update_job_status("archived001", "completed")
+    assert db.archive_job("archived001") is not None
+    assert db.archive_job("archived001") is None
+
+
+def test_restore_puts_rows_back(tmp_path):
+    db = _completed_job(tmp_path)
+    segments = db.get_segments("archived001")
+    chat = _raw(db, "SELECT * FROM chat_messages ORDER BY id")
+    db.archive_job("archived001", block_seconds=60)
+
+    assert db.restore_job("archived001")
+    assert _raw(db, "SELECT * FROM chat_messages ORDER BY id") == chat
+    assert _raw(db, "SELECT COUNT(*) FROM archive_blocks") == [(0,)]
+    assert db.get_segments("archived001") == segments
+    assert not db.restore_job("archived001")
+
+
+def test_sweep_archives_only_old_completed_jobs(tmp_path):
+    db = _completed_job(tmp_path)
+    assert archive.sweep(db, older_than_days=1)["jobs"] == 0
+
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE jobs SET updated_at = datetime('now', '-3 days')")
+    conn.commit()
+    conn.close()
+    assert archive.sweep(db, older_than_days=1)["jobs"] == 1
+    assert archive.sweep(db, older_than_days=1)["jobs"] == 0
@@ -0,0 +1,194 @@
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+import audio
+from audio import SAMPLE_RATE, PcmTail, export_npy, open_pcm, transcribe_windowed
+from utils import find_audio
+
+
+class FakeSegment:
+    def __init__(self, start, end, text):
+        self.start, self.end, self.text = start, end, text
+
+
+class FakeModel:
+    """Emits a 7s segment every 7s of whatever audio it is handed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        seconds = len(audio) / SAMPLE_RATE
+        self.calls.append(seconds)
+        segments, t = [], 0.0
+        while t < seconds:
+            segments.append(FakeSegment(t, min(t + 7.0, seconds), "x"))
+            t += 7.0
+        return segments, None
+
+
+def test_open_pcm_maps_16k_mono_wav(tmp_path):
+    path = str(tmp_path / "audio.wav")
+    samples = (np.arange(SAMPLE_RATE * 2) % 1000).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(samples.tobytes())
+
+    mapped = open_pcm(path)
+    assert isinstance(mapped, np.memmap)
+    assert np.array_equal(mapped, samples)
+
+
+def test_open_pcm_rejects_other_wav_layouts(tmp_path):
+    path = str(tmp_path / "stereo.wav")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(48000)
+        w.writeframes(b"\0" * 400)
+    assert open_pcm(path) is None
+
+
+def test_transcribe_windowed_covers_audio_without_overlap(tmp_path):
+    path = str(tmp_path / "audio.npy")
+    np.save(path, np.zeros(SAMPLE_RATE * 95, dtype=np.float32))
+    model = FakeModel()
+
+    segments = list(transcribe_windowed(model, open_pcm(path), window_seconds=30))
+
+    # Every window is bounded, and the trailing cut segment is re-decoded
+    assert max(model.calls) <= 30
+    assert segments[0][0] == 0.0
+    assert segments[-1][1] == 95.0
+    for (_, prev_end, _), (start, _, _) in zip(segments, segments[1:]):
+        assert start == prev_end
+
+
+def test_transcribe_windowed_starts_at_resume_point(tmp_path):
+    path = str(tmp_path / "audio.npy")
+    np.save(path, np.zeros(SAMPLE_RATE * 60, dtype=np.float32))
+
+    segments = list(transcribe_windowed(FakeModel(), open_pcm(path), start_time=40.0))
+    assert segments[0][0] == 40.0
+    assert segments[-1][1] == 60.0
+
+
+def test_pcm_tail_reads_what_has_been_written_so_far(tmp_path):
+    path = tmp_path / "live.pcm"
+    tail = PcmTail(str(path))
+    assert tail.available() == 0
+
+    path.write_bytes(np.arange(10, dtype="<i2").tobytes())
+    assert tail.available() == 10
+    first_seen = tail.arrival_time(10)
+    with open(path, "ab") as f:
+        f.write(np.arange(10, 20, dtype="<i2").tobytes())
+
+    assert tail.available() == 20
+    assert list(tail.read(8, 4)) == [8, 9, 10, 11]
+    assert list(tail.read(18, 10)) == [18, 19]
+    assert tail.arrival_time(5) == first_seen
+    assert tail.arrival_time(15) >= first_seen
+
+
+class FakeVadModel:
+    """Emits up to 7s segments over the non-zero runs of the audio it is handed."""
+
+    def transcribe(self, audio, **options):
+        voiced = np.flatnonzero(np.diff(np.concatenate([[0], audio != 0, [0]])))
+        segments = []
+        for start, end in zip(voiced[::2] / SAMPLE_RATE, voiced[1::2] / SAMPLE_RATE):
+            while start < end:
+                segments.append(FakeSegment(start, min(start + 7.0, end), "x"))
+                start += 7.0
+        return segments, None
+
+
+def test_transcribe_windowed_records_silence_across_windows(tmp_path):
+    samples = np.zeros(SAMPLE_RATE * 95, dtype=np.float32)
+    samples[: SAMPLE_RATE * 10] = 0.5
+    samples[SAMPLE_RATE * 50 : SAMPLE_RATE * 60] = 0.5
+    path = str(tmp_path / "audio.npy")
+    np.save(path, samples)
+
+    rows = list(
+        transcribe_windowed(
+            FakeVadModel(), open_pcm(path), window_seconds=30, min_silence=2.0
+        )
+    )
+    assert rows == [
+        (0.0, 7.0, "x"),
+        (7.0, 10.0, "x"),
+        (10.0, 50.0, None),
+        (50.0, 57.0, "x"),
+        (57.0, 60.0, "x"),
+        (60.0, 95.0, None),
+    ]
+
+
+def _fake_ffmpeg(tmp_path, monkeypatch, body):
+    """Put an `ffmpeg` running the given Python body first on PATH."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    script = bin_dir / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\nimport sys\nimport numpy as np\n{body}\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_export_npy_streams_decoded_audio_to_a_mappable_file(tmp_path, monkeypatch):
+    _fake_ffmpeg(
+        tmp_path,
+        monkeypatch,
+        "sys.stdout.buffer.write(np.arange(5000, dtype='<f4').tobytes())",
+    )
+    out = str(tmp_path / "vid00000001.npy")
+    assert export_npy("in.wav", out, block_bytes=1024) == out
+
+    samples = open_pcm(out)
+    assert samples.dtype == np.float32
+    np.testing.assert_array_equal(samples, np.arange(5000, dtype=np.float32))
+    assert not os.path.exists(out + ".tmp")
+
+
+def test_failed_export_leaves_nothing_behind(tmp_path, monkeypatch):
+    _fake_ffmpeg(tmp_path, monkeypatch, "sys.exit('bad input')")
+    out = str(tmp_path / "vid00000001.npy")
+    with pytest.raises(RuntimeError, match="bad input"):
+        export_npy("in.wav", out)
+
+    # A failure while writing the .npy removes the partial .tmp file
+    _fake_ffmpeg(
+        tmp_path,
+        monkeypatch,
+        "sys.stdout.buffer.write(np.zeros(10, dtype='<f4').tobytes())",
+    )
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(audio.np.lib.format, "write_array_header_1_0", fail)
+    with pytest.raises(OSError):
+        export_npy("in.wav", out)
+    assert sorted(os.listdir(tmp_path)) == ["bin"]
+
+
+def test_find_audio_skips_partial_and_derived_files(tmp_path):
+    for name in (
+        "vid00000001.npy.tmp",
+        "vid00000001.npy",
+        "vid00000001.part",
+        "vid00000001.pcm",  # a live capture's spool
+    ):
+        (tmp_path / name).write_bytes(b"")
+    assert find_audio(str(tmp_path), "vid00000001") is None
+    (tmp_path / "vid00000001.flac").write_bytes(b"")
+    assert find_audio(str(tmp_path), "vid00000001") == str(
+        tmp_path / "vid00000001.flac"
+    )
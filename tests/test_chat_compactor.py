@@ -0,0 +1,75 @@
+from chat_compactor import clean_message, compact_chat
+
+
+def _msgs(*pairs):
+    return [{"author": a, "message": m} for a, m in pairs]
+
+
+def test_clean_message_strips_emotes_and_repetition():
+    assert clean_message("LETS GOOOOOOO GO GO :fire: 🔥🔥") == "LETS GOO GO"
+    assert clean_message("KEKW KEKW LUL") == ""
+    assert clean_message("did he make the 9 inch charge?") == (
+        "did he make the 9 inch charge?"
+    )
+
+
+def test_numbers_are_never_collapsed():
+    assert clean_message("2000 points list, rolled a 111") == (
+        "2000 points list, rolled a 111"
+    )
+    chat_text, _ = compact_chat(
+        _msgs(("a", "needs a 1 to fail"), ("b", "needs a 11 to fail"))
+    )
+    assert chat_text.splitlines() == [
+        "a: needs a 1 to fail",
+        "b: needs a 11 to fail",
+    ]
+
+
+def test_duplicates_collapse_with_counts():
+    messages = _msgs(
+        ("a", "LETS GOOOO"),
+        ("b", "lets gooooooo!!"),
+        ("c", "Lets Go"),
+        ("a", "lets goo"),
+        ("d", "KEKW"),
+        ("e", "nice shot on the dreadnought"),
+    )
+    chat_text, stats = compact_chat(messages)
+    assert chat_text.splitlines() == [
+        "LETS GOO (x4, 3 viewers)",
+        "e: nice shot on the dreadnought",
+    ]
+    assert stats["messages_in"] == 6
+    assert stats["messages_out"] == 2
+
+
+def test_spam_is_capped_by_relevance_and_tokens_drop():
+    spam = [(f"viewer{i}", f"LETS GO {'O' * (i % 7)} {i}") for i in range(500)]
+    on_topic = [
+        ("rules", "that charge roll was 9, it makes it"),
+        ("fan", "the dreadnought should fall back"),
+    ]
+    messages = _msgs(*spam[:250], *on_topic, *spam[250:])
+
+    chat_text, stats = compact_chat(
+        messages, transcript="the dreadnought charges the squad", max_messages=5
+    )
+    lines = chat_text.splitlines()
+    assert len(lines) == 5
+    assert "rules: that charge roll was 9, it makes it" in lines
+    assert "fan: the dreadnought should fall back" in lines
+    assert stats["tokens_after"] < stats["tokens_before"] / 20
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"]
+
+
+def test_game_terms_with_doubled_letters_count_as_on_topic():
+    messages = _msgs(
+        ("a", "what a great stream today everyone"),
+        ("b", "hello from the other side of town"),
+        ("c", "rolled a 1"),
+        ("d", "fall back"),
+        ("e", "love these casters so very much"),
+    )
+    chat_text, _ = compact_chat(messages, max_messages=2)
+    assert chat_text.splitlines() == ["c: rolled a 1", "d: fall back"]
@@ -0,0 +1,62 @@
+import chat_parser
+from chat_rollup import ChatRollup, find_spikes, get_spikes, rebuild
+from db import Database
+
+
+class FakeChatDownloader:
+    """Replays a quiet chat with one burst of hype around 120s."""
+
+    def get_chat(self, url):
+        for t in range(0, 300, 5):
+            yield {"time_in_seconds": t, "author": {"name": "regular"}, "message": "hi"}
+        for i in range(40):
+            yield {
+                "time_in_seconds": 120 + i / 4,
+                "author": {"name": f"viewer{i % 25}"},
+                "message": "POG no way" if i % 2 else "what a charge",
+            }
+
+
+def test_rollup_counts_messages_authors_and_keywords():
+    rollup = ChatRollup(bucket_seconds=10, keywords=["pog", "no way"])
+    rollup.add(1.0, "a", "pog pog")
+    rollup.add(9.9, "a", "No way!")
+    rollup.add(10.0, "b", "pogger")  # not a whole word
+    assert rollup.pending() == [(0.0, 2, 1, 3), (10.0, 1, 1, 0)]
+    assert rollup.pending() == []
+
+    rollup.add(12.0, "c", "hi")
+    assert rollup.pending() == [(10.0, 2, 2, 0)]
+
+
+def test_spikes_are_the_busiest_non_overlapping_windows():
+    buckets = [(t, 2, 2, 0) for t in range(0, 300, 10)]
+    buckets[12] = (120, 30, 20, 10)
+    buckets[20] = (200, 12, 8, 0)
+
+    spikes = find_spikes(buckets, 10, top_k=2, window_seconds=20)
+    assert [(s["start"], s["end"]) for s in spikes] == [(110, 130), (190, 210)]
+    assert spikes[0]["messages"] == 32
+    assert spikes[0]["keyword_hits"] == 10
+    assert spikes[0]["score"] > spikes[1]["score"] > 1
+
+
+def test_chat_ingest_builds_the_rollup(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_parser, "ChatDownloader", FakeChatDownloader)
+    db_path = str(tmp_path / "w.db")
+    db = Database(db_path, with_chroma=False)
+    db.add_job("chatvideo01", "https://youtu.be/chatvideo01")
+
+    chat_parser.ChatParser(db_path).process_chat("chatvideo01")
+
+    buckets = db.get_chat_buckets("chatvideo01", 10.0)
+    assert sum(b[1] for b in buckets) == 100
+    assert buckets[12] == (120.0, 42, 26, 40)
+    spikes = get_spikes(
+        db, "chatvideo01", top_k=1, window_seconds=10, bucket_seconds=10.0
+    )
+    assert spikes[0]["start"] == 120.0
+
+    # Rebuilding from the stored messages gives the same rollup
+    assert rebuild(db, "chatvideo01", 10.0) == len(buckets)
+    assert db.get_chat_buckets("chatvideo01", 10.0) == buckets
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import db as db_module
+import embeddings
+from db import Database
+from embeddings import OnnxEmbedder
+
+TEXTS = [
+    "Deploy the Intercessors on the left objective",
+    "charge!",
+    "The Leman Russ fires its battle cannon at the Carnifex and rolls a six",
+    "Command phase, he spends two CP on the stratagem",
+    "gg",
+] * 3
+
+
+class _Encoding:
+    def __init__(self, ids, width):
+        self.ids = ids + [0] * (width - len(ids))
+        self.attention_mask = [1] * len(ids) + [0] * (width - len(ids))
+        self.type_ids = [0] * width
+
+
+class _Tokenizer:
+    """One token per word, padded to the longest text in the batch."""
+
+    def encode_batch(self, texts):
+        ids = [[len(word) for word in text.split()] for text in texts]
+        width = max(len(i) for i in ids)
+        return [_Encoding(i, width) for i in ids]
+
+
+class _Session:
+    """Token vectors [id, 1]; padding positions get junk the pooling must ignore."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, outputs, feed):
+        self.batches.append(feed["input_ids"].shape)
+        ids = feed["input_ids"].astype(np.float32)
+        tokens = np.stack([ids, np.ones_like(ids)], axis=-1)
+        tokens[feed["attention_mask"] == 0] = 1000.0
+        return [tokens]
+
+
+def _fake_onnx():
+    embedder = OnnxEmbedder.__new__(OnnxEmbedder)
+    embedder.label = "onnx:all-MiniLM-L6-v2"
+    embedder.tokenizer = _Tokenizer()
+    embedder.session = _Session()
+    embedder.inputs = {"input_ids", "attention_mask"}
+    return embedder
+
+
+def test_onnx_pooling_ignores_padding_and_keeps_input_order(monkeypatch):
+    monkeypatch.setattr(embeddings, "BATCH_SIZE", 4)
+    embedder = _fake_onnx()
+    vectors = embedder(TEXTS)
+
+    assert len(embedder.session.batches) == 4
+    for text, vector in zip(TEXTS, vectors):
+        lengths = [len(word) for word in text.split()]
+        expected = np.array([np.mean(lengths), 1.0])
+        np.testing.assert_allclose(vector, expected / np.linalg.norm(expected))
+    assert embedder([]) == []
+
+
+class _ChromaClient:
+    """Does what chromadb 1.x does with an embedding function on create."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_or_create_collection(self, name, embedding_function):
+        assert isinstance(embedding_function.name(), str)
+        if not embedding_function.is_legacy():
+            embedding_function.get_config()
+        return {"name": name, "embedding_function": embedding_function}
+
+
+def test_database_hands_chroma_an_embedder_it_accepts(tmp_path, monkeypatch):
+    embedder = _fake_onnx()
+    monkeypatch.setattr(embeddings, "get_embedder", lambda: embedder)
+    monkeypatch.setattr(db_module.chromadb, "PersistentClient", _ChromaClient)
+
+    db = Database(str(tmp_path / "w.db"), chroma_path=str(tmp_path / "chroma"))
+    assert db.collection["embedding_function"] is embedder
+    assert embedder.name() == "onnx:all-MiniLM-L6-v2"
+
+
+@pytest.mark.parametrize("backend,min_cosine", [("onnx", 0.999), ("onnx-int8", 0.97)])
+def test_onnx_backends_match_torch(backend, min_cosine):
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnxruntime")
+    try:
+        reference = embeddings.get_embedder("torch")
+        candidate = embeddings.get_embedder(backend)
+    except Exception as e:  # the model could not be downloaded
+        pytest.skip(f"model unavailable: {e}")
+
+    expected = np.array(reference(TEXTS))
+    actual = np.array(candidate(TEXTS))
+    cosine = (expected * actual).sum(axis=1)
+    assert cosine.min() >= min_cosine
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from db import Database
+from export import export
+
+
+def _video(tmp_path, video_id="export00001"):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    db.add_job(video_id, "https://youtu.be/" + video_id)
+    ids = db.add_transcribed_segments(
+        video_id, "a.wav", [(t, t + 10, f"line {t}") for t in range(0, 100, 10)]
+    )
+    db.save_segment_extraction(
+        ids[0],
+        video_id,
+        '{"summary": "opening", "actions": []}',
+        [("move", 1, "movement", "Intercessors", "success", '{"action_type": "move"}')],
+    )
+    db.add_chat_messages([(video_id, t * 1.5, "viewer", f"msg {t}") for t in range(50)])
+    return db
+
+
+def _records(chunks):
+    return [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+
+def test_ndjson_streams_every_kind_in_small_chunks(tmp_path):
+    db = _video(tmp_path)
+    chunks = list(export(db, "export00001", batch_size=8))
+
+    assert max(len(chunk.splitlines()) for chunk in chunks) <= 8
+    records = _records(chunks)
+    by_type = {}
+    for record in records:
+        by_type.setdefault(record["type"], []).append(record)
+    assert len(by_type["segment"]) == 10
+    assert len(by_type["chat"]) == 50
+    assert by_type["segment"][0]["warscribe_json"]["summary"] == "opening"
+    assert by_type["event"] == [
+        {
+            "type": "event",
+            "id": 1,
+            "segment_id": 1,
+            "start_time": 0.0,
+            "end_time": 10.0,
+            "action_type": "move",
+            "turn": 1,
+            "phase": "movement",
+            "actor": "Intercessors",
+            "result": "success",
+            "payload": {"action_type": "move"},
+        }
+    ]
+    timestamps = [r["timestamp"] for r in by_type["chat"]]
+    assert timestamps == sorted(timestamps)
+
+
+def test_text_that_is_not_json_is_exported_raw(tmp_path):
+    db = _video(tmp_path)
+    (segment, *_) = db.get_segments("export00001")
+    db.update_segment_warscribe(segment["id"], "Summary: no JSON from the model")
+
+    records = _records(export(db, "export00001", kinds=("segments",)))
+    assert records[0]["warscribe_json"] == "Summary: no JSON from the model"
+    assert records[1]["warscribe_json"] is None
+
+
+def test_export_reads_archived_jobs(tmp_path):
+    db = _video(tmp_path)
+    before = _records(export(db, "export00001"))
+    db.update_job_status("export00001", "completed")
+    db.archive_job("export00001", block_seconds=25)
+    assert _records(export(db, "export00001", batch_size=3)) == before
+
+
+def test_columnar_formats_take_a_single_kind(tmp_path):
+    db = _video(tmp_path)
+    with pytest.raises(ValueError):
+        export(db, "export00001", "parquet", ["segments", "chat"])
+    with pytest.raises(ValueError):
+        export(db, "export00001", "csv")
+
+
+def test_parquet_export_round_trips(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db = _video(tmp_path)
+    path = tmp_path / "chat.parquet"
+    path.write_bytes(b"".join(export(db, "export00001", "parquet", ["chat"], 16)))
+    table = pq.read_table(path)
+    assert table.num_rows == 50
+    assert pq.ParquetFile(path).num_row_groups == 4
+
+
+def test_export_endpoint_streams_ndjson(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import api
+
+    _video(tmp_path)
+    monkeypatch.setattr(api, "DB_PATH", str(tmp_path / "w.db"))
+    with TestClient(api.app) as client:
+        response = client.get("/jobs/export00001/export", params={"kinds": "chat"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert len(_records([response.content])) == 50
+
+        assert client.get("/jobs/missing0001/export").status_code == 404
+        bad = client.get("/jobs/export00001/export", params={"kinds": "nope"})
+        assert bad.status_code == 422
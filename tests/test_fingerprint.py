@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+import fingerprint
+import transcriber
+from audio import SAMPLE_RATE
+from db import Database
+from transcriber import Transcriber
+
+
+def _speech(seconds, seed):
+    """Harmonic bursts over a noise floor, standing in for commentary."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    audio = 0.003 * rng.standard_normal(n).astype(np.float32)
+    t = np.arange(8000) / SAMPLE_RATE
+    for _ in range(int(seconds * 6)):
+        start, length = rng.integers(0, n - 8000), rng.integers(1600, 8000)
+        pitch = rng.uniform(100, 300)
+        tone = sum(
+            np.sin(2 * np.pi * pitch * k * t[:length] + rng.uniform(0, 6)) / k
+            for k in range(1, 8)
+        )
+        audio[start : start + length] += 0.1 * np.hanning(length) * tone
+    return audio
+
+
+class FakeSegment:
+    def __init__(self, start, end, text):
+        self.start, self.end, self.text = start, end, text
+
+
+class FakeModel:
+    """Emits a 5s segment every 5s of whatever audio it is handed."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def transcribe(self, audio, **options):
+        seconds = len(audio) / SAMPLE_RATE
+        starts = np.arange(0.0, seconds, 5.0)
+        return [FakeSegment(s, min(s + 5.0, seconds), "new") for s in starts], None
+
+
+@pytest.fixture
+def source(tmp_path):
+    """A transcribed and analyzed 120s video, fingerprinted."""
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    audio = _speech(120, seed=1)
+    db.add_job("src00000001", "https://youtu.be/src00000001")
+    ids = db.add_transcribed_segments(
+        "src00000001",
+        "src.wav",
+        [(t, t + 5.0, f"line {t:.0f}") for t in range(0, 120, 5)],
+    )
+    for seg_id in ids:
+        db.save_segment_extraction(
+            seg_id,
+            "src00000001",
+            '{"summary": "s"}',
+            [("move", 1, "movement", "a", None, "{}")],
+        )
+    db.update_job_status("src00000001", "completed")
+    db.replace_fingerprints("src00000001", *fingerprint.fingerprint(audio))
+    return db, audio
+
+
+def test_peaks_do_not_depend_on_the_window_size():
+    audio = _speech(30, seed=2)
+    whole = fingerprint.peaks(audio)
+    windowed = fingerprint.peaks(audio, window_seconds=7)
+    np.testing.assert_array_equal(whole[0], windowed[0])
+    np.testing.assert_array_equal(whole[1], windowed[1])
+
+
+def test_clip_copies_segments_with_offset_and_skips_their_transcription(
+    source, tmp_path, monkeypatch
+):
+    db, source_audio = source
+    rng = np.random.default_rng(3)
+    # 20s of new audio, then a re-encoded clip of the source from 37.3s
+    clip = source_audio[int(37.3 * SAMPLE_RATE) : int(97.3 * SAMPLE_RATE)] * 0.8
+    clip += 0.004 * rng.standard_normal(len(clip)).astype(np.float32)
+    audio = np.concatenate([_speech(20, seed=4), clip, _speech(20, seed=5)])
+
+    db.add_job("new00000001", "https://youtu.be/new00000001")
+    copied = fingerprint.dedup(db, "new00000001", audio, "new.wav")
+
+    assert len(copied) == 1
+    assert copied[0]["source_video_id"] == "src00000001"
+    assert copied[0]["offset"] == pytest.approx(17.3, abs=0.04)
+    segments = db.get_segments("new00000001")
+    assert [s["transcript"] for s in segments] == [
+        f"line {t}" for t in range(40, 95, 5)
+    ]
+    assert segments[0]["start_time"] == pytest.approx(22.7, abs=0.04)
+    assert all(s["warscribe_json"] for s in segments)
+    assert db.get_segments_needing_analysis("new00000001") == []
+    assert len(db.get_actions("new00000001")) == len(segments)
+    assert db.get_job_progress("new00000001")["copied"]["segments"] == len(segments)
+
+    # Only the audio around the copy is transcribed
+    monkeypatch.setattr(transcriber, "WhisperModel", FakeModel)
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    np.save(input_dir / "new00000001.npy", audio)
+    (input_dir / "new00000001.wav").write_bytes(b"")
+    db.update_job_status("new00000001", "downloaded")
+    t = Transcriber(db_path=db.db_path, input_dir=str(input_dir), unit_seconds=30.0)
+    assert t.process_job("new00000001")
+
+    units = [(u["start_time"], u["end_time"]) for u in db.get_work_units("new00000001")]
+    assert units == [
+        (0.0, copied[0]["start_time"]),
+        (copied[0]["end_time"], 100.0),
+    ]
+    assert db.get_job_status("new00000001") == "transcribed"
+    for s in db.get_segments("new00000001"):
+        if s["transcript"] == "new":
+            assert (
+                s["end_time"] <= copied[0]["start_time"]
+                or s["start_time"] >= copied[0]["end_time"]
+            )
+
+
+def test_unrelated_audio_copies_nothing(source):
+    db, _ = source
+    db.add_job("new00000002", "https://youtu.be/new00000002")
+    assert fingerprint.dedup(db, "new00000002", _speech(60, seed=6), "new.wav") == []
+    assert db.get_segments("new00000002") == []
+    assert db.get_audio_matches("new00000002") == []
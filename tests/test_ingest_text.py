@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pytest
+
+import embeddings
+import vector_index
+from db import Database
+from ingest_text import chunk_paragraphs, ingest_directory, iter_paragraphs
+
+
+BOLT = "bolt rifles are rapid fire at long range"
+PLASMA = "plasma guns overheat and slay their bearer sometimes"
+SUPERCHARGE = "plasma guns supercharge for one extra damage point"
+MELTA = "melta guns are short ranged but very deadly"
+
+
+class _HashEmbedding:
+    """Deterministic bag-of-words embedding standing in for the real model."""
+
+    def __call__(self, texts):
+        out = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i, hash(word) % 64] += 1
+        return out
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "get_embedder", _HashEmbedding)
+    monkeypatch.setattr(vector_index, "BACKEND", "local")
+    monkeypatch.setattr(vector_index, "INDEX_PATH", str(tmp_path / "vectors"))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "rules.txt").write_text("\n\n".join([BOLT, PLASMA, MELTA]) + "\n")
+    (docs / "notes.md").write_text("not matched by the pattern\n")
+    return docs, str(tmp_path / "w.db")
+
+
+def _ingest(docs, db_path):
+    # Eight-word paragraphs with no overlap: one chunk per paragraph
+    return ingest_directory(
+        str(docs),
+        db_path=db_path,
+        workers=2,
+        batch_size=2,
+        max_tokens=8,
+        overlap_tokens=0,
+    )
+
+
+def _documents():
+    found = vector_index.VectorIndex().fetch(range(100))
+    return sorted(document for _, document, _ in found.values())
+
+
+def test_paragraphs_pack_into_overlapping_token_budgets(tmp_path):
+    path = tmp_path / "t.txt"
+    path.write_text("a b\nc d e\n\n\nf g\n")
+    assert list(iter_paragraphs(path)) == ["a b c d e", "f g"]
+    assert list(chunk_paragraphs(iter_paragraphs(path), 4, 1)) == [
+        "a b c d",
+        "d e f g",
+    ]
+    # A word over budget still makes a chunk of its own
+    assert list(chunk_paragraphs(["x " * 3], 1, 0)) == ["x", "x", "x"]
+
+
+def test_unchanged_files_are_skipped(corpus):
+    docs, db_path = corpus
+    first = _ingest(docs, db_path)
+    assert (first["files_seen"], first["files_ingested"], first["chunks"]) == (1, 1, 3)
+
+    assert _ingest(docs, db_path)["files_skipped"] == 1
+    # Touched but identical: caught by the content hash
+    os.utime(docs / "rules.txt", (1, 1))
+    again = _ingest(docs, db_path)
+    assert (again["files_skipped"], again["chunks"]) == (1, 0)
+    assert _documents() == sorted([BOLT, PLASMA, MELTA])
+
+
+def test_changed_file_replaces_its_stale_chunks(corpus):
+    docs, db_path = corpus
+    _ingest(docs, db_path)
+    (docs / "rules.txt").write_text("\n\n".join([BOLT, SUPERCHARGE, MELTA]) + "\n")
+    os.utime(docs / "rules.txt", (2, 2))
+
+    stats = _ingest(docs, db_path)
+    assert (stats["chunks"], stats["chunks_duplicate"], stats["chunks_deleted"]) == (
+        1,
+        2,
+        1,
+    )
+    assert _documents() == sorted([BOLT, SUPERCHARGE, MELTA])
+    collection = Database(db_path).collection
+    assert collection.count() == 3
+    hits = collection.query(query_texts=[PLASMA], n_results=3)
+    assert PLASMA not in hits["documents"][0]
+
+
+def test_shared_chunk_outlives_the_file_it_was_first_seen_in(corpus):
+    docs, db_path = corpus
+    # Walked before rules.txt, so PLASMA is first stored for this file
+    (docs / "codex.txt").write_text(PLASMA + "\n")
+    _ingest(docs, db_path)
+    (docs / "codex.txt").write_text(SUPERCHARGE + "\n")
+    os.utime(docs / "codex.txt", (2, 2))
+
+    stats = _ingest(docs, db_path)
+    assert (stats["files_skipped"], stats["chunks"], stats["chunks_deleted"]) == (
+        1,
+        1,
+        0,
+    )
+    assert _documents() == sorted([BOLT, PLASMA, MELTA, SUPERCHARGE])
+
+    # Once the last file referencing it drops it, the vector goes too
+    (docs / "rules.txt").write_text("\n\n".join([BOLT, MELTA]) + "\n")
+    os.utime(docs / "rules.txt", (2, 2))
+    assert _ingest(docs, db_path)["chunks_deleted"] == 1
+    assert Database(db_path).collection.count() == 3
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import metrics
+from audio import SAMPLE_RATE, PcmTail
+from db import Database
+from downloader import Downloader
+from live import LagTracker, LiveSession, LiveTranscriber
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path / "metrics"))
+
+
+class FakeSegment:
+    def __init__(self, start, end, text):
+        self.start, self.end, self.text = start, end, text
+
+
+class FakeModel:
+    """Emits a 2s segment every 2s of whatever audio it is handed."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def transcribe(self, audio, **options):
+        time.sleep(self.delay)
+        seconds = len(audio) / SAMPLE_RATE
+        t, segments = 0.0, []
+        while t < seconds:
+            segments.append(FakeSegment(t, min(t + 2.0, seconds), "x"))
+            t += 2.0
+        return segments, None
+
+
+def _write_stream(path, seconds, chunk_seconds=1.0, pause=0.01, done=None):
+    """Append silence to path in chunks, like a capture process would."""
+
+    def write():
+        chunk = np.zeros(int(chunk_seconds * SAMPLE_RATE), dtype="<i2").tobytes()
+        for _ in range(int(seconds / chunk_seconds)):
+            with open(path, "ab") as f:
+                f.write(chunk)
+            time.sleep(pause)
+        if done is not None:
+            done.set()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+
+def _live_db(tmp_path, video_id="livevideo01"):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    db.add_job(video_id, "https://youtu.be/" + video_id)
+    return db
+
+
+def test_live_transcript_is_contiguous_while_the_file_grows(tmp_path):
+    db = _live_db(tmp_path)
+    path = str(tmp_path / "livevideo01.pcm")
+    done = threading.Event()
+    writer = _write_stream(path, seconds=25, done=done)
+
+    live = LiveTranscriber(
+        FakeModel(),
+        db,
+        "livevideo01",
+        PcmTail(path),
+        LagTracker(),
+        window_seconds=5.0,
+        poll_interval=0.005,
+    )
+    live.run(done)
+    writer.join()
+
+    segments = db.get_segments("livevideo01")
+    assert segments[0]["start_time"] == 0.0
+    assert segments[-1]["end_time"] == 25.0
+    for prev, seg in zip(segments, segments[1:]):
+        assert seg["start_time"] == pytest.approx(prev["end_time"])
+    assert live.skipped_seconds == 0.0
+    assert live.lag.report()["transcribe"]["segments"] == len(segments)
+
+
+def test_live_transcription_skips_ahead_to_bound_lag(tmp_path):
+    db = _live_db(tmp_path)
+    path = str(tmp_path / "livevideo01.pcm")
+    done = threading.Event()
+    # Two hours already captured before transcription starts
+    with open(path, "wb") as f:
+        f.write(np.zeros(SAMPLE_RATE * 7200, dtype="<i2").tobytes())
+    done.set()
+
+    live = LiveTranscriber(
+        FakeModel(),
+        db,
+        "livevideo01",
+        PcmTail(path),
+        LagTracker(),
+        window_seconds=5.0,
+        max_lag_seconds=20.0,
+    )
+    live.run(done)
+
+    segments = db.get_segments("livevideo01")
+    assert live.skipped_seconds == pytest.approx(7195.0)
+    assert segments[0]["start_time"] == 7195.0
+    assert segments[-1]["end_time"] == 7200.0
+
+
+def test_session_resumes_after_the_last_stored_segment(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    path = input_dir / "livevideo01.pcm"
+    path.write_bytes(np.zeros(SAMPLE_RATE * 12, dtype="<i2").tobytes())
+    db = _live_db(tmp_path)
+    db.add_transcribed_segments("livevideo01", str(path), [(0.0, 6.0, "earlier")])
+
+    session = LiveSession(
+        "livevideo01",
+        db_path=str(tmp_path / "w.db"),
+        input_dir=str(input_dir),
+        model=FakeModel(),
+        window_seconds=5.0,
+        analyze=False,
+        embed=False,
+        chat=False,
+    )
+    session.stop()
+    report = session.run(capture=False)
+
+    segments = db.get_segments("livevideo01")
+    assert [s["start_time"] for s in segments] == [0.0, 6.0, 8.0, 10.0]
+    assert segments[-1]["end_time"] == 12.0
+    assert report["transcribe"]["segments"] == 3
+    assert db.get_job_status("livevideo01") == "transcribed"
+
+
+def test_non_youtube_urls_get_a_resolved_or_path_safe_id(tmp_path, monkeypatch):
+    def session(url):
+        return LiveSession(url, db_path=str(tmp_path / "w.db"), input_dir=str(tmp_path))
+
+    monkeypatch.setattr(Downloader, "get_video_id", lambda self, url: "twitch12345")
+    twitch = session("https://www.twitch.tv/videos/12345")
+    assert twitch.video_id == "twitch12345"
+    assert twitch.url == "https://www.twitch.tv/videos/12345"
+
+    def unknown(self, url):
+        raise Exception("Failed to get video ID: unsupported URL")
+
+    monkeypatch.setattr(Downloader, "get_video_id", unknown)
+    first = session("rtmp://127.0.0.1/live/stream?key=a/b")
+    assert first.video_id.startswith("live_")
+    assert os.path.dirname(first.pcm_path) == str(tmp_path)
+    assert session("rtmp://127.0.0.1/live/stream?key=a/b").video_id == first.video_id
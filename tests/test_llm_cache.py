@@ -0,0 +1,49 @@
+import llm_cache
+from llm_cache import LLMCache
+
+
+def test_key_covers_every_part_without_ambiguity():
+    key = LLMCache.make_key("llama3", "2", "transcript", "chat")
+    assert key == LLMCache.make_key("llama3", "2", "transcript", "chat")
+    assert key != LLMCache.make_key("llama3", "3", "transcript", "chat")
+    assert key != LLMCache.make_key("mistral", "2", "transcript", "chat")
+    # Parts are delimited, so moving text across a boundary changes the key
+    assert LLMCache.make_key("m", "2", "ab", "c") != LLMCache.make_key(
+        "m", "2", "a", "bc"
+    )
+    assert LLMCache.make_key("m", "2", None, "c") == LLMCache.make_key(
+        "m", "2", "", "c"
+    )
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMCache(str(tmp_path / "c.db"), max_bytes=20)
+    cache.put("a", "m", "1", "x" * 8)
+    cache.put("b", "m", "1", "y" * 8)
+    assert cache.get("a") == "x" * 8  # a is now more recent than b
+    cache.put("c", "m", "1", "z" * 8)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 8
+    assert cache.get("c") == "z" * 8
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 16, 1)
+
+
+def test_lookups_are_counted_and_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "FLUSH_EVERY", 3)
+    path = str(tmp_path / "c.db")
+    cache = LLMCache(path)
+    cache.put("a", "m", "1", "x")
+    cache.get("a")
+    cache.get("missing")
+
+    # Nothing written yet: another process sees no lookups
+    assert LLMCache(path).stats()["hits"] == 0
+    cache.get("a")
+    other = LLMCache(path).stats()
+    assert (other["hits"], other["misses"]) == (2, 1)
+    assert other["hit_rate"] == 2 / 3
+
+    cache.get("missing")
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,71 @@
+import json
+import os
+import time
+
+import metrics
+
+
+def test_render_merges_worker_snapshots(tmp_path, monkeypatch):
+    worker = metrics.Registry()
+    worker.inc("warscribe_segments_total", 3)
+    worker.observe("warscribe_llm_request_seconds", 0.2, model="llama3")
+    (tmp_path / "worker-1.json").write_text(json.dumps(worker.snapshot()))
+
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    metrics.inc("warscribe_segments_total", 2, "Segments")
+    metrics.observe("warscribe_llm_request_seconds", 7.0, model="llama3")
+
+    text = metrics.render_prometheus(str(tmp_path))
+    assert "# TYPE warscribe_segments_total counter" in text
+    assert "warscribe_segments_total 5.0" in text
+    assert 'warscribe_llm_request_seconds_bucket{model="llama3",le="0.25"} 1' in text
+    assert 'warscribe_llm_request_seconds_bucket{model="llama3",le="+Inf"} 2' in text
+    assert 'warscribe_llm_request_seconds_count{model="llama3"} 2' in text
+
+
+def test_flush_writes_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    with metrics.timer("warscribe_task_seconds", stage="embed"):
+        pass
+    metrics.flush(str(tmp_path))
+
+    (path,) = tmp_path.glob("*.json")
+    snapshot = json.loads(path.read_text())
+    assert snapshot["warscribe_task_seconds"]["samples"][0]["value"]["count"] == 1
+
+
+def test_forked_work_horses_keep_counting_in_one_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "PROCESS_NAME", "rq-worker-a")
+    for _ in range(2):
+        # Each job runs in a fresh fork of the worker's registry
+        horse = metrics.Registry()
+        horse._pid = -1
+        monkeypatch.setattr(metrics, "REGISTRY", horse)
+        metrics.resume(str(tmp_path))
+        metrics.inc("warscribe_tasks_total", stage="embed")
+        metrics.flush(str(tmp_path))
+
+    (path,) = tmp_path.glob("*.json")
+    assert path.name == "rq-worker-a.json"
+    (sample,) = json.loads(path.read_text())["warscribe_tasks_total"]["samples"]
+    assert sample["value"] == 2.0
+
+
+def test_latest_gauge_wins_and_stale_snapshots_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    now = time.time()
+    for name, value, age in (("a", 1.0, 10), ("b", 2.0, 100), ("c", 3.0, 5000)):
+        registry = metrics.Registry()
+        registry.set("warscribe_transcribe_realtime_factor", value)
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(registry.snapshot()))
+        os.utime(path, (now - age, now - age))
+
+    text = metrics.render_prometheus(str(tmp_path), max_age=3600)
+    assert "warscribe_transcribe_realtime_factor 1.0" in text
+    # Stale snapshots are left out, but rendering never deletes them
+    assert "warscribe_transcribe_realtime_factor 3.0" not in text
+    assert len(list(tmp_path.glob("*.json"))) == 3
+
+    assert metrics.prune(str(tmp_path), max_age=3600) == 1
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == ["a.json", "b.json"]
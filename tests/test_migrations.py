@@ -0,0 +1,105 @@
+import sqlite3
+
+from db import Database
+from migrations import SCHEMA_VERSION, migrate, schema_version
+
+
+def _index_names(path):
+    conn = sqlite3.connect(path)
+    names = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    conn.close()
+    return names
+
+
+def test_new_database_is_at_the_latest_version(tmp_path):
+    path = str(tmp_path / "w.db")
+    Database(path, with_chroma=False)
+    conn = sqlite3.connect(path, isolation_level=None)
+    assert schema_version(conn) == SCHEMA_VERSION
+    assert migrate(conn) == SCHEMA_VERSION  # nothing left to do
+    # One row per (chunk, file), so a shared chunk is tracked for every file
+    key = [
+        row[1] for row in conn.execute("PRAGMA table_info(ingested_chunks)") if row[5]
+    ]
+    conn.close()
+    assert key == ["hash", "source"]
+    assert {"idx_segments_video_start", "idx_ingested_chunks_source"} <= _index_names(
+        path
+    )
+
+
+def test_unversioned_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """CREATE TABLE jobs (
+            video_id TEXT PRIMARY KEY, url TEXT, status TEXT,
+            created_at TIMESTAMP, updated_at TIMESTAMP)"""
+    )
+    conn.execute(
+        """CREATE TABLE segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, segment_index INTEGER,
+            start_time REAL, end_time REAL, audio_path TEXT, transcript TEXT,
+            chat_data TEXT, warscribe_json TEXT, status TEXT)"""
+    )
+    conn.execute(
+        "INSERT INTO segments (video_id, start_time, end_time, transcript, status)"
+        " VALUES ('oldvideo001', 0, 5, 'kept', 'transcribed')"
+    )
+    conn.commit()
+    conn.close()
+
+    db = Database(path, with_chroma=False)
+
+    conn = sqlite3.connect(path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(segments)")}
+    conn.close()
+    assert {"transcribed_at", "analyzed_at", "embedded_at"} <= columns
+    assert {"idx_segments_video_start", "idx_segments_unanalyzed"} <= _index_names(path)
+    assert [s["transcript"] for s in db.get_segments("oldvideo001")] == ["kept"]
+
+
+def test_targeted_segment_queries(tmp_path):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    ids = db.add_transcribed_segments(
+        "vid00000001", "a.wav", [(0, 5, "a"), (5, 10, "b"), (10, 15, ""), (15, 20, "d")]
+    )
+    db.save_segment_extraction(ids[0], "vid00000001", "{}", [])
+    db.mark_segments_embedded([ids[1]])
+
+    needing_llm = db.get_segments_needing_analysis("vid00000001")
+    assert [s["id"] for s in needing_llm] == [ids[1], ids[3]]
+    assert [
+        s["id"] for s in db.get_segments_needing_analysis("vid00000001", until=10)
+    ] == [ids[1]]
+    assert [s["id"] for s in db.get_segments_needing_embedding("vid00000001")] == [
+        ids[0],
+        ids[3],
+    ]
+    assert [i for i, _ in db.get_segment_stage_times("vid00000001", "analyzed")] == [
+        ids[0]
+    ]
+    assert db.get_last_segment_end("vid00000001") == 20
+
+
+def test_segment_queries_use_indexes(tmp_path):
+    path = str(tmp_path / "w.db")
+    Database(path, with_chroma=False)
+    conn = sqlite3.connect(path)
+
+    def plan(sql):
+        return " ".join(
+            row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, ("v",))
+        )
+
+    assert "idx_segments_video_start" in plan(
+        "SELECT * FROM segments WHERE video_id = ? ORDER BY start_time"
+    )
+    assert "idx_segments_unanalyzed" in plan(
+        "SELECT * FROM segments WHERE video_id = ? AND warscribe_json IS NULL"
+        " ORDER BY start_time"
+    )
+    conn.close()
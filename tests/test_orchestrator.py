@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+
+import metrics
+from orchestrator import Orchestrator
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path / "metrics"))
+
+
+class FakeOrchestrator(Orchestrator):
+    """Stages only move the job along, recording how many ran at once."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ran = []
+        self.active = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+
+    def _step(self, stage, video_id, status):
+        with self.lock:
+            self.active[stage] = self.active.get(stage, 0) + 1
+            self.peak[stage] = max(self.peak.get(stage, 0), self.active[stage])
+        time.sleep(0.05)
+        with self.lock:
+            self.active[stage] -= 1
+            self.ran.append((stage, video_id))
+        self.db.update_job_status(video_id, status)
+
+    def _download(self, video_id):
+        self._step("download", video_id, "downloaded")
+
+    def _transcribe(self, video_id):
+        self._step("transcribe", video_id, "transcribed")
+
+    def _analyze(self, video_id):
+        self._step("analyze", video_id, "analyzed")
+
+    def _embed(self, video_id):
+        self._step("embed", video_id, "completed")
+
+
+def _run(orch, until, timeout=10):
+    thread = threading.Thread(target=orch.run_loop, args=(0.01,))
+    thread.start()
+    deadline = time.time() + timeout
+    while not until() and time.time() < deadline:
+        time.sleep(0.01)
+    orch.stop()
+    thread.join(timeout)
+    assert not thread.is_alive()
+
+
+def test_daemon_runs_jobs_through_every_stage_within_limits(tmp_path):
+    orch = FakeOrchestrator(
+        str(tmp_path / "w.db"),
+        input_dir=str(tmp_path / "input"),
+        concurrency={"download": 3, "transcribe": 1},
+    )
+    ids = [f"video{i:06d}" for i in range(5)]
+    for video_id in ids:
+        orch.db.submit_job(video_id, f"https://youtu.be/{video_id}")
+
+    _run(orch, lambda: all(orch.db.get_job_status(v) == "completed" for v in ids))
+
+    assert all(orch.db.get_job_status(v) == "completed" for v in ids)
+    assert len(orch.ran) == 4 * len(ids)
+    assert orch.peak["download"] <= 3
+    assert orch.peak["transcribe"] == 1
+
+
+def test_recovers_jobs_left_mid_stage(tmp_path):
+    orch = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+    orch.db.submit_job("stuckvideo1", "https://youtu.be/stuckvideo1")
+    orch.db.update_job_status("stuckvideo1", "transcribing")
+
+    _run(orch, lambda: orch.db.get_job_status("stuckvideo1") == "completed")
+
+    assert [stage for stage, _ in orch.ran] == ["transcribe", "analyze", "embed"]
+
+
+def test_failed_stage_marks_job_failed(tmp_path):
+    orch = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+
+    def boom(video_id):
+        raise RuntimeError("boom")
+
+    orch._download = boom
+    orch.db.submit_job("brokenvid01", "https://youtu.be/brokenvid01")
+
+    _run(orch, lambda: orch.db.get_job_status("brokenvid01") == "failed")
+    assert orch.db.get_job_status("brokenvid01") == "failed"
+
+
+def test_recover_leaves_live_claims_alone(tmp_path):
+    orch = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+    for video_id in ("livevideo01", "deadvideo01"):
+        orch.db.submit_job(video_id, f"https://youtu.be/{video_id}")
+        orch.db.update_job_status(video_id, "downloaded")
+    assert orch.db.claim_job(
+        "livevideo01", "downloaded", "transcribing", owner="other", lease_seconds=60
+    )
+    assert orch.db.claim_job(
+        "deadvideo01", "downloaded", "transcribing", owner="gone", lease_seconds=-1
+    )
+
+    orch.recover()
+    assert orch.db.get_job_status("livevideo01") == "transcribing"
+    assert orch.db.get_job_status("deadvideo01") == "downloaded"
+
+
+def test_running_claims_are_renewed(tmp_path):
+    orch = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+    orch.lease_seconds = 0.3
+    orch.db.submit_job("slowvideo01", "https://youtu.be/slowvideo01")
+    orch.db.update_job_status("slowvideo01", "downloaded")
+    other = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+
+    def slow(video_id):
+        time.sleep(1.0)
+        # Another daemon recovering meanwhile must not take the job back
+        other.recover()
+        assert orch.db.get_job_status(video_id) == "transcribing"
+        orch.db.update_job_status(video_id, "transcribed")
+
+    orch._transcribe = slow
+    _run(orch, lambda: orch.db.get_job_status("slowvideo01") == "completed")
+    assert [stage for stage, _ in orch.ran] == ["analyze", "embed"]
+
+
+def test_foreground_job_is_leased_from_download_on(tmp_path):
+    orch = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+    orch.lease_seconds = 0.3
+    other = FakeOrchestrator(str(tmp_path / "w.db"), input_dir=str(tmp_path / "in"))
+
+    def slow(video_id):
+        time.sleep(1.0)
+        # A daemon on the same database must not requeue the download
+        other.recover()
+        assert orch.db.get_job_status(video_id) == "downloading"
+        orch.db.update_job_status(video_id, "downloaded")
+
+    orch._download = slow
+    assert orch.add_job("https://youtu.be/fgvideo0001") == "fgvideo0001"
+    assert orch.db.get_job_status("fgvideo0001") == "completed"
+    assert [stage for stage, _ in orch.ran] == ["transcribe", "analyze", "embed"]
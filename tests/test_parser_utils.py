@@ -0,0 +1,38 @@
+import pytest
+
+from utils import canonical_url, extract_video_id
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s&list=PL123",
+        "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+        "https://youtu.be/dQw4w9WgXcQ?si=abc",
+        "youtu.be/dQw4w9WgXcQ",
+        "https://www.youtube.com/live/dQw4w9WgXcQ?feature=shared",
+        "https://youtube.com/shorts/dQw4w9WgXcQ",
+        "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+        "dQw4w9WgXcQ",
+    ],
+)
+def test_extract_video_id_known_shapes(url):
+    assert extract_video_id(url) == "dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.twitch.tv/videos/123456789",
+        "https://www.youtube.com/@SomeChannel/live",
+        "https://www.youtube.com/watch?v=short",
+        "https://example.com/watch?v=dQw4w9WgXcQ",
+    ],
+)
+def test_extract_video_id_unknown_shapes(url):
+    assert extract_video_id(url) is None
+
+
+def test_canonical_url_round_trips():
+    assert extract_video_id(canonical_url("dQw4w9WgXcQ")) == "dQw4w9WgXcQ"
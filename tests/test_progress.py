@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+import db as db_module
+from db import Database
+
+
+def test_progress_counts_each_stage(tmp_path):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    assert db.get_job_progress("missing0001") is None
+
+    db.add_job("vid00000001", "https://youtu.be/vid00000001")
+    db.set_job_duration("vid00000001", 100.0)
+    ids = db.add_transcribed_segments(
+        "vid00000001", "a.wav", [(t, t + 10.0, "x") for t in range(0, 40, 10)]
+    )
+    db.save_segment_extraction(ids[0], "vid00000001", "{}", [])
+    db.save_segment_extraction(ids[1], "vid00000001", "{}", [])
+    db.mark_segments_embedded(ids[:1])
+
+    progress = db.get_job_progress("vid00000001")
+    assert progress["status"] == "pending"
+    assert progress["segments"] == {
+        "total": 4,
+        "by_status": {"analyzed": 2, "transcribed": 2},
+    }
+    assert progress["transcribed_seconds"] == 40.0
+    assert progress["transcribed_fraction"] == pytest.approx(0.4)
+    assert progress["llm"] == {"done": 2, "total": 4, "fraction": 0.5}
+    assert progress["embeddings"] == {"done": 1, "total": 4, "fraction": 0.25}
+    assert progress["copied"] == {"segments": 0, "seconds": 0.0}
+    # All segments were transcribed in one batch, so there is no rate yet
+    assert progress["throughput"]["transcribe_segments_per_sec"] is None
+
+
+def test_transcribed_seconds_count_covered_audio_not_the_furthest_end(tmp_path):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    db.add_job("vid00000001", "https://youtu.be/vid00000001")
+    db.set_job_duration("vid00000001", 100.0)
+    db.create_work_units("vid00000001", 100.0, 50.0)
+    # The second unit is finished first: half a unit of speech, then silence
+    db.claim_work_unit("a", lease_seconds=60)
+    unit = db.claim_work_unit("b", lease_seconds=60)
+    db.save_unit_segments(
+        unit["id"], "b", "vid00000001", "a.wav", [(50, 60, "x"), (60, 70, None)]
+    )
+
+    progress = db.get_job_progress("vid00000001")
+    assert progress["transcribed_seconds"] == 20.0
+    assert progress["transcribed_fraction"] == pytest.approx(0.2)
+    assert progress["silence"] == {"segments": 1, "seconds": 10.0}
+
+
+def test_progress_aggregates_only_read_the_covering_index(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    db.add_job("vid00000001", "https://youtu.be/vid00000001")
+    statements = []
+    connect = sqlite3.connect
+
+    def traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(db_module.sqlite3, "connect", traced)
+    db.get_job_progress("vid00000001")
+    monkeypatch.undo()
+
+    queries = [s for s in statements if "FROM segments" in s]
+    assert len(queries) == 2
+    conn = sqlite3.connect(db.db_path)
+    for query in queries:
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query))
+        # Answered from an index alone, never from the segment rows
+        assert "USING COVERING INDEX" in plan, plan
+    conn.close()
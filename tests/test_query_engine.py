@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+
+import embeddings
+import query_engine
+import vector_index
+from db import Database
+from query_engine import QueryEngine
+from utils import estimate_tokens
+
+LINES = [
+    "welcome back to the stream",
+    "both players finish deployment",
+    "the Leman Russ moves up the right flank",
+    "it fires the battle cannon at the Carnifex",
+    "six hits, the Carnifex is down",
+    "the crowd goes wild",
+    "Tyranids respond with a charge",
+    "termagants swarm the objective",
+    "end of turn two",
+    "quick break for the sponsors",
+]
+
+
+class _HashEmbedding:
+    def __call__(self, texts):
+        out = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i, hash(word.strip(",.")) % 64] += 1
+        return out
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "get_embedder", _HashEmbedding)
+    monkeypatch.setattr(vector_index, "INDEX_PATH", str(tmp_path / "vectors"))
+    chroma_path = str(tmp_path / "chroma")
+    db = Database(str(tmp_path / "w.db"), chroma_path=chroma_path)
+    db.add_transcribed_segments(
+        "vid00000001", "a.wav", [(i * 10, i * 10 + 10, t) for i, t in enumerate(LINES)]
+    )
+    db.add_transcript_embeddings("vid00000001", db.get_segments("vid00000001"))
+    return QueryEngine(db.db_path, chroma_path=chroma_path)
+
+
+def _transcript_hit(start):
+    return {
+        "id": f"vid00000001_{start}",
+        "document": LINES[start // 10],
+        "metadata": {
+            "video_id": "vid00000001",
+            "start": start,
+            "end": start + 10,
+            "source": "transcript",
+        },
+    }
+
+
+def test_adjacent_hits_merge_into_one_window_with_neighbours(engine, monkeypatch):
+    monkeypatch.setattr(query_engine, "NEIGHBOR_SECONDS", 10)
+    context = engine.build_context([_transcript_hit(30), _transcript_hit(40)])
+    assert context == [
+        "[vid00000001 0:00:20-0:01:00]\n" + " ".join(LINES[2:6]),
+    ]
+
+    apart = engine.build_context([_transcript_hit(80), _transcript_hit(10)])
+    assert [c.splitlines()[0] for c in apart] == [
+        "[vid00000001 0:01:10-0:01:40]",
+        "[vid00000001 0:00:00-0:00:30]",
+    ]
+
+
+def test_context_is_packed_to_the_token_budget(engine, monkeypatch):
+    monkeypatch.setattr(query_engine, "NEIGHBOR_SECONDS", 60)
+    hit = _transcript_hit(40)
+    full = engine.build_context([hit])[0]
+    assert full.count("...") == 0
+
+    trimmed = engine.build_context([hit], max_tokens=40)
+    assert estimate_tokens("\n".join(trimmed)) <= 40
+    # Segments closest to the hit are kept
+    assert LINES[4] in trimmed[0]
+    assert LINES[0] not in trimmed[0]
+
+
+def test_overlapping_ingested_chunks_are_joined_once():
+    engine = QueryEngine.__new__(QueryEngine)
+    hits = [
+        {
+            "id": "rules_1",
+            "document": "units within engagement range must fight in the fight phase",
+            "metadata": {"source": "rules.txt", "chunk_index": 1},
+        },
+        {
+            "id": "rules_0",
+            "document": "a charge roll is 2D6 and units within engagement range",
+            "metadata": {"source": "rules.txt", "chunk_index": 0},
+        },
+        {
+            "id": "copy_0",
+            "document": "a charge roll is 2D6 and units within engagement range",
+            "metadata": {"source": "copy.txt", "chunk_index": 0},
+        },
+    ]
+    assert engine.build_context(hits) == [
+        "[rules.txt]\na charge roll is 2D6 and units within engagement range"
+        " must fight in the fight phase"
+    ]
+
+
+def test_query_prompt_uses_packed_context(engine, monkeypatch):
+    prompts = []
+
+    def chat(model, messages):
+        prompts.append(messages[0]["content"])
+        return {"message": {"content": "The Carnifex died."}}
+
+    monkeypatch.setattr(query_engine.ollama, "chat", chat, raising=False)
+    monkeypatch.setattr(query_engine, "CONTEXT_TOKENS", 60)
+    assert engine.query("battle cannon Carnifex") == "The Carnifex died."
+    assert "battle cannon" in prompts[0]
+    context = prompts[0].split("Context:")[1].split("Question:")[0]
+    assert estimate_tokens(context) <= 60
+
+
+def test_search_filters_by_relative_time_and_source(engine):
+    engine.db.add_documents(
+        "rules", ["the Carnifex has a toughness of nine"], [{"source": "rules.txt"}]
+    )
+
+    last_30s = engine.search("Carnifex", 10, "vid00000001", start=-30)
+    assert {hit["metadata"]["start"] for hit in last_30s} == {70, 80, 90}
+    documents = engine.retrieve("Carnifex", 10, source_type="document")
+    assert documents == ["the Carnifex has a toughness of nine"]
+    assert engine.retrieve("Carnifex", 10, source="other.txt") == []
+    with pytest.raises(ValueError):
+        engine.search("Carnifex", start=-30)
+
+
+def test_query_endpoint_passes_filters(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import api
+
+    monkeypatch.setattr(api, "DB_PATH", str(tmp_path / "w.db"))
+    calls = []
+
+    class _Engine:
+        def query(self, question, video_id=None, **filters):
+            calls.append((question, video_id, filters))
+            return "answer"
+
+    async def _engine():
+        return _Engine()
+
+    monkeypatch.setattr(api, "_get_query_engine", _engine)
+    with TestClient(api.app) as client:
+        response = client.post(
+            "/query",
+            json={
+                "question": "q",
+                "video_id": "v",
+                "start": -3600,
+                "source_type": "transcript",
+            },
+        )
+        assert response.status_code == 200
+        assert calls == [("q", "v", {"start": -3600, "source_type": "transcript"})]
+        bad = client.post("/query", json={"question": "q", "source_type": "chat"})
+        assert bad.status_code == 422
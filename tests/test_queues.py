@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from rq import Queue
+from rq.job import Job
+
+import queues
+from queues import (
+    LEGACY_QUEUE,
+    migrate_legacy_queue,
+    queue_name,
+    queue_stats,
+    record_wait,
+    resolve_priority,
+    worker_queues,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeStrictRedis()
+
+
+def test_queue_names_and_worker_order(redis):
+    assert queue_name("io") == "warscribe-io"
+    assert queue_name("transcribe", "high") == "warscribe-transcribe-high"
+    with pytest.raises(ValueError):
+        queue_name("gpu")
+    # High priority first, and never the legacy queue
+    assert [q.name for q in worker_queues(redis, "io")] == [
+        "warscribe-io-high",
+        "warscribe-io",
+    ]
+
+
+def test_priority_is_explicit_or_by_duration(monkeypatch):
+    monkeypatch.setattr(queues, "SHORT_JOB_SECONDS", 600)
+    assert resolve_priority("normal", duration=10) == "normal"
+    assert resolve_priority(None, duration=600) == "high"
+    assert resolve_priority("urgent", duration=3600) == "normal"
+    assert resolve_priority() == "normal"
+
+
+def test_legacy_jobs_move_to_their_class_once(redis):
+    legacy = Queue(LEGACY_QUEUE, connection=redis)
+    download = legacy.enqueue("worker.task_download", "https://youtu.be/x")
+    transcribe = legacy.enqueue("worker.task_transcribe", "vid00000001")
+    llm = legacy.enqueue("worker.task_llm_embed", "vid00000001")
+
+    assert migrate_legacy_queue(redis) == 3
+    assert migrate_legacy_queue(redis) == 0
+    assert legacy.count == 0
+    for job, resource_class in (
+        (download, "io"),
+        (transcribe, "transcribe"),
+        (llm, "llm"),
+    ):
+        q = queues.get_queue(redis, resource_class)
+        assert q.get_job_ids() == [job.id]
+        assert Job.fetch(job.id, connection=redis).origin == q.name
+
+
+def test_stats_cover_every_queue_with_waits(redis):
+    q = queues.get_queue(redis, "llm", "high")
+    job = q.enqueue("worker.task_llm", "vid00000001")
+    job.enqueued_at = datetime.now(timezone.utc) - timedelta(seconds=30)
+    job.started_at = job.enqueued_at + timedelta(seconds=12)
+    record_wait(redis, job)
+    Queue(LEGACY_QUEUE, connection=redis).enqueue("worker.task_download", "u")
+
+    stats = {s["queue"]: s for s in queue_stats(redis)}
+    assert len(stats) == len(queues.RESOURCE_CLASSES) * 2 + 1
+    high = stats["warscribe-llm-high"]
+    assert (high["resource_class"], high["priority"], high["depth"]) == (
+        "llm",
+        "high",
+        1,
+    )
+    assert high["wait_s"]["samples"] == 1
+    assert high["wait_s"]["p50"] == pytest.approx(12.0)
+    assert stats[LEGACY_QUEUE]["depth"] == 1
+    assert stats[LEGACY_QUEUE]["resource_class"] is None
@@ -1,6 +1,15 @@
 from uuid import UUID
+
+import pytest
+from pydantic import ValidationError
+
 from warscribe.core.schema.unit import UnitReference
-from warscribe.core.schema.action import BaseAction, ActionType
+from warscribe.core.schema.action import (
+    BaseAction,
+    ActionType,
+    ShootAction,
+    parse_action,
+)
 from warscribe.core.schema.transcript import GameTranscript, Player
 from vindicta_foundation.models.base import VindictaModel
 
@@ -31,3 +40,37 @@ def test_transcript_model():
     assert isinstance(transcript, VindictaModel)
     assert transcript.player1.name == "Alice"
     assert transcript.created_at is not None
+
+
+def test_parse_action_dispatches_on_action_type():
+    actor = {"name": "Intercessors", "faction": "Space Marines"}
+    shoot = parse_action(
+        {
+            "action_type": "shoot",
+            "turn": 2,
+            "phase": "shooting",
+            "actor": actor,
+            "target": {"name": "Warriors", "faction": "Necrons"},
+            "weapon_name": "Bolt rifle",
+            "shots": 10,
+        }
+    )
+    assert isinstance(shoot, ShootAction)
+    assert shoot.target.name == "Warriors"
+
+    stratagem = parse_action(
+        {"action_type": "stratagem", "turn": 1, "phase": "command", "actor": actor}
+    )
+    assert type(stratagem) is BaseAction
+
+
+def test_parse_action_rejects_incomplete_action():
+    with pytest.raises(ValidationError):
+        parse_action(
+            {
+                "action_type": "move",
+                "turn": 1,
+                "phase": "movement",
+                "actor": {"name": "Intercessors", "faction": "Space Marines"},
+            }
+        )
@@ -0,0 +1,197 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import db as db_module
+import embeddings
+import vector_index
+from db import Database
+from query_engine import QueryEngine
+from vector_index import LocalCollection, VectorIndex
+
+
+def _vectors(n, dim=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def _exact_top(vectors, query, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normed @ query))[:k])
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_quantized_search_matches_exact_search(tmp_path, dtype, monkeypatch):
+    monkeypatch.setattr(vector_index, "BLOCK_ROWS", 256)  # several blocks
+    vectors = _vectors(2000)
+    index = VectorIndex(str(tmp_path / "idx"), dtype)
+    index.add([f"d{i}" for i in range(2000)], vectors)
+
+    queries = _vectors(20, seed=1)
+    recall = []
+    for query, hits in zip(queries, index.search(queries, k=10)):
+        exact = _exact_top(vectors, query / np.linalg.norm(query), 10)
+        recall.append(len({row for row, _ in hits} & set(exact)) / 10)
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+    assert np.mean(recall) >= 0.9
+
+
+def test_video_filter_reads_only_that_videos_rows(tmp_path):
+    index = VectorIndex(str(tmp_path / "idx"))
+    vectors = _vectors(90)
+    # Interleaved batches leave each video with several row ranges
+    for batch in range(3):
+        for video in ("vidA", "vidB", "vidC"):
+            rows = range(batch * 30, batch * 30 + 10)
+            offset = "ABC".index(video[-1]) * 10
+            index.add(
+                [f"{video}_{r + offset}" for r in rows],
+                vectors[[r + offset for r in rows]],
+                metadatas=[{"video_id": video, "source": "transcript"}] * 10,
+            )
+    assert index.stats()["ranges"] == 9
+
+    hits = index.search(vectors[15], k=50, where={"video_id": "vidB"})[0]
+    found = index.fetch(row for row, _ in hits)
+    assert len(hits) == 30
+    assert {meta["video_id"] for _, _, meta in found.values()} == {"vidB"}
+
+    filtered = index.search(
+        vectors[15], k=5, where={"$and": [{"video_id": "vidB"}, {"source": "chat"}]}
+    )
+    assert filtered == [[]]
+
+
+def test_index_persists_and_skips_known_ids(tmp_path):
+    path = str(tmp_path / "idx")
+    vectors = _vectors(10)
+    assert len(VectorIndex(path, "float16").add(["a", "b"], vectors[:2])) == 2
+
+    reopened = VectorIndex(path)
+    assert reopened.dtype == "float16"
+    assert reopened.add(["b", "c", "c"], vectors[1:4]) == ["c"]
+    assert len(reopened) == 3
+    with pytest.raises(ValueError):
+        VectorIndex(path, "int8")
+    with pytest.raises(ValueError):
+        reopened.add(["d"], _vectors(1, dim=8))
+
+
+class _HashEmbedding:
+    """Deterministic bag-of-words embedding standing in for the real model."""
+
+    def __call__(self, texts):
+        out = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i, hash(word) % 64] += 1
+        return out
+
+
+def test_database_falls_back_to_local_index(tmp_path, monkeypatch):
+    class BrokenChroma:
+        def __init__(self, path):
+            raise RuntimeError("chroma failed to start")
+
+    monkeypatch.setattr(embeddings, "get_embedder", _HashEmbedding)
+    monkeypatch.setattr(vector_index, "INDEX_PATH", str(tmp_path / "vectors"))
+    monkeypatch.setattr(db_module.chromadb, "PersistentClient", BrokenChroma)
+    db_path = str(tmp_path / "w.db")
+    chroma_path = str(tmp_path / "chroma")
+
+    db = Database(db_path, chroma_path=chroma_path)
+    assert isinstance(db.collection, LocalCollection)
+    db.add_transcribed_segments(
+        "vid00000001",
+        "a.wav",
+        [(0, 5, "deploy the tanks"), (5, 10, "charge the objective")],
+    )
+    db.add_transcript_embeddings("vid00000001", db.get_segments("vid00000001"))
+    assert db.get_segments_needing_embedding("vid00000001") == []
+
+    engine = QueryEngine(db_path, chroma_path=chroma_path)
+    assert engine.retrieve("charge objective", n_results=1) == ["charge the objective"]
+    assert engine.retrieve("tanks", video_id="other000001") == []
+
+    monkeypatch.setattr(vector_index, "BACKEND", "chroma")
+    assert Database(db_path, chroma_path=chroma_path).collection is None
+
+
+def test_incremental_embedding_keeps_position_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "get_embedder", _HashEmbedding)
+    monkeypatch.setattr(vector_index, "BACKEND", "local")
+    monkeypatch.setattr(vector_index, "INDEX_PATH", str(tmp_path / "vectors"))
+    db = Database(str(tmp_path / "w.db"), chroma_path=str(tmp_path / "chroma"))
+    for start in (0, 5):
+        # A live pass embeds each new segment on its own
+        db.add_transcribed_segments("vid00000001", "a.wav", [(start, start + 5, "x")])
+        segments = db.get_segments_needing_embedding("vid00000001")
+        db.add_transcript_embeddings("vid00000001", segments)
+
+    found = db.collection.index.fetch({0, 1})
+    assert sorted(row[0] for row in found.values()) == [
+        "vid00000001_0",
+        "vid00000001_1",
+    ]
+
+    # A video indexed before embedded_at was tracked is not indexed twice
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE segments SET embedded_at = NULL")
+    conn.commit()
+    conn.close()
+    db.add_transcript_embeddings("vid00000001", db.get_segments("vid00000001"))
+    assert db.collection.count() == 2
+
+
+def test_filters_select_candidates_by_time_and_source(tmp_path):
+    index = VectorIndex(str(tmp_path / "idx"))
+    vectors = _vectors(40)
+    index.add(
+        [f"seg{i}" for i in range(30)],
+        vectors[:30],
+        metadatas=[
+            {
+                "video_id": "vidA",
+                "start": i * 10.0,
+                "end": i * 10.0 + 10,
+                "source": "transcript",
+            }
+            for i in range(30)
+        ],
+    )
+    index.add(
+        [f"doc{i}" for i in range(10)],
+        vectors[30:],
+        metadatas=[{"source": "rules.txt", "chunk_index": i} for i in range(10)],
+    )
+
+    def ids(where):
+        hits = index.search(vectors[0], k=40, where=where)[0]
+        return {found[0] for found in index.fetch(row for row, _ in hits).values()}
+
+    window = {
+        "$and": [{"video_id": "vidA"}, {"end": {"$gt": 95}}, {"start": {"$lt": 130}}]
+    }
+    assert ids(window) == {"seg9", "seg10", "seg11", "seg12"}
+    assert ids({"source": {"$ne": "transcript"}}) == {f"doc{i}" for i in range(10)}
+    assert ids({"chunk_index": {"$in": [2, 3]}}) == {"doc2", "doc3"}
+    with pytest.raises(ValueError):
+        index.search(vectors[0], where={"$or": [{"source": "x"}, {"source": "y"}]})
+
+
+def test_search_ignores_rows_appended_after_the_matrix_was_mapped(tmp_path):
+    index = VectorIndex(str(tmp_path / "vectors"))
+    index.add(
+        [f"d{i}" for i in range(10)], _vectors(10), metadatas=[{"video_id": "v"}] * 10
+    )
+    select = index._selection
+
+    def racing_selection(conn, where):
+        # Another process appends between the row count and the selection
+        rows = select(conn, where)
+        return np.concatenate([np.arange(a, b) for a, b in rows] + [np.arange(10, 14)])
+
+    index._selection = racing_selection
+    (hits,) = index.search(_vectors(1, seed=1), k=20, where={"video_id": "v"})
+    assert sorted(row for row, _ in hits) == list(range(10))
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import warscribe_llm
+from db import Database
+from warscribe.core.schema.action import ShootAction
+from warscribe_llm import WarscribeLLM
+
+ACTOR = {"name": "Intercessors", "faction": "Space Marines"}
+SHOOT = {
+    "action_type": "shoot",
+    "turn": 2,
+    "phase": "shooting",
+    "actor": ACTOR,
+    "target": {"name": "Warriors", "faction": "Necrons"},
+    "weapon_name": "Bolt rifle",
+    "shots": 10,
+}
+BROKEN = {"action_type": "shoot", "turn": 0, "phase": "shooting", "actor": ACTOR}
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Queue of Ollama replies; a reply that is an exception is raised."""
+    queue, prompts = [], []
+
+    def chat(model, messages, format=None, options=None):
+        prompts.append(messages[0]["content"])
+        reply = queue.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return {"message": {"content": json.dumps(reply)}}
+
+    monkeypatch.setattr(warscribe_llm.ollama, "chat", chat, raising=False)
+    return queue, prompts
+
+
+def test_extract_only_resends_invalid_actions(replies):
+    queue, prompts = replies
+    fixed = dict(SHOOT, turn=3)
+    queue.extend(
+        [
+            {"summary": "bolters", "actions": [SHOOT, BROKEN]},
+            {"summary": "", "actions": [fixed]},
+        ]
+    )
+    summary, actions = WarscribeLLM(cache=False).extract("transcript", "chat")
+
+    assert summary == "bolters"
+    assert [a.turn for a in actions] == [2, 3]
+    assert all(isinstance(a, ShootAction) for a in actions)
+    assert '"turn": 0' in prompts[1] and '"turn": 2' not in prompts[1]
+
+
+def test_failed_repair_keeps_valid_actions(replies):
+    queue, _ = replies
+    queue.extend(
+        [
+            {"summary": "s", "actions": [SHOOT, BROKEN]},
+            ConnectionError("ollama went away"),
+            {"summary": "", "actions": [BROKEN]},
+        ]
+    )
+    summary, actions = WarscribeLLM(cache=False, max_retries=2).extract("t", "c")
+    assert [a.turn for a in actions] == [2]
+    assert queue == []
+
+
+def test_save_segment_extraction_replaces_actions(tmp_path):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    (seg_id,) = db.add_transcribed_segments("vid00000001", "a.wav", [(0, 5, "t")])
+    row = ("shoot", 2, "shooting", "Intercessors", None, json.dumps(SHOOT))
+    db.save_segment_extraction(seg_id, "vid00000001", '{"actions": []}', [row, row])
+    db.save_segment_extraction(seg_id, "vid00000001", '{"summary": "s"}', [row])
+
+    assert [a["action_type"] for a in db.get_actions("vid00000001")] == ["shoot"]
+    (segment,) = db.get_segments("vid00000001")
+    assert segment["status"] == "analyzed"
+    assert segment["warscribe_json"] == '{"summary": "s"}'
+    assert db.get_segments_needing_analysis("vid00000001") == []
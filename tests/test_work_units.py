@@ -0,0 +1,161 @@
+import threading
+
+import numpy as np
+
+import transcriber
+from audio import SAMPLE_RATE
+from db import Database
+from transcriber import Transcriber
+
+
+class FakeSegment:
+    def __init__(self, start, end, text):
+        self.start, self.end, self.text = start, end, text
+
+
+class FakeModel:
+    """Emits a 5s segment every 5s of whatever audio it is handed."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def transcribe(self, audio, **options):
+        seconds = len(audio) / SAMPLE_RATE
+        t, segments = 0.0, []
+        while t < seconds:
+            segments.append(FakeSegment(t, min(t + 5.0, seconds), "x"))
+            t += 5.0
+        return segments, None
+
+
+def _db(tmp_path, video_id="vod00000001", duration=100.0, unit_seconds=30.0):
+    db = Database(str(tmp_path / "w.db"), with_chroma=False)
+    db.add_job(video_id, "https://youtu.be/" + video_id)
+    db.update_job_status(video_id, "transcribing")
+    db.create_work_units(video_id, duration, unit_seconds)
+    return db
+
+
+def test_units_cover_the_recording_and_are_created_once(tmp_path):
+    db = _db(tmp_path)
+    db.create_work_units("vod00000001", 100.0, 30.0)
+    units = db.get_work_units("vod00000001")
+    assert [(u["start_time"], u["end_time"]) for u in units] == [
+        (0.0, 30.0),
+        (30.0, 60.0),
+        (60.0, 90.0),
+        (90.0, 100.0),
+    ]
+
+
+def test_claims_are_exclusive_until_the_lease_expires(tmp_path):
+    db = _db(tmp_path, duration=60.0)
+    a = db.claim_work_unit("a", lease_seconds=60)
+    b = db.claim_work_unit("b", lease_seconds=60)
+    assert a["id"] != b["id"]
+    assert db.claim_work_unit("c", lease_seconds=60) is None
+
+    # An expired lease is up for grabs, and the old owner can't write any more
+    assert db.heartbeat_work_unit(a["id"], "a", lease_seconds=-1)
+    c = db.claim_work_unit("c", lease_seconds=60)
+    assert c["id"] == a["id"]
+    assert not db.save_unit_segments(a["id"], "a", "vod00000001", "x", [(0, 5, "x")])
+    assert not db.heartbeat_work_unit(a["id"], "a", lease_seconds=60)
+    assert db.save_unit_segments(c["id"], "c", "vod00000001", "x", [(0, 5, "x")])
+
+
+def test_last_completed_unit_marks_job_transcribed_once(tmp_path):
+    db = _db(tmp_path, duration=60.0)
+    a = db.claim_work_unit("a", lease_seconds=60)
+    b = db.claim_work_unit("b", lease_seconds=60)
+    assert db.complete_work_unit(a["id"], "a") == (True, False)
+    assert db.get_job_status("vod00000001") == "transcribing"
+    assert db.complete_work_unit(b["id"], "b") == (True, True)
+    assert db.get_job_status("vod00000001") == "transcribed"
+
+
+def test_resubmitting_a_failed_job_retries_its_unfinished_units(tmp_path):
+    db = _db(tmp_path, duration=60.0)
+    done = db.claim_work_unit("a", lease_seconds=60)
+    db.complete_work_unit(done["id"], "a")
+    # The other unit's lease runs out until it is given up on
+    for _ in range(2):
+        unit = db.claim_work_unit("a", lease_seconds=-1)
+    assert db.claim_work_unit("a", lease_seconds=-1, max_attempts=2) is None
+    assert db.get_job_status("vod00000001") == "failed"
+
+    created, job = db.submit_job("vod00000001", "https://youtu.be/vod00000001")
+    assert created and job["status"] == "pending"
+    db.update_job_status("vod00000001", "transcribing")
+    db.create_work_units("vod00000001", 60.0, 30.0)
+    retry = db.claim_work_unit("b", lease_seconds=60, max_attempts=2)
+    assert (retry["id"], retry["attempts"]) == (unit["id"], 0)
+    assert db.get_job_status("vod00000001") == "transcribing"
+    assert db.complete_work_unit(retry["id"], "b") == (True, True)
+    assert [u["status"] for u in db.get_work_units("vod00000001")] == ["done", "done"]
+
+
+def test_workers_share_a_video_without_overlap(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, "WhisperModel", FakeModel)
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    np.save(input_dir / "vod00000001.npy", np.zeros(SAMPLE_RATE * 100, np.float32))
+    (input_dir / "vod00000001.wav").write_bytes(b"")
+    db = _db(tmp_path, duration=100.0, unit_seconds=20.0)
+
+    finished = []
+
+    def work():
+        t = Transcriber(db_path=db.db_path, input_dir=str(input_dir))
+        finished.extend(t.process_units("vod00000001"))
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    segments = db.get_segments("vod00000001")
+    assert finished == ["vod00000001"]
+    assert db.get_job_status("vod00000001") == "transcribed"
+    assert segments[0]["start_time"] == 0.0
+    assert segments[-1]["end_time"] == 100.0
+    for prev, seg in zip(segments, segments[1:]):
+        assert seg["start_time"] == prev["end_time"]
+
+
+def test_job_profile_selects_decoding_and_stores_silence(tmp_path, monkeypatch):
+    calls = []
+
+    class QuietModel(FakeModel):
+        """Speech only in the first 10s, as a VAD-filtered decode would report."""
+
+        def transcribe(self, audio, **options):
+            calls.append(options)
+            segments, _ = super().transcribe(audio, **options)
+            return [s for s in segments if s.start < 10.0], None
+
+    monkeypatch.setattr(transcriber, "WhisperModel", QuietModel)
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    np.save(input_dir / "vod00000001.npy", np.zeros(SAMPLE_RATE * 60, np.float32))
+    (input_dir / "vod00000001.wav").write_bytes(b"")
+    db = _db(tmp_path, duration=60.0, unit_seconds=60.0)
+    db.set_job_profile("vod00000001", "fast")
+
+    t = Transcriber(db_path=db.db_path, input_dir=str(input_dir), profile="accurate")
+    assert t.process_units("vod00000001") == {"vod00000001"}
+
+    assert calls[0]["beam_size"] == 1 and calls[0]["vad_filter"]
+    segments = db.get_segments("vod00000001")
+    assert [(s["start_time"], s["end_time"], s["status"]) for s in segments] == [
+        (0.0, 5.0, "transcribed"),
+        (5.0, 10.0, "transcribed"),
+        (10.0, 60.0, "silence"),
+    ]
+    assert [s["id"] for s in db.get_segments_needing_analysis("vod00000001")] == [
+        s["id"] for s in segments[:2]
+    ]
+    progress = db.get_job_progress("vod00000001")
+    assert progress["silence"] == {"segments": 1, "seconds": 50.0}
+    assert progress["llm"]["total"] == 2